@@ -1,362 +1,255 @@
-from flask import Flask, request, jsonify
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from flask import Flask, Response, request, jsonify
 from flask_cors import CORS
-from sympy import sympify
-from sympy.parsing.latex import parse_latex
 
-from calc3 import (
-    solve_partial_derivative,
-    solve_multiple_integral,
-    solve_arc_length,
-    solve_gradient,
-    solve_divergence,
-    solve_curl,
-    solve_line_integral,
-    solve_surface_integral,
-    solve_directional_derivative,
-    solve_greens_theorem,
-    solve_stokes_theorem,
-    solve_lagrange_multipliers
-)
+from cache import cached_solve, make_key, result_cache
+from crosscheck import COORDINATORS
+from timeouts import SolveTimeout
+from engine import get_engine, EngineBusy
+from jobs import JobManager, JobQueueFull
+from logs import configure_logging, get_logger, log_request
+from metrics import registry, request_timer, timed
+from operations import OPERATIONS, prepare_operation, OperationError
+from parser import parse_cache_stats
 
-from parser import (
-    parse_expression,
-    parse_integral_latex,
-    parse_vector,
-    parse_limits,
-    parse_integral_limits,
-    extract_variables_from_string,
-    preprocess_constraint
-)
+configure_logging()
+logger = get_logger("app")
 
 app = Flask(__name__)
 CORS(app)
 
+BATCH_MAX_ITEMS = int(os.environ.get("CALC3_BATCH_MAX_ITEMS", "500"))
+# Seconds between keep-alive comments on an idle /jobs/<id>/events stream
+JOB_EVENTS_KEEPALIVE = float(os.environ.get("CALC3_JOB_EVENTS_KEEPALIVE", "15"))
+
+def run_solver(operation, solver, *args):
+    """Submit a calc3 solver to the worker pool through the result cache"""
+    if solver in COORDINATORS:
+        # Coordinates here; each formulation or piece goes to the pool on its own
+        return cached_solve(operation, solver, *args,
+                            runner=lambda op, solver, args: solver(*args, engine=get_engine(), operation=op))
+    return cached_solve(operation, solver, *args, runner=get_engine().run)
+
+def solve_prepared(operation, solver, args):
+    """Run an already parsed operation and return (response body, status)"""
+    try:
+        return {"result": run_solver(operation, solver, *args)}, 200
+    except SolveTimeout as e:
+        return e.to_response(), 504
+    except EngineBusy as e:
+        return {"error": str(e)}, 503
+    except Exception as e:
+        logger.exception("solver failed", extra={"operation": operation})
+        return {"error": f"Server error: {str(e)}"}, 500
+
+jobs = JobManager(solve_prepared)
+
+def execute(data):
+    """Parse and run a single /calculate payload, returning (response body, status)"""
+    try:
+        with timed("parse"):
+            operation, solver, args = prepare_operation(data)
+    except OperationError as e:
+        return {"error": str(e)}, e.status
+    except Exception as e:
+        logger.exception("could not parse request")
+        return {"error": f"Server error: {str(e)}"}, 500
+    return solve_prepared(operation, solver, args)
+
 @app.route('/calculate', methods=['POST'])
 def calculate():
-    try:
-        data = request.json
-        operation = data.get("operation", "")
-        
-        print(f"Operation: {operation}")
-        print(f"Request data: {data}")
+    started = time.perf_counter()
+    # silent: a missing or malformed JSON body is reported as a JSON 400 below, not Flask's HTML page
+    data = request.get_json(silent=True)
 
-        if operation == "partial_derivative":
-            function_str = data.get("function", "")
-            variables_str = data.get("variables", "")
+    with request_timer() as timer:
+        with timer.stage("total"):
+            body, status = execute(data)
+            with timer.stage("serialize"):
+                response = jsonify(body)
 
-            # Parse using SymPy
-            function_expr = parse_expression(function_str)
-            variables = parse_vector(variables_str)
-            order = 1
-            return jsonify({
-                "result": solve_partial_derivative(str(function_expr), variables, order)
-            })
-            
-        elif operation in ["double_integral", "double_integral_polar"]:
-            expression_str = data.get("function", "")
-            variables_str = data.get("variables", "x,y" if operation == "double_integral" else "r,theta")
-            limits_str = data.get("limits", "0,1,0,1" if operation == "double_integral" else "0,1,0,2*pi")
-            
-            if not expression_str.strip():
-                return jsonify({"error": "Expression cannot be empty"}), 400
-            
-            # Check if it's a LaTeX integral template
-            if '\\int' in expression_str:
-                integrand, latex_limits = parse_integral_latex(expression_str)
-                if latex_limits:
-                    limits = latex_limits
-                else:
-                    variables = parse_vector(variables_str)
-                    limits = parse_integral_limits(limits_str, variables)
-            else:
-                # Regular expression
-                integrand_expr = parse_expression(expression_str)
-                integrand = str(integrand_expr)
-                variables = parse_vector(variables_str)
-                limits = parse_integral_limits(limits_str, variables)
-            
-            return jsonify({
-                "result": solve_multiple_integral(integrand, limits)
-            })
-            
-        elif operation in ["triple_integral", "triple_integral_polar", "triple_integral_cylindrical"]:
-            expression_str = data.get("function", "")
-            
-            # Default variables based on coordinate system
-            if operation == "triple_integral":
-                default_vars = "x,y,z"
-                default_limits = "0,1,0,1,0,1"
-            else:  # polar or cylindrical
-                default_vars = "r,theta,z"
-                default_limits = "0,1,0,2*pi,0,1"
-            
-            variables_str = data.get("variables", default_vars)
-            limits_str = data.get("limits", default_limits)
-            
-            if not expression_str.strip():
-                return jsonify({"error": "Expression cannot be empty"}), 400
-            
-            # Check if it's a LaTeX integral template
-            if '\\int' in expression_str:
-                integrand, latex_limits = parse_integral_latex(expression_str)
-                if latex_limits:
-                    limits = latex_limits
-                else:
-                    variables = parse_vector(variables_str)
-                    limits = parse_integral_limits(limits_str, variables)
-            else:
-                # Regular expression
-                integrand_expr = parse_expression(expression_str)
-                integrand = str(integrand_expr)
-                variables = parse_vector(variables_str)
-                limits = parse_integral_limits(limits_str, variables)
-            
-            return jsonify({
-                "result": solve_multiple_integral(integrand, limits)
-            })
-            
-        elif operation == "arc_length":
-            parametric_str = data.get("parametric", "")
-            parameter_str = data.get("parameter", "t")
-            limits_str = data.get("limits", "0,1")
-            
-            # Parse parametric functions
-            parametric_functions = parse_vector(parametric_str)
-            parameter = parameter_str.strip() if parameter_str.strip() else 't'
-            limits = parse_limits(limits_str)
-            
-            return jsonify({
-                "result": solve_arc_length(parametric_functions, parameter, str(limits[0]), str(limits[1]))
-            })
-            
-        elif operation == "gradient":
-            function_str = data.get("function", "")
-            variables_str = data.get("variables", "x,y,z")
-            point_str = data.get("point", "")
-            
-            function_expr = parse_expression(function_str)
-            variables = parse_vector(variables_str)
-            point = parse_vector(point_str) if point_str else None
-            
-            return jsonify({
-                "result": solve_gradient(str(function_expr), variables, point)
-            })
-            
-        elif operation == "divergence":
-            vector_field_str = data.get("vector_field", "")
-            
-            vector_field = parse_vector(vector_field_str)
-            variables = ['x', 'y', 'z'][:len(vector_field)]
-            
-            return jsonify({
-                "result": solve_divergence(vector_field, variables)
-            })
-            
-        elif operation == "curl":
-            vector_field_str = data.get("vector_field", "")
-            
-            vector_field = parse_vector(vector_field_str)
-            variables = ['x', 'y', 'z']  # Curl is always 3D
-            
-            return jsonify({
-                "result": solve_curl(vector_field, variables)
-            })
-            
-        elif operation in ["scalar_line_integral", "vector_line_integral"]:
-            field_str = data.get("function" if operation == "scalar_line_integral" else "vector_field", "")
-            curve_str = data.get("curve", "")
-            limits_str = data.get("limits", "0,1")
-            
-            # Parse field (scalar string or vector list)
-            if operation == "scalar_line_integral":
-                field_expr = parse_expression(field_str)
-                field = str(field_expr)
-            else:
-                field = parse_vector(field_str)
-            
-            curve = parse_vector(curve_str)
-            limits = parse_limits(limits_str)
-            
-            return jsonify({
-                "result": solve_line_integral(field, 't', curve, limits)
-            })
-            
-        elif operation == "surface_integral":
-            vector_field_str = data.get("vector_field", "")
-            surface_str = data.get("surface", "")
-            u_bounds_str = data.get("u_bounds", "0,1")  # New field for u bounds
-            v_bounds_str = data.get("v_bounds", "0,1")  # New field for v bounds
-            
-            vector_field = parse_vector(vector_field_str)
-            surface = parse_vector(surface_str)  # Parse as vector/tuple
-            
-            # Extract variables using regex method
-            all_vars = set()
-            
-            # Get variables from vector field components
-            for field_component in vector_field:
-                field_vars = extract_variables_from_string(field_component)
-                all_vars.update(field_vars)
-            
-            # Get variables from surface components
-            for surface_component in surface:
-                surface_vars = extract_variables_from_string(surface_component)
-                all_vars.update(surface_vars)
-            
-            # Filter parameters (excluding x, y, z which are coordinate variables)
-            excluded = {'x', 'y', 'z'}
-            params = [var for var in all_vars if var not in excluded]
-            params.sort()  # Sort for consistency
-            
-            # If no parameters found, use default u, v
-            if not params:
-                params = ['u', 'v']
-            elif len(params) == 1:
-                params.append('v')  # Add second parameter if only one found
-            
-            # Extract coordinate variables (x, y, z) for the function call
-            variables = [var for var in all_vars if var in {'x', 'y', 'z'}]
-            if not variables:
-                variables = ['x', 'y', 'z']  # Default variables
-            variables.sort()  # Sort for consistency
-            
-            # Parse the bounds for u and v
-            u_bounds = parse_limits(u_bounds_str)
-            v_bounds = parse_limits(v_bounds_str)
-            bounds = [(u_bounds[0], u_bounds[1]), (v_bounds[0], v_bounds[1])]
-            
-            return jsonify({
-                "result": solve_surface_integral(vector_field, params, surface, bounds, variables)
-            })
-            
-        elif operation == "directional_derivative":
-            function_str = data.get("function", "")
-            direction_str = data.get("direction", "")
-            point_str = data.get("point", "")
-            
-            function_expr = parse_expression(function_str)
-            direction = parse_vector(direction_str)
-            point = parse_vector(point_str) if point_str else None
-            
-            variables = ['x', 'y', 'z'][:len(direction)]
+    operation = data.get("operation") if isinstance(data, dict) else None
+    operation = operation if operation in OPERATIONS else "unknown"
+    registry.observe_request(operation, status, timer)
+    log_request(logger, operation, status, started, data)
 
-            return jsonify({
-                "result": solve_directional_derivative(str(function_expr), variables, direction, point)
-            })
-            
-        elif operation == "greens_theorem":
-            vector_field_str = data.get("vector_field", "")
-            x_bounds_str = data.get("x_bounds", "0,1")  # New field for x bounds
-            y_bounds_str = data.get("y_bounds", "0,1")  # New field for y bounds
-            
-            vector_field = parse_vector(vector_field_str)
-            
-            # Extract variables using regex method
-            all_vars = set()
-            for field_component in vector_field:
-                field_vars = extract_variables_from_string(field_component)
-                all_vars.update(field_vars)
-            
-            # Filter coordinate variables for Green's theorem (2D)
-            excluded = {'u', 'v', 't', 'r', 'theta', 'phi', 'rho'}
-            variables = [var for var in all_vars if var not in excluded]
-            variables.sort()  # Sort for consistency
-            
-            # Default to x, y if no variables found or keep it 2D
-            if not variables or len(variables) < 2:
-                variables = ['x', 'y']
-            else:
-                # Keep only first 2 variables for Green's theorem (2D)
-                variables = variables[:2]
-            
-            # Parse the bounds for x and y
-            x_bounds = parse_limits(x_bounds_str)
-            y_bounds = parse_limits(y_bounds_str)
-            bounds = [(x_bounds[0], x_bounds[1]), (y_bounds[0], y_bounds[1])]
-            
-            return jsonify({
-                "result": solve_greens_theorem(vector_field, bounds, variables)
-            })
-            
-        elif operation == "stokes_theorem":
-            vector_field_str = data.get("vector_field", "")
-            surface_str = data.get("surface", "")
-            u_bounds_str = data.get("u_bounds", "0,1")  # New field for u bounds
-            v_bounds_str = data.get("v_bounds", "0,1")  # New field for v bounds
-            
-            vector_field = parse_vector(vector_field_str)
-            surface = parse_vector(surface_str)  # Parse as vector/tuple
-            
-            # Extract variables using regex method
-            all_vars = set()
-            
-            # Get variables from vector field components
-            for field_component in vector_field:
-                field_vars = extract_variables_from_string(field_component)
-                all_vars.update(field_vars)
-            
-            # Get variables from surface components
-            for surface_component in surface:
-                surface_vars = extract_variables_from_string(surface_component)
-                all_vars.update(surface_vars)
-            
-            # Filter parameters (excluding x, y, z which are coordinate variables)
-            excluded = {'x', 'y', 'z'}
-            params = [var for var in all_vars if var not in excluded]
-            params.sort()  # Sort for consistency
-            
-            # If no parameters found, use default u, v
-            if not params:
-                params = ['u', 'v']
-            elif len(params) == 1:
-                params.append('v')  # Add second parameter if only one found
-            
-            # Extract coordinate variables (x, y, z) for the function call
-            variables = [var for var in all_vars if var in {'x', 'y', 'z'}]
-            if not variables:
-                variables = ['x', 'y', 'z']  # Default variables
-            variables.sort()  # Sort for consistency
-            
-            # Parse the bounds for u and v
-            u_bounds = parse_limits(u_bounds_str)
-            v_bounds = parse_limits(v_bounds_str)
-            bounds = [(u_bounds[0], u_bounds[1]), (v_bounds[0], v_bounds[1])]
-            
-            return jsonify({
-                "result": solve_stokes_theorem(vector_field, params, surface, bounds, variables)
-            })
-            
-        elif operation == "lagrange_multipliers":
-            function_str = data.get("function", "")
-            constraint_str = data.get("constraint", "")
-            
-            constraint_str = preprocess_constraint(constraint_str)
-            # Extract variables from both expressions
-            func_vars = extract_variables_from_string(function_str)
-            constraint_vars = extract_variables_from_string(constraint_str)
-            all_vars = func_vars.union(constraint_vars)
-            
-            # Convert to sorted list
-            variables = sorted(list(all_vars))
-            
-            if not variables:
-                return jsonify({"error": "Could not extract variables from the function and constraint."}), 400
-            
-            # Parse expressions for clean formatting
-            function_expr = parse_expression(function_str)
-            constraint_expr = parse_expression(constraint_str)
-            
+    if isinstance(data, dict) and data.get("timings"):
+        # Opt-in per-stage breakdown in milliseconds
+        response = jsonify({**body, "timings": timer.as_ms()})
+    return response, status
 
-            return jsonify({
-                "result": solve_lagrange_multipliers(str(function_expr), str(constraint_expr), variables)
-            })
-            
+def _timed_solve(operation, solver, args):
+    started = time.perf_counter()
+    body, status = solve_prepared(operation, solver, args)
+    return body, status, (time.perf_counter() - started) * 1000
+
+@app.route('/calculate_batch', methods=['POST'])
+def calculate_batch():
+    """
+    Evaluate a list of /calculate payloads in one request.
+    Identical problems are solved once and results come back in request order.
+    """
+    started = time.perf_counter()
+    data = request.get_json(silent=True)
+    items = data.get("operations") if isinstance(data, dict) else data
+    if not isinstance(items, list):
+        return jsonify({"error": "Expected a list of operations"}), 400
+    if len(items) > BATCH_MAX_ITEMS:
+        return jsonify({"error": f"Batch too large: at most {BATCH_MAX_ITEMS} operations"}), 400
+
+    # Parse every item and group identical problems by their canonical key
+    entries = []
+    unique = {}
+    for index, item in enumerate(items):
+        parse_started = time.perf_counter()
+        try:
+            operation, solver, args = prepare_operation(item)
+            key = make_key(operation, args)
+        except OperationError as e:
+            entries.append({"index": index, "error": str(e), "status": e.status})
+            continue
+        except Exception as e:
+            entries.append({"index": index, "error": f"Server error: {str(e)}", "status": 500})
+            continue
+        parse_ms = (time.perf_counter() - parse_started) * 1000
+        if key in unique:
+            entries.append({"index": index, "key": key, "parse_ms": parse_ms,
+                            "duplicate_of": unique[key][0]})
         else:
-            return jsonify({"error": f"Unknown operation: {operation}"}), 400
-            
+            unique[key] = (index, operation, solver, args)
+            entries.append({"index": index, "key": key, "parse_ms": parse_ms})
+
+    # Fan the distinct problems out across the solver pool
+    workers = max(1, get_engine().stats().get("workers", 1))
+    with ThreadPoolExecutor(max_workers=min(workers, max(1, len(unique)))) as pool:
+        futures = {key: pool.submit(_timed_solve, operation, solver, args)
+                   for key, (_, operation, solver, args) in unique.items()}
+        solved = {key: future.result() for key, future in futures.items()}
+
+    results = []
+    for entry in entries:
+        key = entry.pop("key", None)
+        if key is not None:
+            body, status, solve_ms = solved[key]
+            entry.update(body)
+            entry["status"] = status
+            entry["parse_ms"] = round(entry["parse_ms"], 3)
+            entry["solve_ms"] = round(solve_ms, 3) if "duplicate_of" not in entry else 0.0
+        results.append(entry)
+
+    return jsonify({
+        "results": results,
+        "count": len(results),
+        "unique": len(unique),
+        "total_ms": round((time.perf_counter() - started) * 1000, 3),
+    })
+
+@app.route('/jobs', methods=['POST'])
+def submit_job():
+    """
+    Queue a /calculate payload and return its job id straight away (202).
+    Poll GET /jobs/<id> or stream GET /jobs/<id>/events for progress and the result.
+    """
+    try:
+        operation, solver, args = prepare_operation(request.get_json(silent=True))
+        job = jobs.submit(operation, solver, args)
+    except OperationError as e:
+        return jsonify({"error": str(e)}), e.status
+    except JobQueueFull as e:
+        return jsonify({"error": str(e)}), 503
     except Exception as e:
-        print(f"Error: {str(e)}")
+        logger.exception("could not queue job")
         return jsonify({"error": f"Server error: {str(e)}"}), 500
+    response = jsonify(jobs.get(job.id))
+    response.headers["Location"] = f"/jobs/{job.id}"
+    return response, 202
+
+@app.route('/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    snapshot = jobs.get(job_id)
+    if snapshot is None:
+        return jsonify({"error": "Unknown or expired job"}), 404
+    return jsonify(snapshot)
+
+@app.route('/jobs/<job_id>/events', methods=['GET'])
+def job_events(job_id):
+    """Server-sent events: the job's state on every change, ending after the final one"""
+    snapshot = jobs.get(job_id)
+    if snapshot is None:
+        return jsonify({"error": "Unknown or expired job"}), 404
+
+    def stream():
+        version = None
+        while True:
+            snapshot, new_version = jobs.wait(job_id, version, JOB_EVENTS_KEEPALIVE)
+            if snapshot is None:
+                return
+            if new_version == version:
+                yield ": keep-alive\n\n"
+                continue
+            version = new_version
+            yield f"event: {snapshot['status']}\ndata: {json.dumps(snapshot)}\n\n"
+            if snapshot["status"] in ("done", "failed"):
+                return
+
+    return Response(stream(), mimetype="text/event-stream", headers={"Cache-Control": "no-cache"})
+
+@app.route('/jobs/stats', methods=['GET'])
+def job_stats():
+    return jsonify(jobs.stats())
+
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    """Prometheus-style request counters, stage histograms and cache/engine gauges"""
+    cache = result_cache.stats()
+    engine = get_engine().stats()
+    parse_stats = parse_cache_stats()
+    parse, latex = parse_stats["expressions"], parse_stats["latex"]
+    job = jobs.stats()
+    extra = [
+        ("calc3_result_cache_hits_total", "counter", "Result cache hits.", cache["hits"]),
+        ("calc3_result_cache_misses_total", "counter", "Result cache misses.", cache["misses"]),
+        ("calc3_result_cache_entries", "gauge", "Entries in the result cache.", cache["size"]),
+        ("calc3_parse_cache_hits_total", "counter", "Parse cache hits.", parse["hits"]),
+        ("calc3_parse_cache_misses_total", "counter", "Parse cache misses.", parse["misses"]),
+        ("calc3_derivative_cache_hits_total", "counter", "Derivative cache hits, summed over solver workers.",
+         registry.get_count("derivative_cache_hits")),
+        ("calc3_derivative_cache_misses_total", "counter", "Derivative cache misses, summed over solver workers.",
+         registry.get_count("derivative_cache_misses")),
+        ("calc3_latex_fast_path_total", "counter", "LaTeX inputs handled by the fast parser.", latex["fast_path"]),
+        ("calc3_latex_antlr_total", "counter", "LaTeX inputs handled by the ANTLR parser.", latex["antlr"]),
+        ("calc3_engine_queue_depth", "gauge", "Requests waiting for a solver worker.", engine.get("queue_depth", 0)),
+        ("calc3_engine_busy_workers", "gauge", "Solver workers running a job.", engine.get("busy", 0)),
+        ("calc3_engine_workers", "gauge", "Size of the solver worker pool.", engine.get("workers", 0)),
+        ("calc3_engine_cancelled_total", "counter", "Solver jobs cancelled after losing a race.", engine.get("cancelled", 0)),
+        ("calc3_jobs_queued", "gauge", "Async jobs waiting to run.", job["queued"]),
+        ("calc3_jobs_running", "gauge", "Async jobs running.", job["running"]),
+        ("calc3_jobs_rejected_total", "counter", "Async jobs refused because the queue was full.", job["rejected"]),
+    ]
+    return Response(registry.render(extra), mimetype="text/plain; version=0.0.4")
+
+def derivative_cache_stats():
+    """Derivative cache hits/misses reported back by the solver workers"""
+    hits, misses = registry.get_count("derivative_cache_hits"), registry.get_count("derivative_cache_misses")
+    lookups = hits + misses
+    return {"hits": hits, "misses": misses, "hit_rate": round(hits / lookups, 4) if lookups else 0.0}
+
+@app.route('/cache/stats', methods=['GET'])
+def cache_stats():
+    return jsonify({**result_cache.stats(), "parse": parse_cache_stats(), "derivatives": derivative_cache_stats()})
+
+@app.route('/engine/stats', methods=['GET'])
+def engine_stats():
+    return jsonify(get_engine().stats())
+
+@app.route('/cache/clear', methods=['POST'])
+def cache_clear():
+    result_cache.clear()
+    return jsonify(result_cache.stats())
 
 if __name__ == '__main__':
     app.run(debug=True, port=5000)
@@ -0,0 +1,251 @@
+"""
+Benchmark every /calculate operation without running the server.
+
+Each corpus problem is parsed with the same dispatch table the API uses
+(operations.prepare_operation) and solved inline. Time is split into parse
+(parser.py), solve (calc3.py) and cleanup (clean_trig_result) and reported per
+operation as p50/p95 latency, together with peak traced memory. Output is JSON
+so runs before and after a change (or a SymPy upgrade) can be diffed.
+
+    cd backend
+    python benchmarks/calculate.py --repeat 5 --output before.json
+    python benchmarks/calculate.py --repeat 5 --compare before.json
+"""
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timezone
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import sympy
+from sympy.core.cache import clear_cache
+
+import calc3
+import derivatives
+import parser
+from operations import prepare_operation
+
+
+# (case name, /calculate payload); plain and LaTeX variants of each operation
+CORPUS = [
+    ("partial_derivative/plain", {"operation": "partial_derivative", "function": "x^2*sin(y) + exp(x*y)", "variables": "x"}),
+    ("partial_derivative/hessian_taylor", {"operation": "partial_derivative", "function": "exp(x)*cos(y) + x^2*y^3", "variables": "x, y", "order": 3, "hessian": True, "taylor": {"point": "0, 0", "degree": 4}}),
+    ("partial_derivative/latex", {"operation": "partial_derivative", "function": "\\frac{x^{3}}{y}+\\sin{x}", "variables": "y"}),
+    ("double_integral/plain", {"operation": "double_integral", "function": "x*y^2", "variables": "x,y", "limits": "0,1,0,2"}),
+    ("double_integral/auto_order", {"operation": "double_integral", "function": "x*exp(x*y)", "variables": "x,y", "limits": "0,1,0,1", "integration_order": "auto"}),
+    ("double_integral/latex", {"operation": "double_integral", "function": "\\int_{0}^{1}\\int_{0}^{x} x y \\, dy \\, dx"}),
+    ("double_integral_polar/plain", {"operation": "double_integral_polar", "function": "r^3*cos(theta)^2", "limits": "0,1,0,2*pi"}),
+    ("triple_integral/plain", {"operation": "triple_integral", "function": "x + y + z", "limits": "0,1,0,1,0,1"}),
+    ("triple_integral/latex", {"operation": "triple_integral", "function": "x\\cdot y\\cdot z", "limits": "0,1,0,2,0,3"}),
+    ("triple_integral_cylindrical/plain", {"operation": "triple_integral_cylindrical", "function": "r*z", "limits": "0,2,0,2*pi,0,1"}),
+    ("region_integral/disk", {"operation": "region_integral", "function": "exp(-x^2-y^2)", "region": {"type": "disk", "radius": 1}}),
+    ("region_integral/ball", {"operation": "region_integral", "function": "z^2", "region": {"type": "ball", "radius": 1}}),
+    ("arc_length/plain", {"operation": "arc_length", "parametric": "cos(t), sin(t), t", "parameter": "t", "limits": "0,2*pi"}),
+    ("arc_length/latex", {"operation": "arc_length", "parametric": "t^{2}, \\frac{2}{3}t^{3}", "parameter": "t", "limits": "0,1"}),
+    ("arc_length/ellipse", {"operation": "arc_length", "parametric": "2*cos(t), sin(t)", "parameter": "t", "limits": "0,2*pi"}),
+    ("arc_length/segments", {"operation": "arc_length", "segments": [{"parametric": "t, 0", "limits": "0,1"}, {"parametric": "1, t^2", "limits": "0,1"}]}),
+    ("gradient/plain", {"operation": "gradient", "function": "x^2*y + sin(z)*cos(x)", "variables": "x,y,z", "point": "1,2,0"}),
+    ("gradient/latex", {"operation": "gradient", "function": "\\sqrt{x^{2}+y^{2}}", "variables": "x,y"}),
+    ("divergence/plain", {"operation": "divergence", "vector_field": "x^2*y, sin(y)*z, exp(z)*x"}),
+    ("divergence/latex", {"operation": "divergence", "vector_field": "\\frac{x}{y}, y^{2}, \\cos{z}"}),
+    ("curl/plain", {"operation": "curl", "vector_field": "y*z, x*z, x*y*sin(z)"}),
+    ("scalar_line_integral/plain", {"operation": "scalar_line_integral", "function": "x + y", "curve": "t, t", "limits": "0,1"}),
+    ("vector_line_integral/plain", {"operation": "vector_line_integral", "vector_field": "-y, x", "curve": "cos(t), sin(t)", "limits": "0,2*pi"}),
+    ("surface_integral/sphere_area", {"operation": "surface_integral", "vector_field": "1", "surface": "2*sin(u)*cos(v), 2*sin(u)*sin(v), 2*cos(u)", "u_bounds": "0,pi", "v_bounds": "0,2*pi"}),
+    ("surface_integral/torus_flux", {"operation": "surface_integral", "vector_field": "x, y, z", "surface": "(3+cos(u))*cos(v), (3+cos(u))*sin(v), sin(u)", "u_bounds": "0,2*pi", "v_bounds": "0,2*pi"}),
+    # The u limits depend on v, so neither parameter may be reflected or halved (area 2, y-moment 2/3)
+    ("surface_integral/dependent_limits", {"operation": "surface_integral", "vector_field": "1", "surface": "u, v, 0", "u_bounds": "0,v+1", "v_bounds": "-1,1"}),
+    ("surface_integral/dependent_limits_moment", {"operation": "surface_integral", "vector_field": "y", "surface": "u, v, 0", "u_bounds": "0,v+1", "v_bounds": "-1,1"}),
+    # |ru x rv| = |u - 1/20| changes sign between sign samples; the area is 181/400
+    ("surface_integral/sign_change", {"operation": "surface_integral", "vector_field": "1", "surface": "u^2/2 - u/20, v, 0", "u_bounds": "0,1", "v_bounds": "0,1"}),
+    ("surface_integral/plain", {"operation": "surface_integral", "vector_field": "x, y, z", "surface": "u, v, 1-u-v", "u_bounds": "0,1", "v_bounds": "0,1"}),
+    ("directional_derivative/plain", {"operation": "directional_derivative", "function": "x*y*sin(x)", "direction": "1,1", "point": "1,2"}),
+    ("directional_derivative/latex", {"operation": "directional_derivative", "function": "x^{2}y+e^{x}", "direction": "3,4"}),
+    ("curl/grid40", {"operation": "curl", "vector_field": "sin(x*y)*exp(z), x*z^2, y*cos(z)", "grid": [[0, 1, 40], [0, 1, 40], [0, 1, 40]], "encoding": "base64"}),
+    ("gradient_field/grid100", {"operation": "gradient_field", "function": "exp(-x^2-y^2)*sin(x*y)", "variables": "x,y", "grid": [[-2, 2, 100], [-2, 2, 100]], "encoding": "base64"}),
+    ("directional_derivative_field/points", {"operation": "directional_derivative_field", "function": "x*y*sin(x)", "direction": "1,1", "points": [[i / 10, 1 - i / 10] for i in range(50)]}),
+    ("greens_theorem/plain", {"operation": "greens_theorem", "vector_field": "-y*x^2, x*y^2", "x_bounds": "0,1", "y_bounds": "0,2"}),
+    ("greens_theorem/type_one", {"operation": "greens_theorem", "vector_field": "-y*x^2, x*y^2", "y_bounds": "x^2,x"}),
+    ("greens_theorem/polygon", {"operation": "greens_theorem", "vector_field": "-y*x^2, x*y^2", "region": {"type": "polygon", "vertices": [[0, 0], [2, 0], [2, 2], [1, 1], [0, 2]]}}),
+    ("stokes_theorem/plain", {"operation": "stokes_theorem", "vector_field": "-y, x, z", "surface": "u*cos(v), u*sin(v), 0", "u_bounds": "0,1", "v_bounds": "0,2*pi"}),
+    ("stokes_theorem/dependent_limits", {"operation": "stokes_theorem", "vector_field": "0, x, 0", "surface": "u, v, 0", "u_bounds": "0,v+1", "v_bounds": "-1,1"}),
+    ("stokes_theorem/race", {"operation": "stokes_theorem", "vector_field": "-y^3, x^3, 0", "surface": "2*sin(u)*cos(v), 2*sin(u)*sin(v), 2*cos(u)", "u_bounds": "0,pi/2", "v_bounds": "0,2*pi", "cross_check": "race"}),
+    ("lagrange_multipliers/plain", {"operation": "lagrange_multipliers", "function": "x*y", "constraint": "x+y=2"}),
+    ("lagrange_multipliers/3d", {"operation": "lagrange_multipliers", "function": "x+2*y+3*z", "constraint": "x^2+y^2+z^2=1"}),
+    ("lagrange_multipliers/quartic", {"operation": "lagrange_multipliers", "function": "x^3+y^3+z^3+x*y*z", "constraint": "x^4+y^4+z^4=1"}),
+    ("lagrange_multipliers/two_constraints", {"operation": "lagrange_multipliers", "function": "x^2+y^2+z^2", "constraints": ["x+y+z=1", "x-y=0"]}),
+]
+
+
+def percentile(values, q):
+    """Linear-interpolated percentile, q in [0, 100]"""
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    position = (len(ordered) - 1) * q / 100
+    lower = int(position)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (position - lower)
+
+
+def summarize(samples):
+    return {
+        "p50": round(percentile(samples, 50), 3),
+        "p95": round(percentile(samples, 95), 3),
+        "mean": round(sum(samples) / len(samples), 3),
+    }
+
+
+def reset_caches():
+    """Start from cold SymPy, parse, kernel and derivative caches so every sample does the full work"""
+    clear_cache()
+    parser.parse_sympy.cache_clear()
+    parser._parse_integral_latex.cache_clear()
+    calc3._compiled_field.cache_clear()
+    calc3._integrate_stage.cache_clear()
+    derivatives._derivative.cache_clear()
+
+
+def run_case(payload):
+    """Run one payload; returns (result, parse_ms, solve_ms, cleanup_ms)"""
+    cleanup_time = 0.0
+    clean_trig_result = calc3.clean_trig_result
+
+    def timed_cleanup(*args, **kwargs):
+        nonlocal cleanup_time
+        started = time.perf_counter()
+        try:
+            return clean_trig_result(*args, **kwargs)
+        finally:
+            cleanup_time += time.perf_counter() - started
+
+    started = time.perf_counter()
+    operation, solver, args = prepare_operation(dict(payload))
+    parse_time = time.perf_counter() - started
+
+    calc3.clean_trig_result = timed_cleanup
+    try:
+        started = time.perf_counter()
+        result = solver(*args)
+        solver_time = time.perf_counter() - started
+    finally:
+        calc3.clean_trig_result = clean_trig_result
+    return result, parse_time * 1000, (solver_time - cleanup_time) * 1000, cleanup_time * 1000
+
+
+def peak_memory_kb(payload):
+    reset_caches()
+    tracemalloc.start()
+    try:
+        run_case(payload)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return round(peak / 1024, 1)
+
+
+def benchmark(repeat, warm, only=None):
+    cases = {}
+    for name, payload in CORPUS:
+        if only and not name.startswith(only):
+            continue
+        # One untimed run loads lazily imported SymPy modules
+        result = run_case(payload)[0]
+        samples = {"parse_ms": [], "solve_ms": [], "cleanup_ms": [], "total_ms": []}
+        for _ in range(repeat):
+            if not warm:
+                reset_caches()
+            result, parse_ms, solve_ms, cleanup_ms = run_case(payload)
+            samples["parse_ms"].append(parse_ms)
+            samples["solve_ms"].append(solve_ms)
+            samples["cleanup_ms"].append(cleanup_ms)
+            samples["total_ms"].append(parse_ms + solve_ms + cleanup_ms)
+        cases[name] = {
+            "operation": payload["operation"],
+            "result": result if isinstance(result, (str, list, dict)) else str(result),
+            "peak_memory_kb": peak_memory_kb(payload),
+            "samples": samples,
+        }
+        print(f"{name:<36} p50 {percentile(samples['total_ms'], 50):>9.2f} ms", file=sys.stderr)
+
+    # Aggregate cases into per-operation statistics
+    operations = {}
+    for name, case in cases.items():
+        entry = operations.setdefault(case["operation"], {
+            "cases": [], "peak_memory_kb": 0.0,
+            "parse_ms": [], "solve_ms": [], "cleanup_ms": [], "total_ms": [],
+        })
+        entry["cases"].append(name)
+        entry["peak_memory_kb"] = max(entry["peak_memory_kb"], case["peak_memory_kb"])
+        for stage, values in case["samples"].items():
+            entry[stage].extend(values)
+    for entry in operations.values():
+        for stage in ("parse_ms", "solve_ms", "cleanup_ms", "total_ms"):
+            entry[stage] = summarize(entry[stage])
+    for case in cases.values():
+        case["samples"] = {stage: summarize(values) for stage, values in case["samples"].items()}
+
+    return {
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "sympy": sympy.__version__,
+            "platform": platform.platform(),
+            "repeat": repeat,
+            "warm_caches": warm,
+        },
+        "operations": dict(sorted(operations.items())),
+        "cases": cases,
+    }
+
+
+def compare(report, baseline_path):
+    """Print p50/p95 ratios of this run against a saved report, and any case whose result changed"""
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    print(f"{'operation':<30}{'p50 before':>12}{'p50 now':>10}{'ratio':>8}{'p95 before':>12}{'p95 now':>10}{'ratio':>8}",
+          file=sys.stderr)
+    for operation, stats in report["operations"].items():
+        before = baseline.get("operations", {}).get(operation)
+        if not before:
+            continue
+        row = f"{operation:<30}"
+        for q in ("p50", "p95"):
+            old, new = before["total_ms"][q], stats["total_ms"][q]
+            row += f"{old:>12.2f}{new:>10.2f}{(new / old if old else 0):>7.2f}x"
+        print(row, file=sys.stderr)
+
+    # A faster run is no use if the answer moved
+    for name, case in report["cases"].items():
+        before = baseline.get("cases", {}).get(name)
+        if before and before["result"] != case["result"]:
+            print(f"result changed: {name}: {before['result']!r} -> {case['result']!r}", file=sys.stderr)
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    arg_parser.add_argument("--repeat", type=int, default=5, help="timed samples per problem")
+    arg_parser.add_argument("--warm", action="store_true", help="keep SymPy and parse caches between samples")
+    arg_parser.add_argument("--only", help="run only cases whose name starts with this prefix")
+    arg_parser.add_argument("--output", help="write the JSON report here instead of stdout")
+    arg_parser.add_argument("--compare", help="print ratios against a previous JSON report")
+    options = arg_parser.parse_args()
+
+    report = benchmark(options.repeat, options.warm, options.only)
+    if options.compare:
+        compare(report, options.compare)
+    if options.output:
+        with open(options.output, "w") as f:
+            json.dump(report, f, indent=2, sort_keys=True)
+    else:
+        json.dump(report, sys.stdout, indent=2, sort_keys=True)
+        print()
+
+
+if __name__ == "__main__":
+    main()
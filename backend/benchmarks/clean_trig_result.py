@@ -0,0 +1,240 @@
+"""
+Compare the tiered clean_trig_result against the original implementation.
+
+Runs every operation in the corpus with each version patched into calc3 and
+reports mean time per call (whole solve and cleanup alone), the speedup, and
+whether the outputs are identical or at least mathematically equivalent.
+
+    cd backend
+    python benchmarks/clean_trig_result.py [--repeat N]
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sympy import sympify, trigsimp, simplify, Piecewise, log, E, exp
+
+from sympy.core.cache import clear_cache
+
+import calc3
+import derivatives
+
+
+def legacy_clean_trig_result(result, debug=False):
+    """clean_trig_result as it was before the tiered rewrite, kept for comparison"""
+    from sympy import log, E, exp, ln
+    if debug:
+        print(f"DEBUG: Original result: {result}")
+    
+    # First, apply symbolic substitutions to preserve exact forms
+    try:
+        # Replace log(e) with 1 symbolically
+        result = result.subs(log(E), 1)
+        if debug:
+            print(f"DEBUG: After log(E) -> 1 substitution: {result}")
+            
+        # Also handle log(exp(1)) -> 1
+        result = result.subs(log(exp(1)), 1)
+        if debug:
+            print(f"DEBUG: After log(exp(1)) -> 1 substitution: {result}")
+            
+    except Exception as e:
+        if debug:
+            print(f"DEBUG: Failed symbolic substitution: {e}")
+        pass
+    
+    # Apply trigonometric simplification (preserves exact forms)
+    try:
+        result = trigsimp(result)
+        if debug:
+            print(f"DEBUG: After trigsimp(): {result}")
+    except:
+        pass
+    
+    # Apply general simplification (preserves exact forms)
+    try:
+        result = simplify(result)
+        if debug:
+            print(f"DEBUG: After simplify(): {result}")
+    except:
+        pass
+    
+    # Handle piecewise functions - extract the most likely case
+    try:
+        if isinstance(result, Piecewise):
+            if debug:
+                print(f"DEBUG: Found piecewise function: {result}")
+            # For piecewise functions, try to get the first valid expression
+            # This works for cases like Piecewise((e - 1, (e > 0) & Ne(e, 1)), (1, True))
+            # where the first case is the correct one for normal mathematical constants
+            for expr, condition in result.args:
+                if debug:
+                    print(f"DEBUG: Piecewise case: expr={expr}, condition={condition}")
+                # Take the first non-trivial expression
+                if expr != 0 and expr != 1:
+                    result = expr
+                    if debug:
+                        print(f"DEBUG: Selected piecewise expression: {result}")
+                    break
+            else:
+                # If no non-trivial expression found, take the first one
+                if result.args:
+                    result = result.args[0][0]
+                    if debug:
+                        print(f"DEBUG: Selected first piecewise expression: {result}")
+    except Exception as e:
+        if debug:
+            print(f"DEBUG: Failed piecewise handling: {e}")
+        pass
+
+    # Convert to string for pattern-based cleanup
+    result_str = str(result)
+    if debug:
+        print(f"DEBUG: Result string: '{result_str}'")
+    
+    # Apply string-based replacements for patterns that SymPy might miss
+    replacements = {
+        'log(e)': '1',
+        'log(E)': '1',
+        '*log(e)': '',  # Remove *log(e) completely
+        '*log(E)': '',  # Remove *log(E) completely
+        'log(e)*': '',  # Remove log(e)* completely
+        'log(E)*': '',  # Remove log(E)* completely
+        # Trigonometric constants
+        'sin(pi)': '0',
+        'sin(2*pi)': '0', 
+        'sin(-pi)': '0',
+        'cos(pi)': '-1',
+        'cos(2*pi)': '1',
+        'cos(-pi)': '-1',
+        'sin(0)': '0',
+        'cos(0)': '1',
+        'sin(pi)**2': '0',
+        'cos(pi)**2': '1'
+    }
+    
+    # Apply string replacements
+    original_str = result_str
+    for pattern, replacement in replacements.items():
+        if pattern in result_str:
+            result_str = result_str.replace(pattern, replacement)
+            if debug:
+                print(f"DEBUG: Replaced '{pattern}' with '{replacement}'")
+    
+    # If we made string replacements, convert back to sympy expression
+    if result_str != original_str:
+        try:
+            result = sympify(result_str)
+            if debug:
+                print(f"DEBUG: After string replacement: {result}")
+        except Exception as e:
+            if debug:
+                print(f"DEBUG: Failed to sympify after string replacement: {e}")
+            # If sympify fails, keep the original result
+            pass
+    
+    if debug:
+        print(f"DEBUG: Final result: {result}")
+    
+    return result
+
+
+CORPUS = [
+    ("partial_derivative", calc3.solve_partial_derivative, ("x^2*sin(y) + exp(x*y)", ["x"], 1)),
+    ("partial_derivative_poly", calc3.solve_partial_derivative, ("x^3*y^2 + 4*x*y - y^3", ["x", "y"], 2)),
+    ("double_integral", calc3.solve_multiple_integral, ("x*y", [("x", "0", "1"), ("y", "0", "2")])),
+    ("double_integral_exp", calc3.solve_multiple_integral, ("e**x", [("x", "0", "1"), ("y", "0", "1")])),
+    ("double_integral_polar", calc3.solve_multiple_integral, ("r**3*cos(theta)**2", [("r", "0", "1"), ("theta", "0", "2*pi")])),
+    ("triple_integral", calc3.solve_multiple_integral, ("x + y + z", [("x", "0", "1"), ("y", "0", "1"), ("z", "0", "1")])),
+    ("arc_length", calc3.solve_arc_length, (["cos(t)", "sin(t)", "t"], "t", "0", "2*pi")),
+    ("gradient", calc3.solve_gradient, ("x^2*y + sin(z)*cos(x)", ["x", "y", "z"], None)),
+    ("gradient_poly", calc3.solve_gradient, ("x^2*y*z + x*y^3 - z^2", ["x", "y", "z"], None)),
+    ("divergence", calc3.solve_divergence, (["x^2*y", "sin(y)*z", "exp(z)*x"], ["x", "y", "z"])),
+    ("divergence_rational", calc3.solve_divergence, (["x/(x + y)", "y/(x + y)", "z^2"], ["x", "y", "z"])),
+    ("curl", calc3.solve_curl, (["y*z", "x*z", "x*y*sin(z)"], ["x", "y", "z"])),
+    ("vector_line_integral", calc3.solve_line_integral, (["-y", "x"], "t", ["cos(t)", "sin(t)"], [0, "2*pi"])),
+    ("scalar_line_integral", calc3.solve_line_integral, ("x + y", "t", ["t", "t"], [0, 1])),
+    ("surface_integral", calc3.solve_surface_integral, (["x", "y", "z"], ["u", "v"], ["u", "v", "1-u-v"], [(0, 1), (0, 1)])),
+    ("directional_derivative", calc3.solve_directional_derivative, ("x*y*sin(x)", ["x", "y"], [1, 1], [1, 2])),
+    ("greens_theorem", calc3.solve_greens_theorem, (["-y*x^2", "x*y^2"], [(0, 1), (0, 2)], ["x", "y"])),
+    ("stokes_theorem", calc3.solve_stokes_theorem, (["-y", "x", "z"], ["u", "v"], ["u*cos(v)", "u*sin(v)", "0"], [(0, 1), (0, "2*pi")])),
+    ("lagrange_multipliers", calc3.solve_lagrange_multipliers, ("x*y", "x + y - 2", ["x", "y"])),
+]
+
+
+def run(solver, args, cleaner, repeat):
+    """Mean seconds per solver call and per cleanup call with `cleaner` patched in"""
+    cleanup_time = 0.0
+
+    def timed_cleaner(*cleaner_args, **kwargs):
+        nonlocal cleanup_time
+        started = time.perf_counter()
+        try:
+            return cleaner(*cleaner_args, **kwargs)
+        finally:
+            cleanup_time += time.perf_counter() - started
+
+    calc3.clean_trig_result = timed_cleaner
+    total_time = 0.0
+    for _ in range(repeat):
+        # SymPy memoizes simplify() internally; start every run cold
+        clear_cache()
+        derivatives._derivative.cache_clear()
+        started = time.perf_counter()
+        result = solver(*[list(a) if isinstance(a, list) else a for a in args])
+        total_time += time.perf_counter() - started
+    return result, total_time / repeat, cleanup_time / repeat
+
+
+def equivalent(old, new):
+    """Outputs are strings, lists or dicts of strings/numbers; compare them symbolically"""
+    if isinstance(old, (list, tuple)) and isinstance(new, (list, tuple)):
+        return len(old) == len(new) and all(equivalent(a, b) for a, b in zip(old, new))
+    if isinstance(old, dict) and isinstance(new, dict):
+        return old.keys() == new.keys() and all(equivalent(old[k], new[k]) for k in old)
+    try:
+        return simplify(sympify(old) - sympify(new)) == 0
+    except Exception:
+        return str(old) == str(new)
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    arg_parser.add_argument("--repeat", type=int, default=5, help="timed runs per operation")
+    options = arg_parser.parse_args()
+
+    tiered = calc3.clean_trig_result
+    totals = [0.0, 0.0, 0.0, 0.0]
+    mismatches = 0
+    print(f"{'operation':<24}{'old ms':>10}{'new ms':>10}{'old clean':>11}{'new clean':>11}{'speedup':>9}  output")
+    try:
+        for name, solver, args in CORPUS:
+            old_result, old_time, old_clean = run(solver, args, legacy_clean_trig_result, options.repeat)
+            new_result, new_time, new_clean = run(solver, args, tiered, options.repeat)
+            if str(old_result) == str(new_result):
+                same = "same"
+            elif equivalent(old_result, new_result):
+                same = "equivalent"
+            else:
+                same = "DIFFERENT"
+                mismatches += 1
+            for i, value in enumerate((old_time, new_time, old_clean, new_clean)):
+                totals[i] += value
+            print(f"{name:<24}{old_time * 1000:>10.2f}{new_time * 1000:>10.2f}"
+                  f"{old_clean * 1000:>11.2f}{new_clean * 1000:>11.2f}"
+                  f"{old_time / new_time:>8.2f}x  {same}")
+            if same != "same":
+                print(f"    old: {old_result}\n    new: {new_result}")
+    finally:
+        calc3.clean_trig_result = tiered
+    old_time, new_time, old_clean, new_clean = totals
+    print(f"{'total':<24}{old_time * 1000:>10.2f}{new_time * 1000:>10.2f}"
+          f"{old_clean * 1000:>11.2f}{new_clean * 1000:>11.2f}{old_time / new_time:>8.2f}x")
+    return 1 if mismatches else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
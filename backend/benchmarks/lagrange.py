@@ -0,0 +1,114 @@
+"""
+Compare the Groebner-basis path for polynomial Lagrange systems against solve().
+
+Runs each problem through solve_lagrange_multipliers twice, once with the
+Groebner path and once with polynomial systems sent to solve() as before, and
+reports mean time, which method produced the answer and whether both found the
+same critical points. Both runs keep the usual symbolic time budget, so a
+solve() that runs out of time shows up as a numeric answer; such a reference
+may miss points, so finding a superset of it is not counted as a mismatch.
+Exits with status 1 when any problem disagrees.
+
+    cd backend
+    python benchmarks/lagrange.py [--repeat N]
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sympy.core.cache import clear_cache
+
+import calc3
+import derivatives
+from parser import parse_sympy
+
+
+CORPUS = [
+    ("product_line", "x*y", ["x+y-2"], ["x", "y"]),
+    ("product_circle", "x*y", ["x^2+y^2-2"], ["x", "y"]),
+    ("quartic_circle", "x^4+y^4", ["x^2+y^2-1"], ["x", "y"]),
+    ("linear_sphere", "x+2*y+3*z", ["x^2+y^2+z^2-1"], ["x", "y", "z"]),
+    ("box_volume", "x*y*z", ["x+y+z-1"], ["x", "y", "z"]),
+    ("distance_plane", "(x-1)^2+(y-2)^2+(z-3)^2", ["x+y+z-1"], ["x", "y", "z"]),
+    ("cubic_ellipsoid", "x^3+y^2*z", ["x^2+2*y^2+3*z^2-1"], ["x", "y", "z"]),
+    ("two_constraints", "x^2+y^2+z^2", ["x+y+z-1", "x-y"], ["x", "y", "z"]),
+    # Repeated roots in the Groebner basis must not repeat critical points
+    ("quartic_line", "x^4", ["x+y-1"], ["x", "y"]),
+    ("cubic_circle", "y^3", ["x^2+y^2-1"], ["x", "y"]),
+    ("cubic_quartic", "x^3+y^3+z^3+x*y*z", ["x^4+y^4+z^4-1"], ["x", "y", "z"]),
+]
+
+
+def run(function, constraints, variables, groebner, repeat):
+    """Mean seconds per call and the last result, with the Groebner path on or off"""
+    calc3.LAGRANGE_GROEBNER = groebner
+    f = parse_sympy(function)
+    g = [parse_sympy(c) for c in constraints]
+    g = g[0] if len(g) == 1 else tuple(g)
+    total = 0.0
+    for _ in range(repeat):
+        clear_cache()
+        derivatives._derivative.cache_clear()
+        started = time.perf_counter()
+        result = calc3.solve_lagrange_multipliers(f, g, variables)
+        total += time.perf_counter() - started
+    return result, total / repeat
+
+
+def points(result, variables):
+    """Critical points as a sorted list of rounded coordinate tuples"""
+    if not isinstance(result, list):
+        return []
+    return sorted(tuple(round(s[v], 4) if isinstance(s[v], float) else s[v] for v in variables) for s in result)
+
+
+def methods(result):
+    if not isinstance(result, list):
+        return "error"
+    return ",".join(sorted({s["method"] for s in result}))
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    arg_parser.add_argument("--repeat", type=int, default=3, help="timed runs per problem")
+    options = arg_parser.parse_args()
+
+    enabled = calc3.LAGRANGE_GROEBNER
+    mismatches = 0
+    partial = 0
+    totals = [0.0, 0.0]
+    print(f"{'problem':<18}{'solve ms':>10}{'groebner ms':>13}{'speedup':>9}  {'points':>7}  methods (solve / groebner)")
+    try:
+        for name, function, constraints, variables in CORPUS:
+            old_result, old_time = run(function, constraints, variables, False, options.repeat)
+            new_result, new_time = run(function, constraints, variables, True, options.repeat)
+            old_points, new_points = points(old_result, variables), points(new_result, variables)
+            if old_points == new_points:
+                found = f"{len(new_points):>7}"
+            elif "numeric" in methods(old_result) and set(old_points) < set(new_points):
+                # solve() ran out of time and multi-start Newton missed some points Groebner found
+                found = f"{len(old_points):>3}/{len(new_points):<2}*"
+                partial += 1
+            else:
+                found = f"{len(old_points):>3}/{len(new_points):<3}"
+                mismatches += 1
+            totals[0] += old_time
+            totals[1] += new_time
+            print(f"{name:<18}{old_time * 1000:>10.1f}{new_time * 1000:>13.1f}{old_time / new_time:>8.1f}x  "
+                  f"{found}  {methods(old_result)} / {methods(new_result)}")
+    finally:
+        calc3.LAGRANGE_GROEBNER = enabled
+    print(f"{'total':<18}{totals[0] * 1000:>10.1f}{totals[1] * 1000:>13.1f}{totals[0] / totals[1]:>8.1f}x")
+    if partial:
+        print(f"* {partial} numeric reference(s) found a subset of the Groebner points")
+    if mismatches:
+        print(f"{mismatches} problem(s) found different critical points (shown as solve/groebner counts)")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,84 @@
+"""
+Compare the hand-written LaTeX fast path against SymPy's ANTLR parser.
+
+Parses each input cold through parse_sympy with the fast path on and off and
+reports mean time per input, which parser handled it and whether both gave the
+same expression.
+
+    cd backend
+    python benchmarks/latex.py [--repeat N]
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sympy.core.cache import clear_cache
+
+import parser
+
+
+CORPUS = [
+    r"\frac{1}{2}x^{2}+\sin\left(x\right)",
+    r"\sqrt{x^2+y^2}",
+    r"e^{-x^2}\cos(y)",
+    r"\sin^{2} x+\cos^{2} x",
+    r"\arctan(y/x)",
+    r"\log_{2} x+\ln(x y)",
+    r"\frac{x}{y}+\frac12",
+    r"2\pi r\cdot\theta",
+    r"\sqrt[3]{x}\tan(x)^2",
+    r"\int_{0}^{1}\int_{0}^{2} x y \, dx \, dy",
+    r"e^{x}",  # brace-only input: previously fell through to symbols("e^{x}")
+    r"|x|+y",
+    r"\frac{d}{dx} x^2",
+]
+
+
+def run(latex, fast, repeat):
+    """Mean seconds per cold parse and the parsed expression"""
+    parser.LATEX_FAST_PATH = fast
+    total = 0.0
+    for _ in range(repeat):
+        clear_cache()
+        parser.parse_sympy.cache_clear()
+        started = time.perf_counter()
+        result = parser.parse_sympy(latex)
+        total += time.perf_counter() - started
+    return result, total / repeat
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    arg_parser.add_argument("--repeat", type=int, default=20, help="timed parses per input")
+    options = arg_parser.parse_args()
+
+    enabled = parser.LATEX_FAST_PATH
+    run(CORPUS[0], False, 1)  # build the ANTLR tables outside the timings
+    mismatches = 0
+    totals = [0.0, 0.0]
+    print(f"{'input':<44}{'antlr ms':>10}{'fast ms':>9}{'speedup':>9}  parser  same")
+    try:
+        for latex in CORPUS:
+            before = parser.parse_cache_stats()["latex"]["fast_path"]
+            new_result, new_time = run(latex, True, options.repeat)
+            used = "fast" if parser.parse_cache_stats()["latex"]["fast_path"] > before else "antlr"
+            old_result, old_time = run(latex, False, options.repeat)
+            same = new_result == old_result
+            mismatches += not same
+            totals[0] += old_time
+            totals[1] += new_time
+            print(f"{latex:<44}{old_time * 1000:>10.3f}{new_time * 1000:>9.3f}{old_time / new_time:>8.1f}x  "
+                  f"{used:<6}  {'yes' if same else 'NO'}")
+    finally:
+        parser.LATEX_FAST_PATH = enabled
+    print(f"{'total':<44}{totals[0] * 1000:>10.3f}{totals[1] * 1000:>9.3f}{totals[0] / totals[1]:>8.1f}x")
+    if mismatches:
+        print(f"{mismatches} input(s) parsed differently")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
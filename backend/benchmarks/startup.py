@@ -0,0 +1,109 @@
+"""
+Measure backend startup: import time per module and time to first request.
+
+Import times come from `python -X importtime -c "import app"`. Time to first
+request starts a fresh interpreter, imports app and posts one /calculate through
+Flask's test client, so it covers imports plus waiting for the first solver
+worker. Each solver start method is timed, together with how long a replacement
+worker takes to come up (the pool runs with one job per worker here, so every
+job recycles one). Exits with status 1 when the default start method misses the
+--budget.
+
+    cd backend
+    python benchmarks/startup.py [--budget SECONDS] [--workers N]
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import re
+import subprocess
+import sys
+import time
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Third-party packages reported next to the backend's own modules
+PACKAGES = ("flask", "flask_cors", "sympy", "numpy", "antlr4")
+
+FIRST_REQUEST = """
+import json, time
+import app
+imported = time.perf_counter()
+client = app.app.test_client()
+payload = {"operation": "partial_derivative", "function": "x^2*sin(y)", "variables": "x"}
+response = client.post("/calculate", json=payload)
+answered = time.perf_counter()
+client.post("/calculate", json={**payload, "variables": "y"})
+engine = app.get_engine()
+deadline = time.monotonic() + 60
+while time.monotonic() < deadline:
+    stats = engine.stats()
+    if stats.get("idle") == stats.get("workers"):
+        break
+    time.sleep(0.01)
+print(json.dumps({"imported": imported, "answered": answered, "status": response.status_code,
+                  "engine": engine.stats()}))
+"""
+
+
+def import_times():
+    """Cumulative import milliseconds of the backend's modules and main packages"""
+    local = {name[:-3] for name in os.listdir(BACKEND) if name.endswith(".py")}
+    output = subprocess.run([sys.executable, "-X", "importtime", "-c", "import app"],
+                            cwd=BACKEND, capture_output=True, text=True, check=True).stderr
+    times = {}
+    for line in output.splitlines():
+        match = re.match(r"import time:\s+\d+ \|\s+(\d+) \|( *)(\S+)", line)
+        if match and (match.group(3) in local or match.group(3) in PACKAGES):
+            times[match.group(3)] = int(match.group(1)) / 1000
+    return times
+
+
+def first_request(start_method, workers):
+    """Seconds from interpreter launch to import done and to first response, plus engine stats"""
+    env = {**os.environ, "CALC3_ENGINE_WORKERS": str(workers), "CALC3_ENGINE_MAX_JOBS": "1",
+           "CALC3_ENGINE_START_METHOD": start_method, "CALC3_LOG_LEVEL": "WARNING"}
+    launched = time.perf_counter()
+    output = subprocess.run([sys.executable, "-c", FIRST_REQUEST], cwd=BACKEND, env=env,
+                            capture_output=True, text=True, check=True).stdout
+    result = json.loads(output.strip().splitlines()[-1])
+    # perf_counter is system-wide on Linux/macOS, so the child's readings line up with ours
+    return result["imported"] - launched, result["answered"] - launched, result
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    arg_parser.add_argument("--budget", type=float, default=5.0,
+                            help="max seconds to first response with the default start method")
+    arg_parser.add_argument("--workers", type=int, default=2, help="solver workers per process")
+    options = arg_parser.parse_args()
+
+    print("import time (cumulative ms)")
+    for name, ms in sorted(import_times().items(), key=lambda item: -item[1]):
+        print(f"  {name:<14}{ms:>9.1f}")
+
+    sys.path.insert(0, BACKEND)
+    from engine import _default_start_method
+    default = _default_start_method()
+    methods = [m for m in ("spawn", "forkserver") if m in multiprocessing.get_all_start_methods()]
+
+    print(f"\n{'start method':<14}{'import s':>10}{'first request s':>17}{'worker start ms':>17}{'respawn ms':>12}")
+    failed = False
+    for method in methods:
+        imported, answered, result = first_request(method, options.workers)
+        engine = result["engine"]
+        marker = " (default)" if method == default else ""
+        print(f"{method:<14}{imported:>10.2f}{answered:>17.2f}{engine['mean_start_ms']:>17.1f}"
+              f"{engine['last_start_ms']:>12.1f}{marker}")
+        if method == default and (result["status"] != 200 or answered > options.budget):
+            failed = True
+    if failed:
+        print(f"FAIL: first request with {default} took longer than {options.budget:g}s or did not succeed")
+        return 1
+    print(f"OK: first request with {default} within {options.budget:g}s")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,175 @@
+import ctypes
+import signal
+import threading
+import time
+from contextlib import contextmanager
+
+
+class BudgetExceeded(BaseException):
+    """
+    Raised inside a time_budget block when it runs out of time.
+    Derives from BaseException so SymPy's `except Exception` handlers don't swallow it.
+    `budget` is the Budget that expired, so nested blocks can tell whose it was.
+    """
+
+    def __init__(self, budget):
+        super().__init__(f"Time budget of {budget.seconds:g}s exceeded")
+        self.budget = budget
+
+
+class Budget:
+    def __init__(self, seconds):
+        self.seconds = seconds
+        self.expired = False
+        # Set once its BudgetExceeded has actually been raised (thread budgets only)
+        self.delivered = False
+
+
+def _on_main_thread():
+    return hasattr(signal, "setitimer") and threading.current_thread() is threading.main_thread()
+
+
+def _can_interrupt_threads():
+    return hasattr(ctypes, "pythonapi") and hasattr(ctypes.pythonapi, "PyThreadState_SetAsyncExc")
+
+
+def _set_async_exception(thread_id, exception):
+    """Have thread_id raise exception (a class) at its next bytecode; None withdraws a pending one"""
+    ctypes.pythonapi.PyThreadState_SetAsyncExc(ctypes.c_ulong(thread_id),
+                                               ctypes.py_object(exception) if exception else None)
+
+
+def _expiry(budget):
+    # Async exceptions are raised by class, so bind the budget into one. It is
+    # instantiated when it lands, which is what marks the budget delivered.
+    class Expired(BudgetExceeded):
+        def __init__(self):
+            super().__init__(budget)
+            budget.delivered = True
+    return Expired
+
+
+_threads = threading.local()
+
+
+def _thread_state():
+    """This thread's open thread budgets (outermost first) and the lock guarding its async exception"""
+    if not hasattr(_threads, "stack"):
+        _threads.stack = []
+        _threads.lock = threading.Lock()
+    return _threads.stack, _threads.lock
+
+
+def _leave_thread_budget(budget, thread_id, stack, lock):
+    """Close budget; safe to repeat if an expiry lands part way through"""
+    with lock:
+        if budget in stack:
+            stack.remove(budget)
+        if budget.expired and not budget.delivered:
+            # Fired as the block was finishing and not raised yet: the block made it
+            _set_async_exception(thread_id, None)
+        # A thread holds one pending async exception, so an enclosing budget's may
+        # have been replaced by this one's (or just withdrawn): raise it again
+        for outer in stack:
+            if outer.expired and not outer.delivered:
+                _set_async_exception(thread_id, _expiry(outer))
+                break
+
+
+@contextmanager
+def _thread_budget(budget):
+    """
+    time_budget off the main thread (request threads when solvers run inline): a
+    timer raises BudgetExceeded in this thread through PyThreadState_SetAsyncExc.
+    Like SIGALRM it lands between bytecodes, so a single long C call still runs
+    to its end. Nested budgets each keep their own timer.
+    """
+    thread_id = threading.get_ident()
+    stack, lock = _thread_state()
+
+    def expire():
+        with lock:
+            if budget in stack:
+                budget.expired = True
+                _set_async_exception(thread_id, _expiry(budget))
+
+    with lock:
+        stack.append(budget)
+    timer = threading.Timer(budget.seconds, expire)
+    timer.daemon = True
+    timer.start()
+    try:
+        yield budget
+    finally:
+        timer.cancel()
+        landed = None
+        while True:
+            try:
+                _leave_thread_budget(budget, thread_id, stack, lock)
+                break
+            except BudgetExceeded as e:
+                # An expiry raised during cleanup: finish cleaning up, then let it propagate
+                landed = e
+        if landed is not None:
+            raise landed
+
+
+def can_enforce_budget():
+    """Whether time_budget can interrupt code running on this thread"""
+    return _on_main_thread() or _can_interrupt_threads()
+
+
+@contextmanager
+def time_budget(seconds):
+    """
+    Interrupt the enclosed block with BudgetExceeded after `seconds` of wall-clock time.
+    On the main thread of a POSIX process (solver engine workers) this uses
+    SIGALRM; nested budgets keep the tighter deadline and restore the outer one
+    on exit. On other threads (CALC3_ENGINE_WORKERS=0) it uses _thread_budget.
+    Where neither is available (can_enforce_budget() is False) it is a no-op.
+    """
+    budget = Budget(seconds)
+    if not seconds or seconds <= 0 or not can_enforce_budget():
+        yield budget
+        return
+    if not _on_main_thread():
+        with _thread_budget(budget):
+            yield budget
+        return
+
+    outer_remaining = signal.getitimer(signal.ITIMER_REAL)[0]
+    if outer_remaining and outer_remaining < seconds:
+        # The enclosing budget expires first; let it fire on its own
+        yield budget
+        return
+
+    def on_alarm(signum, frame):
+        budget.expired = True
+        raise BudgetExceeded(budget)
+
+    started = time.monotonic()
+    previous_handler = signal.signal(signal.SIGALRM, on_alarm)
+    signal.setitimer(signal.ITIMER_REAL, seconds)
+    try:
+        yield budget
+    finally:
+        signal.setitimer(signal.ITIMER_REAL, 0)
+        signal.signal(signal.SIGALRM, previous_handler)
+        if outer_remaining:
+            # Re-arm the outer budget with whatever time it has left
+            left = outer_remaining - (time.monotonic() - started)
+            signal.setitimer(signal.ITIMER_REAL, max(left, 1e-3))
+
+
+def within_budget(seconds, func, *args, **kwargs):
+    """
+    Call func under a time budget. Returns (True, value) when it finishes and
+    (False, None) when this budget ran out; an enclosing budget's expiry propagates.
+    """
+    try:
+        with time_budget(seconds) as budget:
+            return True, func(*args, **kwargs)
+    except BudgetExceeded as e:
+        if e.budget is not budget:
+            raise
+        return False, None
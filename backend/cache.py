@@ -0,0 +1,120 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from sympy import sympify, srepr, Basic
+
+
+def canonical_form(value):
+    """
+    Convert parsed solver inputs into a hashable canonical form.
+    Strings are sympified so 'x^2 + y' and 'y + x**2' map to the same key.
+    """
+    if isinstance(value, Basic):
+        return srepr(value)
+    if isinstance(value, str):
+        try:
+            return srepr(sympify(value))
+        except Exception:
+            # Not a math expression (e.g. a variable name SymPy rejects)
+            return value
+    if isinstance(value, (list, tuple)):
+        return tuple(canonical_form(v) for v in value)
+    if isinstance(value, dict):
+        return tuple(sorted((str(k), canonical_form(v)) for k, v in value.items()))
+    return repr(value)
+
+
+def make_key(operation, args):
+    """Build the cache key for an operation and its parsed arguments"""
+    return (operation, canonical_form(args))
+
+
+def is_error_result(result):
+    """Error results are not cached so transient failures can be retried"""
+    if isinstance(result, str):
+        return result.startswith("Error")
+    if isinstance(result, dict):
+        return "error" in result
+    if isinstance(result, list) and result:
+        return isinstance(result[0], str) and result[0].startswith("Error")
+    return False
+
+
+class ResultCache:
+    """Thread-safe LRU cache with per-entry TTL and hit/miss counters"""
+
+    def __init__(self, max_size=1024, ttl=3600):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        """Return (found, value) for key, refreshing its LRU position"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                value, expires_at = entry
+                if expires_at is None or expires_at > time.monotonic():
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return True, value
+                # Expired entry
+                del self._entries[key]
+                self.evictions += 1
+            self.misses += 1
+            return False, None
+
+    def set(self, key, value):
+        if self.max_size <= 0:
+            return
+        expires_at = time.monotonic() + self.ttl if self.ttl else None
+        with self._lock:
+            self._entries[key] = (value, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            }
+
+
+result_cache = ResultCache(
+    max_size=int(os.environ.get("CALC3_CACHE_SIZE", "1024")),
+    ttl=float(os.environ.get("CALC3_CACHE_TTL", "3600")),
+)
+
+
+def cached_solve(operation, solver, *args, runner=None):
+    """
+    Run solver(*args) through the shared result cache.
+    runner(operation, solver, args) can be given to control how a miss is executed.
+    """
+    key = make_key(operation, args)
+    found, value = result_cache.get(key)
+    if found:
+        return value
+    result = runner(operation, solver, args) if runner else solver(*args)
+    if not is_error_result(result):
+        result_cache.set(key, result)
+    return result
@@ -1,196 +1,313 @@
-from sympy import symbols, Matrix, diff, sympify, integrate, sqrt, solve, Eq, Integral, sin, cos, pi, simplify, trigsimp, Piecewise
-def clean_trig_result(result, debug=False):
-    """Clean up mathematical expressions without forcing numeric evaluation"""
-    from sympy import log, E, exp, ln
-    if debug:
-        print(f"DEBUG: Original result: {result}")
-    
-    # First, apply symbolic substitutions to preserve exact forms
+import os
+from functools import lru_cache
+
+from sympy import symbols, Matrix, sympify, integrate, sqrt, solve, Eq, Integral, sin, cos, pi, simplify, trigsimp, Piecewise
+from sympy import Basic, Dummy, Symbol, S, log, count_ops, cancel, expand, lambdify, Poly, PolynomialError
+from sympy import factor as sympy_factor
+from sympy import FiniteSet, Interval, Mul, solveset
+from sympy.calculus.util import continuous_domain
+from sympy.functions.elementary.trigonometric import TrigonometricFunction
+
+from budget import time_budget, within_budget, BudgetExceeded
+from derivatives import derivative, mixed_partial, gradient, jacobian, hessian, divergence, curl, taylor_polynomial
+from fields import build_points, compile_components, evaluate_components, field_result, KERNEL_CACHE_SIZE
+from logs import get_logger
+from metrics import report_progress, timed
+from numeric import numeric_multiple_integral, newton_multistart, tangent_hessian_eigenvalues, quad_1d, format_decimal
+from polynomial import groebner_real_solutions
+from regions import describe, reflections, counterclockwise, polygon_pieces, R, RHO
+from surfaces import recognize, periodic_parameters
+
+# solve_* functions take expressions either as strings or as pre-parsed SymPy
+# objects (see parser.parse_sympy); sympify() passes the latter through untouched.
+
+logger = get_logger("calc3")
+
+# Expressions with more operations than this skip the general simplify() pass
+SIMPLIFY_MAX_OPS = 300
+# Seconds allowed for each of the expensive simplification passes
+SIMPLIFY_BUDGET = 2.0
+
+# Parsed input writes Euler's number as the plain symbol e, so log(e) survives evaluation
+_LOG_E = log(Symbol('e'))
+
+def _bounded_pass(name, simplifier, result, debug=False):
+    """Run one simplification pass under SIMPLIFY_BUDGET, keeping the input if it fails"""
     try:
-        # Replace log(e) with 1 symbolically
-        result = result.subs(log(E), 1)
-        if debug:
-            print(f"DEBUG: After log(E) -> 1 substitution: {result}")
-            
-        # Also handle log(exp(1)) -> 1
-        result = result.subs(log(exp(1)), 1)
-        if debug:
-            print(f"DEBUG: After log(exp(1)) -> 1 substitution: {result}")
-            
+        with timed(f"cleanup.{name}"):
+            finished, simplified = within_budget(SIMPLIFY_BUDGET, simplifier, result)
     except Exception as e:
         if debug:
-            print(f"DEBUG: Failed symbolic substitution: {e}")
-        pass
-    
-    # Apply trigonometric simplification (preserves exact forms)
-    try:
-        result = trigsimp(result)
+            logger.debug(f"{name}() failed: {e}")
+        return result
+    if not finished:
         if debug:
-            print(f"DEBUG: After trigsimp(): {result}")
-    except:
-        pass
-    
-    # Apply general simplification (preserves exact forms)
-    try:
-        result = simplify(result)
+            logger.debug(f"{name}() exceeded {SIMPLIFY_BUDGET}s, skipped")
+        return result
+    if debug:
+        logger.debug(f"After {name}(): {simplified}")
+    return simplified
+
+def clean_trig_result(result, debug=False):
+    """
+    Clean up mathematical expressions without forcing numeric evaluation.
+    Cheap structural checks pick which passes run: numbers and symbols return
+    immediately, polynomials and rational functions get expand/cancel instead of
+    simplify, and expressions above SIMPLIFY_MAX_OPS only get trigsimp.
+    Time spent here is reported as the "cleanup" stage (and "cleanup.<pass>" for
+    each pass that ran), so request timings show what debug=True used to print.
+    """
+    with timed("cleanup"):
+        return _clean_trig_result(result, debug)
+
+def _clean_trig_result(result, debug):
+    if debug:
+        logger.debug(f"Original result: {result}")
+    if not isinstance(result, Basic):
+        result = sympify(result)
+
+    # Numbers, constants and bare symbols are already as simple as they get
+    if result.is_Atom:
+        return result
+
+    # Replace log(e) with 1 symbolically (log(E) and log(exp(1)) evaluate on their own)
+    if result.has(_LOG_E):
+        result = result.xreplace({_LOG_E: S.One})
         if debug:
-            print(f"DEBUG: After simplify(): {result}")
-    except:
-        pass
-    
+            logger.debug(f"After log(e) -> 1 substitution: {result}")
+        if result.is_Atom:
+            return result
+
+    # Polynomials only need expanding and rational functions only need their common
+    # factors cancelled; everything else gets the general simplification (preserves
+    # exact forms, and runs trigsimp itself) unless the expression is huge, in which
+    # case only the trigonometric pass is attempted
+    has_trig = result.has(TrigonometricFunction)
+    if result.free_symbols and not has_trig and result.is_polynomial():
+        result = _bounded_pass("expand", expand, result, debug)
+    elif result.free_symbols and not has_trig and result.is_rational_function():
+        result = _bounded_pass("cancel", cancel, result, debug)
+    elif count_ops(result) <= SIMPLIFY_MAX_OPS:
+        result = _bounded_pass("simplify", simplify, result, debug)
+    elif has_trig:
+        result = _bounded_pass("trigsimp", trigsimp, result, debug)
+    elif debug:
+        logger.debug(f"Skipping simplify() on expression with more than {SIMPLIFY_MAX_OPS} operations")
+
     # Handle piecewise functions - extract the most likely case
-    try:
-        if isinstance(result, Piecewise):
+    if isinstance(result, Piecewise):
+        if debug:
+            logger.debug(f"Found piecewise function: {result}")
+        # For piecewise functions, try to get the first valid expression
+        # This works for cases like Piecewise((e - 1, (e > 0) & Ne(e, 1)), (1, True))
+        # where the first case is the correct one for normal mathematical constants
+        for expr, condition in result.args:
             if debug:
-                print(f"DEBUG: Found piecewise function: {result}")
-            # For piecewise functions, try to get the first valid expression
-            # This works for cases like Piecewise((e - 1, (e > 0) & Ne(e, 1)), (1, True))
-            # where the first case is the correct one for normal mathematical constants
-            for expr, condition in result.args:
+                logger.debug(f"Piecewise case: expr={expr}, condition={condition}")
+            # Take the first non-trivial expression
+            if expr != 0 and expr != 1:
+                result = expr
                 if debug:
-                    print(f"DEBUG: Piecewise case: expr={expr}, condition={condition}")
-                # Take the first non-trivial expression
-                if expr != 0 and expr != 1:
-                    result = expr
-                    if debug:
-                        print(f"DEBUG: Selected piecewise expression: {result}")
-                    break
-            else:
-                # If no non-trivial expression found, take the first one
-                if result.args:
-                    result = result.args[0][0]
-                    if debug:
-                        print(f"DEBUG: Selected first piecewise expression: {result}")
-    except Exception as e:
-        if debug:
-            print(f"DEBUG: Failed piecewise handling: {e}")
-        pass
+                    logger.debug(f"Selected piecewise expression: {result}")
+                break
+        else:
+            # If no non-trivial expression found, take the first one
+            if result.args:
+                result = result.args[0][0]
+                if debug:
+                    logger.debug(f"Selected first piecewise expression: {result}")
 
-    # Convert to string for pattern-based cleanup
-    result_str = str(result)
-    if debug:
-        print(f"DEBUG: Result string: '{result_str}'")
-    
-    # Apply string-based replacements for patterns that SymPy might miss
-    replacements = {
-        'log(e)': '1',
-        'log(E)': '1',
-        '*log(e)': '',  # Remove *log(e) completely
-        '*log(E)': '',  # Remove *log(E) completely
-        'log(e)*': '',  # Remove log(e)* completely
-        'log(E)*': '',  # Remove log(E)* completely
-        # Trigonometric constants
-        'sin(pi)': '0',
-        'sin(2*pi)': '0', 
-        'sin(-pi)': '0',
-        'cos(pi)': '-1',
-        'cos(2*pi)': '1',
-        'cos(-pi)': '-1',
-        'sin(0)': '0',
-        'cos(0)': '1',
-        'sin(pi)**2': '0',
-        'cos(pi)**2': '1'
-    }
-    
-    # Apply string replacements
-    original_str = result_str
-    for pattern, replacement in replacements.items():
-        if pattern in result_str:
-            result_str = result_str.replace(pattern, replacement)
-            if debug:
-                print(f"DEBUG: Replaced '{pattern}' with '{replacement}'")
-    
-    # If we made string replacements, convert back to sympy expression
-    if result_str != original_str:
-        try:
-            result = sympify(result_str)
-            if debug:
-                print(f"DEBUG: After string replacement: {result}")
-        except Exception as e:
-            if debug:
-                print(f"DEBUG: Failed to sympify after string replacement: {e}")
-            # If sympify fails, keep the original result
-            pass
-    
     if debug:
-        print(f"DEBUG: Final result: {result}")
+        logger.debug(f"Final result: {result}")
     
     return result
 
-def solve_partial_derivative(expr: str, variables: list, order: int = 1) -> str:
+def solve_partial_derivative(expr: str, variables: list, order: int = 1, hessian_vars: list = None,
+                             taylor: tuple = None):
+    """
+    The partial derivative of expr with respect to each of variables in turn
+    (the last one repeated up to order). With hessian_vars and/or taylor
+    (variables, point, degree) the result is a dict that also holds the Hessian
+    matrix and the Taylor polynomial, all built from the same cached derivatives.
+    """
     try:
         expression = sympify(expr)
         
         if order and len(variables) < order:
-            variables += [variables[-1]] * (order - len(variables))
+            variables = variables + [variables[-1]] * (order - len(variables))
 
         differentiation_variables = [symbols(var) for var in variables]
         
         if not order :
-            derivative = expression
+            result = expression
         else:
-            derivative = diff(expression, *differentiation_variables)
+            result = mixed_partial(expression, differentiation_variables)
         
         # Clean up the result
-        derivative = clean_trig_result(derivative)
-        return str(derivative)
+        result = str(clean_trig_result(result))
+        if hessian_vars is None and taylor is None:
+            return result
+
+        response = {"derivative": result}
+        if hessian_vars is not None:
+            matrix = hessian(expression, symbols(list(hessian_vars)))
+            response["hessian_variables"] = list(hessian_vars)
+            # Clean each distinct entry once; the matrix is symmetric
+            cleaned = {entry: str(clean_trig_result(entry)) for entry in set(matrix)}
+            response["hessian"] = [[cleaned[entry] for entry in row] for row in matrix.tolist()]
+        if taylor is not None:
+            taylor_vars, point, degree = taylor
+            with timed("taylor"):
+                polynomial = taylor_polynomial(expression, symbols(list(taylor_vars)), [sympify(p) for p in point],
+                                               degree)
+            response["taylor"] = {"variables": list(taylor_vars), "point": [str(p) for p in point],
+                                  "degree": degree, "polynomial": str(polynomial)}
+        return response
 
     except Exception as e:
         return f"Error: {str(e)}"
 
-def solve_arc_length(exprs: list, param: str, a: str, b: str) -> str:
+# Decimal places in arc length results unless the request asks for a "precision"
+ARC_LENGTH_PRECISION = 5
+# Seconds of symbolic integration before an "auto" arc length goes numeric
+ARC_LENGTH_SYMBOLIC_BUDGET = float(os.environ.get("CALC3_ARC_LENGTH_SYMBOLIC_BUDGET", "2"))
+
+def _speed_pieces(speed2, t, a, b):
+    """
+    The speed sqrt(speed2) as (expression, lower, upper) pieces covering [a, b].
+    When speed2 is a polynomial in t its repeated factors come out of the root,
+    so a perfect square becomes a plain polynomial; the sign of what came out is
+    fixed on each piece between its real roots. Anything else is one piece.
+    """
+    whole = [(sqrt(speed2), a, b)]
     try:
-        # Convert parameter to symbol
-        t = symbols(param)
-        a = sympify(a)
-        b = sympify(b)
+        coeff, factors = Poly(speed2, t).sqf_list()
+    except PolynomialError:
+        return whole
+    root, rest = S.One, coeff
+    for factor, multiplicity in factors:
+        root *= factor.as_expr() ** (multiplicity // 2)
+        rest *= factor.as_expr() ** (multiplicity % 2)
+    if root == 1:
+        return whole
+    try:
+        cuts = sorted(r for r in Poly(root, t).real_roots() if bool(r > a) and bool(r < b))
+        bounds = list(zip([a] + cuts, cuts + [b]))
+        signs = [1 if bool(root.subs(t, (lower + upper) / 2).evalf() >= 0) else -1 for lower, upper in bounds]
+    except (TypeError, PolynomialError, NotImplementedError):
+        # Symbolic coefficients or limits: the sign of root is unknown
+        return whole
+    return [(sign * root * sqrt(rest), lower, upper) for sign, (lower, upper) in zip(signs, bounds)]
 
-        components = [sympify(expr) for expr in exprs]
-        derivatives = [diff(comp, t) for comp in components]
-        integrand = sqrt(sum(d**2 for d in derivatives))
+def _arc_length_segment(exprs, t, a, b, method, symbolic_timeout, places):
+    """
+    Length of one curve: ("exact", value) when a closed form was found in time
+    (or method is "symbolic"), otherwise ("numeric", value, error, details)
+    from numeric.quad_1d on the lambdified speed, one piece at a time.
+    """
+    components = [sympify(expr) for expr in exprs]
+    speed2 = expand(sum(derivative(comp, t)**2 for comp in components))
+    with timed("arc_length.speed"):
+        finished, simplified = within_budget(SIMPLIFY_BUDGET, trigsimp, speed2)
+    pieces = _speed_pieces(simplified if finished else speed2, t, a, b)
 
-        result = integrate(integrand, (t, a, b)).doit()
-        
-        # Handle different result types properly
-        if isinstance(result, Integral):
-            # If it's still an unevaluated integral, try numerical evaluation
-            try:
-                result = result.evalf()
-            except:
-                return f"Unevaluated integral: {str(result)}"
-        
-        # Try to get a numerical result
-        try:
-            # First try to evaluate symbolically
-            result = result.evalf()
-            
-            # Check if result is a number (not symbolic)
-            if result.is_number:
-                # If it's a number, we can round it
-                if result.is_real:
-                    # Round to 5 decimal places for real numbers
-                    return str(round(float(result), 5))
-                else:
-                    # For complex numbers, clean and return the symbolic form
-                    result = clean_trig_result(result)
-                    return str(result)
-            else:
-                # If it's still symbolic, clean and return as-is
-                result = clean_trig_result(result)
-                return str(result)
-        except:
-            # If evaluation fails, clean and return the symbolic result
-            result = clean_trig_result(result)
-            return str(result)
+    reason = None
+    if method != "numeric":
+        with timed("arc_length.symbolic"):
+            finished, exact = within_budget(symbolic_timeout if method == "auto" else None,
+                                            lambda: sum(integrate(e, (t, lo, hi)).doit() for e, lo, hi in pieces))
+        if method == "symbolic" or (finished and not exact.has(Integral)):
+            return ("exact", exact)
+        reason = "symbolic time budget exceeded" if not finished else "no closed form found"
 
+    value, error, details = 0, 0.0, {}
+    try:
+        with timed("arc_length.numeric"):
+            for e, lo, hi in pieces:
+                piece_value, piece_error, details = quad_1d(e, t, lo, hi, places)
+                value += piece_value
+                error += piece_error
+    except (TypeError, ValueError):
+        if method == "numeric" or not finished:
+            raise
+        # Free parameters in the curve or limits: keep the symbolic answer
+        return ("exact", exact)
+    if reason:
+        details = {**details, "reason": reason}
+    return ("numeric", value, error, details)
+
+def _format_length(outcome, places):
+    """Arc length result: a decimal string for exact values, a dict with error estimate for numeric ones"""
+    if outcome[0] == "numeric":
+        _, value, error, details = outcome
+        return {"value": format_decimal(value, places), "error_estimate": f"{error:.2e}", "method": "numeric", **details}
+    result = outcome[1]
+    if not result.has(Integral):
+        value = result.evalf(places + 15)
+        if value.is_number and value.is_real:
+            return format_decimal(value, places)
+    return str(clean_trig_result(result))
+
+def solve_arc_length(exprs: list, param: str, a: str, b: str, method: str = "auto",
+                     symbolic_timeout: float = ARC_LENGTH_SYMBOLIC_BUDGET, precision: int = ARC_LENGTH_PRECISION):
+    """
+    Length of the curve exprs(param) for param in [a, b], rounded to `precision`
+    decimal places. method: "auto" tries a closed form for symbolic_timeout
+    seconds (instant when the speed is a polynomial) and then integrates numerically,
+    returning a dict with an error estimate; "symbolic" and "numeric" force one path.
+    """
+    try:
+        t = symbols(param)
+        outcome = _arc_length_segment(exprs, t, sympify(a), sympify(b), method, symbolic_timeout, precision)
+        return _format_length(outcome, precision)
     except Exception as e:
+        logger.debug("solve_arc_length failed", exc_info=True)
         return f"Error: {str(e)}"
 
+def solve_piecewise_arc_length(segments: list, param: str, method: str = "auto",
+                               symbolic_timeout: float = ARC_LENGTH_SYMBOLIC_BUDGET,
+                               precision: int = ARC_LENGTH_PRECISION) -> dict:
+    """
+    Total length of a curve made of segments, each (exprs, a, b) in the same
+    parameter. Returns the total, each segment's length as solve_arc_length
+    would report it, and the indices of segments that don't start where the
+    previous one ended (checked numerically; the lengths are summed regardless).
+    """
+    try:
+        t = symbols(param)
+        outcomes, gaps, previous_end = [], [], None
+        for index, (exprs, a, b) in enumerate(segments):
+            a, b = sympify(a), sympify(b)
+            start = [sympify(e).subs(t, a) for e in exprs]
+            if previous_end is not None and len(start) == len(previous_end):
+                distance = sum((p - q)**2 for p, q in zip(start, previous_end)).evalf()
+                if distance.is_number and distance > 1e-18:
+                    gaps.append(index)
+            previous_end = [sympify(e).subs(t, b) for e in exprs]
+            outcomes.append(_arc_length_segment(exprs, t, a, b, method, symbolic_timeout, precision))
+            report_progress(stage="arc_length", completed=index + 1, total=len(segments))
+
+        result = {"segments": [_format_length(outcome, precision) for outcome in outcomes], "gaps": gaps}
+        if all(outcome[0] == "exact" for outcome in outcomes):
+            total = _format_length(("exact", sum(outcome[1] for outcome in outcomes)), precision)
+            return {"value": total, "method": "symbolic", **result}
+        value, error = 0, 0.0
+        for outcome in outcomes:
+            if outcome[0] == "numeric":
+                value += outcome[1]
+                error += outcome[2]
+            else:
+                value += outcome[1].evalf(precision + 15)
+        return {"value": format_decimal(value, precision), "error_estimate": f"{error:.2e}", "method": "numeric", **result}
+    except Exception as e:
+        logger.debug("solve_piecewise_arc_length failed", exc_info=True)
+        return {"error": f"Error: {str(e)}"}
+
 def solve_gradient(expr: str, variables: list, point: list = None) -> list[str]:
     try:
         expression = sympify(expr)
         sym_vars = [symbols(v) for v in variables]
-        grad = [clean_trig_result(diff(expression, var)) for var in sym_vars]
+        grad = [clean_trig_result(g) for g in gradient(expression, sym_vars)]
         if point is not None:
             # Evaluate the gradient at the given point
             point_values = {sym_vars[i]: point[i] for i in range(len(point))}
@@ -199,7 +316,79 @@ def solve_gradient(expr: str, variables: list, point: list = None) -> list[str]:
     except Exception as e:
         return f"Error: {str(e)}"
 
-def solve_multiple_integral(expr: str, limits: list) -> str:
+def solve_gradient_field(expr: str, variables: list, points: tuple, encoding: str = "json") -> dict:
+    """
+    Gradient at many points at once: differentiate once, then evaluate every
+    component over all points in a single vectorized NumPy pass.
+    points is a spec for fields.build_points (an explicit list or a grid).
+    """
+    try:
+        expression = sympify(expr)
+        sym_vars = [symbols(v) for v in variables]
+        grad = gradient(expression, sym_vars)
+        coords, shape = build_points(points, len(sym_vars))
+        values = evaluate_components(grad, sym_vars, coords)
+        return field_result("gradient", values, coords.shape[1], shape, encoding)
+    except Exception as e:
+        return {"error": f"Error: {str(e)}"}
+
+def _numeric_integral_result(expression, bounds, reason=None):
+    """Evaluate an integral numerically and package value plus error estimate"""
+    value, error, nodes = numeric_multiple_integral(expression, bounds)
+    result = {
+        "value": f"{value:.15g}",
+        "error_estimate": f"{error:.2e}",
+        "method": "numeric",
+        "nodes_per_dimension": nodes,
+    }
+    if reason:
+        result["reason"] = reason
+    return result
+
+# Antiderivative stages of iterated integrals kept per process
+INTEGRAL_STAGE_CACHE_SIZE = int(os.environ.get("CALC3_INTEGRAL_STAGE_CACHE_SIZE", "512"))
+
+@lru_cache(maxsize=INTEGRAL_STAGE_CACHE_SIZE)
+def _integrate_stage(integrand, var, lower, upper):
+    """
+    One stage of an iterated integral. Cached on the stage's own integrand and
+    limits, which already pin down every stage inside it, so a problem that is
+    resubmitted with different outer limits only redoes the outer stages.
+    """
+    integrated = integrate(integrand, (var, lower, upper))
+    # Force evaluation if it's still an Integral object
+    return integrated.doit() if hasattr(integrated, 'doit') else integrated
+
+def _stage_cost(expression, var):
+    """
+    Rough difficulty of integrating expression in var first: the part that
+    depends on var, with polynomial dependence counted as cheapest
+    """
+    _, dependent = expression.as_independent(var, as_Add=False)
+    return (0 if dependent.is_polynomial(var) else 1, count_ops(dependent))
+
+def _cheapest_order(expression, bounds):
+    """
+    With constant limits every order gives the same value (Fubini), so integrate
+    the variables with the simplest dependence first. Bounds that refer to other
+    integration variables keep the given order.
+    """
+    variables = {var for var, _, _ in bounds}
+    if any((a.free_symbols | b.free_symbols) & variables for _, a, b in bounds):
+        return bounds
+    return sorted(bounds, key=lambda bound: _stage_cost(expression, bound[0]))
+
+def solve_multiple_integral(expr: str, limits: list, method: str = "symbolic", symbolic_timeout: float = None,
+                            order: str = "given"):
+    """
+    Evaluate an iterated integral; limits run innermost first.
+    method: "symbolic" (default), "numeric" (Gauss-Legendre cubature, returns a dict
+    with value and error estimate) or "auto" (symbolic within symbolic_timeout seconds,
+    numeric if that runs out or leaves an unevaluated Integral).
+    order: "given" keeps the limits' order, "auto" reorders constant limits so
+    the cheapest variable is integrated first.
+    Each stage is cached (see _integrate_stage) and timed as "integrate.<variable>".
+    """
     try:        
         # Create symbols for all variables first
         all_vars = {}
@@ -207,71 +396,240 @@ def solve_multiple_integral(expr: str, limits: list) -> str:
             all_vars[var] = symbols(var)
         
         expression = sympify(expr, locals=all_vars)
+        bounds = [(all_vars[var], sympify(a, locals=all_vars), sympify(b, locals=all_vars))
+                  for var, a, b in limits]
+        if order == "auto":
+            bounds = _cheapest_order(expression, bounds)
+
+        if method == "numeric":
+            return _numeric_integral_result(expression, bounds)
+
+        integrand = expression
+        try:
+            with time_budget(symbolic_timeout if method == "auto" else None) as budget:
+                # Apply integrals in order: inner to outer
+                for done, (var_sym, a_sym, b_sym) in enumerate(bounds, 1):
+                    with timed(f"integrate.{var_sym}"):
+                        expression = _integrate_stage(expression, var_sym, a_sym, b_sym)
+                    report_progress(stage="integrate", variable=str(var_sym), completed=done, total=len(bounds))
+        except BudgetExceeded as e:
+            if e.budget is not budget:
+                raise
+            try:
+                return _numeric_integral_result(integrand, bounds, reason="symbolic time budget exceeded")
+            except ValueError as e:
+                return f"Error: Symbolic integration ran out of time and numeric fallback failed: {str(e)}"
+
+        if method == "auto" and expression.has(Integral):
+            try:
+                return _numeric_integral_result(integrand, bounds, reason="no closed form found")
+            except ValueError:
+                # Free parameters in the integrand: keep the symbolic answer
+                pass
         
-        # Apply integrals in order: outer to inner
-        for i, (var, a, b) in enumerate(limits):
-            var_sym = all_vars[var]
-            a_sym = sympify(a, locals=all_vars)
-            b_sym = sympify(b, locals=all_vars)
-            
-            # Perform the integration
-            integrated = integrate(expression, (var_sym, a_sym, b_sym))
-            
-            # Force evaluation if it's still an Integral object
-            if hasattr(integrated, 'doit'):
-                expression = integrated.doit()
-            else:
-                expression = integrated
-            
-        
-        # Final simplification
-        result = expression.simplify()
-        # Clean up log(e) and other expressions
-        result = clean_trig_result(result)
+        # One cleanup pass; clean_trig_result decides whether a full simplify() is worth it
+        report_progress(stage="simplify")
+        result = clean_trig_result(expression)
         
         final_str = str(result)
         return final_str
         
     except Exception as e:
-        print(f"DEBUG solve_multiple_integral: ERROR: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.debug("solve_multiple_integral failed", exc_info=True)
         return f"Error: {str(e)}"     
-print(solve_multiple_integral("e**x", [("x", "0", "1"), ("y", "0", "1")]))  
+
+# Seconds allowed to simplify the integrand in each candidate coordinate system
+REGION_TRANSFORM_BUDGET = float(os.environ.get("CALC3_REGION_TRANSFORM_BUDGET", "2"))
+
+def _is_odd(expression, var, image):
+    """True when expression changes sign under var -> image"""
+    return expand(expression + expression.subs(var, image)) == 0
+
+def _separate(integrand, limits):
+    """
+    Integrate out, one at a time, every variable whose share of the integrand
+    depends on nothing else and whose limits are independent of the rest (an
+    angle the integrand does not involve, or a separable product over a box).
+    Returns (constant factor, remaining integrand, remaining limits, {var: factor}).
+    """
+    factor = S.One
+    separated = {}
+    remaining = list(limits)
+    for bound in limits:
+        var, a, b = bound
+        others = [other for other in remaining if other is not bound]
+        if (a.free_symbols | b.free_symbols) & {v for v, _, _ in others}:
+            continue
+        if any(var in (lo.free_symbols | hi.free_symbols) for _, lo, hi in others):
+            continue
+        rest, dependent = integrand.as_independent(var, as_Add=False)
+        if dependent.free_symbols - {var}:
+            continue
+        value = _integrate_stage(dependent, var, a, b)
+        if value.has(Integral):
+            continue
+        factor *= value
+        separated[var] = value
+        integrand = rest
+        remaining = others
+    return factor, integrand, remaining, separated
+
+def _integration_cost(integrand, limits):
+    """Rough symbolic work: size of the integrand and limits plus one unit per stage"""
+    return count_ops(integrand) + sum(count_ops(a) + count_ops(b) for _, a, b in limits) + 2 * len(limits)
+
+def _region_candidate(expression, description):
+    """Transform the integrand into one description's coordinates and separate what it can"""
+    transformed = expression.subs(description.substitution) if description.substitution else expression
+    if description.substitution:
+        # Radii are never negative, so sqrt(r**2) can become r
+        radial = {var: Dummy(str(var), nonnegative=True) for var in (R, RHO) if var in transformed.free_symbols}
+        finished, simplified = within_budget(REGION_TRANSFORM_BUDGET, trigsimp, transformed.xreplace(radial))
+        if finished:
+            transformed = simplified.xreplace({dummy: var for var, dummy in radial.items()})
+    factor, integrand, limits, separated = _separate(transformed * description.jacobian, description.limits)
+    return {
+        "description": description,
+        "transformed": transformed,
+        "factor": factor,
+        "integrand": integrand,
+        "limits": limits,
+        "separated": separated,
+        "cost": _integration_cost(integrand, limits),
+    }
+
+def _symmetry_label(candidate):
+    """'spherical' or 'rotational' when the integrand ignores the angles of its coordinates"""
+    free = candidate["transformed"].free_symbols
+    names = {str(var) for var, _, _ in candidate["description"].limits}
+    if "phi" in names and not free & {Symbol("phi"), Symbol("theta")}:
+        return "spherical"
+    if "theta" in names and Symbol("theta") not in free:
+        return "rotational"
+    return None
+
+def solve_region_integral(expr, region: dict, variables: list, coordinates: str = "auto",
+                          method: str = "auto", symbolic_timeout: float = None):
+    """
+    Integrate over a described region (see regions.py) instead of explicit limits.
+    Each coordinate system the region can be written in is tried: the integrand
+    is transformed with the Jacobian, variables that separate (e.g. an angle the
+    integrand ignores) are integrated out on their own, and the candidate left
+    with the least symbolic work goes to solve_multiple_integral. An integrand
+    that is odd under a mirror symmetry of the region gives 0 straight away.
+    coordinates forces one system instead of "auto". Returns a dict with the
+    result and the transformation that was applied.
+    """
+    try:
+        sym_vars = [symbols(v) for v in variables]
+        expression = sympify(expr, locals=dict(zip(variables, sym_vars)))
+
+        if coordinates == "auto":
+            for var, image in reflections(region, sym_vars):
+                if _is_odd(expression, var, image):
+                    return {"result": "0", "coordinates": None, "symmetry": f"odd in {var}"}
+
+        descriptions = describe(region, sym_vars)
+        if coordinates != "auto":
+            descriptions = [d for d in descriptions if d.coordinates == coordinates]
+            if not descriptions:
+                return {"error": f"Error: a {region['type']} cannot be described in {coordinates} coordinates"}
+        candidates = []
+        for description in descriptions:
+            new_vars = {var for var, _, _ in description.limits} - set(sym_vars)
+            if new_vars & expression.free_symbols:
+                # The integrand already uses r, theta, ... as a parameter
+                continue
+            candidates.append(_region_candidate(expression, description))
+        if not candidates:
+            return {"error": "Error: the integrand uses the coordinate names r, theta, rho or phi as parameters"}
+
+        best = min(candidates, key=lambda c: c["cost"])
+        description = best["description"]
+        report_progress(stage="coordinates", coordinates=description.coordinates)
+        if best["limits"]:
+            limits = [(str(var), a, b) for var, a, b in best["limits"]]
+            result = solve_multiple_integral(best["factor"] * best["integrand"], limits, method,
+                                             symbolic_timeout, "auto")
+        else:
+            result = str(clean_trig_result(best["factor"] * best["integrand"]))
+
+        return {
+            "result": result,
+            "coordinates": description.coordinates,
+            "transformation": {str(k): str(v) for k, v in description.substitution.items()},
+            "jacobian": str(description.jacobian),
+            "integrand": str(best["transformed"] * description.jacobian),
+            "limits": [[str(var), str(a), str(b)] for var, a, b in description.limits],
+            "separated": {str(var): str(value) for var, value in best["separated"].items()},
+            "symmetry": _symmetry_label(best),
+            "costs": {c["description"].coordinates: c["cost"] for c in candidates},
+        }
+    except Exception as e:
+        logger.debug("solve_region_integral failed", exc_info=True)
+        return {"error": f"Error: {str(e)}"}
+
 # Divergence
-def solve_divergence(vector_field: list, variables: list) -> str:
+def _divergence(vector_field, variables):
+    components = [sympify(c) for c in vector_field]
+    sym_vars = [symbols(v) for v in variables]
+    div = divergence(components, sym_vars)
+    return clean_trig_result(div)
+
+def _curl(vector_field, variables):
+    components = curl([sympify(f) for f in vector_field], symbols(variables))
+
+    # Clean up each component
+    return [clean_trig_result(c) for c in components]
+
+@lru_cache(maxsize=KERNEL_CACHE_SIZE)
+def _compiled_field(kind, vector_field, variables):
+    """
+    Symbolic divergence or curl of a field plus its NumPy kernel. Cached on the
+    (hashable) field components, so repeated grid requests for the same field
+    skip differentiation, cleanup and lambdify.
+    """
+    exprs = [_divergence(vector_field, variables)] if kind == "divergence" else _curl(vector_field, variables)
+    return [str(e) for e in exprs], compile_components(exprs, symbols(variables))
+
+def _field_on_points(kind, vector_field, variables, points, encoding):
+    """Symbolic result plus its values over a point list or grid"""
+    symbolic, kernel = _compiled_field(kind, tuple(vector_field), tuple(variables))
+    coords, shape = build_points(points, len(variables))
+    values = kernel(coords)
+    scalar = kind == "divergence"
+    result = field_result("values", values, coords.shape[1], shape, encoding, scalar=scalar)
+    result[kind] = symbolic[0] if scalar else symbolic
+    return result
+
+def solve_divergence(vector_field: list, variables: list, points: tuple = None, encoding: str = "json"):
+    """
+    Symbolic divergence. When points (a fields.build_points spec) is given,
+    returns a dict with the symbolic result and its values at those points.
+    """
     try:
         if len(vector_field) != len(variables):
             return "Error: Vector field and variable count must match."
-        components = [sympify(c) for c in vector_field]
-        sym_vars = [symbols(v) for v in variables]
-        div = sum(diff(components[i], sym_vars[i]) for i in range(len(components)))
-        
-        # Clean up the result
-        div = clean_trig_result(div)
-        return str(div)
+        if points is not None:
+            return _field_on_points("divergence", vector_field, variables, points, encoding)
+        return str(_divergence(vector_field, variables))
     except Exception as e:
+        if points is not None:
+            return {"error": f"Error: {str(e)}"}
         return f"Error: {str(e)}"
 
 # Curl (for 3D only)
-def solve_curl(vector_field: list[str], variables: list[str]) -> list[str]:
+def solve_curl(vector_field: list[str], variables: list[str], points: tuple = None, encoding: str = "json"):
+    """Symbolic curl; with points, also evaluated there as in solve_divergence"""
     try:
         if len(vector_field) != 3 or len(variables) != 3:
             return ["Error: Curl is only defined for 3D vector fields."]
-        x, y, z = symbols(variables)
-        F1, F2, F3 = [sympify(f) for f in vector_field]
-
-        curl_x = diff(F3, y) - diff(F2, z)
-        curl_y = diff(F1, z) - diff(F3, x)
-        curl_z = diff(F2, x) - diff(F1, y)
-
-        # Clean up each component
-        curl_x = clean_trig_result(curl_x)
-        curl_y = clean_trig_result(curl_y)
-        curl_z = clean_trig_result(curl_z)
-
-        return [str(curl_x), str(curl_y), str(curl_z)]
+        if points is not None:
+            return _field_on_points("curl", vector_field, variables, points, encoding)
+        return [str(c) for c in _curl(vector_field, variables)]
     except Exception as e:
+        if points is not None:
+            return {"error": f"Error: {str(e)}"}
         return [f"Error: {str(e)}"]
 
 # Line integral 
@@ -280,11 +638,11 @@ def solve_line_integral(field, param: str, curve: list, bounds: list = [0, 1]) -
         t = symbols(param)
         a, b = bounds
         r = Matrix([sympify(f) for f in curve])
-        dr = r.diff(t)
+        dr = Matrix([derivative(c, t) for c in r])
         subs_map = {symbols(var): r[i] for i, var in enumerate('xyz'[:len(r)])}
 
         # Auto-detect field type
-        if isinstance(field, str):
+        if isinstance(field, (str, Basic)):
             # Scalar field: ∫ f(x, y, ...) ds
             f = sympify(field).subs(subs_map)
             magnitude = sqrt(sum(comp**2 for comp in dr))
@@ -308,39 +666,204 @@ def solve_line_integral(field, param: str, curve: list, bounds: list = [0, 1]) -
         return f"Error: {str(e)}"
 
 # Surface integral 
-def solve_surface_integral(field, params, surface, bounds, field_vars=("x", "y", "z")):
+# Seconds of symbolic work on a surface integral before "auto" goes numeric
+SURFACE_SYMBOLIC_BUDGET = float(os.environ.get("CALC3_SURFACE_SYMBOLIC_BUDGET", "5"))
+# Times a parameter interval may be halved by symmetry
+SURFACE_SYMMETRY_STEPS = 4
+def _factor_sign(factor, params, bounds):
+    """
+    +1 or -1 when factor provably keeps that sign (zeros allowed) on the
+    parameter rectangle, None when that can't be shown: it must depend on at
+    most one parameter, be continuous on its interval and have no root inside.
+    """
+    base, exponent = factor.as_base_exp()
+    if exponent.is_Integer and exponent.is_even:
+        return 1
+    if not exponent.is_Integer:
+        return 1 if base.is_nonnegative and factor.is_nonnegative else None
+    involved = [(p, lo, hi) for p, (lo, hi) in zip(params, bounds) if p in factor.free_symbols]
+    if not involved:
+        return 1 if factor.is_nonnegative else -1 if factor.is_nonpositive else None
+    if len(involved) > 1:
+        return None
+    p, lo, hi = involved[0]
+    interval = Interval(lo, hi)
+    if continuous_domain(factor, p, interval) != interval:
+        return None
+    roots = solveset(factor, p, Interval.open(lo, hi))
+    if not isinstance(roots, FiniteSet) or roots:
+        return None
+    middle = factor.subs(p, (lo + hi) / 2)
+    return 1 if middle.is_positive else -1 if middle.is_negative else None
+
+def _fixed_sign(part, params, bounds):
+    """
+    part, or -part, when part provably keeps one sign on the parameter
+    rectangle (factor by factor, see _factor_sign); Abs(part) otherwise. Other
+    symbols, such as a radius a, are taken to be positive.
+    """
+    positive = {s: Dummy(s.name, positive=True) for s in part.free_symbols - set(params)}
+
+    def sign():
+        total = 1
+        for factor in Mul.make_args(part.xreplace(positive)):
+            factor_sign = _factor_sign(factor, params, [(lo.xreplace(positive), hi.xreplace(positive))
+                                                        for lo, hi in bounds])
+            if factor_sign is None:
+                return None
+            total *= factor_sign
+        return total
+
     try:
-        u, v = symbols(params)
-        field_syms = symbols(field_vars)
-        r = Matrix([sympify(expr) for expr in surface])
-        ru = r.diff(u)
-        rv = r.diff(v)
-        normal_vector = ru.cross(rv)
-        normal_magnitude = sqrt(normal_vector.dot(normal_vector))
+        finished, proven = within_budget(SIMPLIFY_BUDGET, sign)
+    except Exception:
+        finished, proven = False, None
+    if not finished or proven is None:
+        return abs(part)
+    return part if proven > 0 else -part
+
+def _surface_element(normal, params, bounds):
+    """|ru x rv| with squared factors taken out of the square root (a sphere gives a**2*sin(phi))"""
+    squared = expand(normal.dot(normal))
+    finished, simplified = within_budget(SIMPLIFY_BUDGET, lambda e: sympy_factor(trigsimp(e)), squared)
+    if finished:
+        squared = simplified
+    root, rest = S.One, S.One
+    for base, exponent in squared.as_powers_dict().items():
+        if exponent.is_Integer and exponent >= 2:
+            root *= _fixed_sign(base ** (exponent // 2), params, bounds)
+            rest *= base ** (exponent % 2)
+        else:
+            rest *= base ** exponent
+    return root * sqrt(rest)
+
+def _shrink_by_symmetry(integrand, limits, closed):
+    """
+    Shrink each parameter's interval while the integrand allows it: odd under
+    the reflection about the midpoint gives 0 outright, even halves the interval
+    (and doubles the factor), and so does being unchanged by a half-period shift
+    while the interval is still a full period of the surface (closed).
+    Returns (factor, limits, notes).
+    """
+    factor, notes, limits = S.One, [], list(limits)
+    for index, (p, lower, upper) in enumerate(limits):
+        others = {q for q, _, _ in limits if q is not p}
+        if (lower.free_symbols | upper.free_symbols) & others:
+            continue
+        # Reflecting or halving p would also change a limit that depends on it
+        if any(p in (lo.free_symbols | hi.free_symbols) for q, lo, hi in limits if q is not p):
+            continue
+        periodic = p in closed
+        for _ in range(SURFACE_SYMMETRY_STEPS):
+            image = lower + upper - p
+            if _is_odd(integrand, p, image):
+                return S.Zero, limits, notes + [f"odd in {p}"]
+            if expand(integrand - integrand.subs(p, image)) == 0:
+                notes.append(f"even in {p}")
+                # The half interval is no longer a full period
+                periodic = False
+            elif periodic and expand(integrand.subs(p, p + (upper - lower) / 2) - integrand) == 0:
+                notes.append(f"half-period in {p}")
+            else:
+                break
+            upper = (lower + upper) / 2
+            factor *= 2
+        limits[index] = (p, lower, upper)
+    return factor, limits, notes
+
+def _parametric_surface_integral(integrand, params, bounds, method, symbolic_timeout, surface, closed):
+    """
+    Shared back end of solve_surface_integral and solve_stokes_theorem: simplify
+    the integrand once, shrink the domain by symmetry, integrate out separable
+    parameters, then hand the rest to solve_multiple_integral (symbolic within
+    symbolic_timeout, Gauss-Legendre cubature with an error estimate after that).
+    """
+    u, v = params
+    if method != "numeric":
+        with timed("surface.simplify"):
+            finished, simplified = within_budget(SIMPLIFY_BUDGET, trigsimp, integrand)
+        if finished:
+            integrand = simplified
+    limits = [(u, bounds[0][0], bounds[0][1]), (v, bounds[1][0], bounds[1][1])]
+    with timed("surface.symmetry"):
+        factor, limits, notes = _shrink_by_symmetry(integrand, limits, closed)
+    report_progress(stage="surface", surface=surface["type"] if surface else None, symmetry=notes)
+    if factor == 0:
+        return "0"
+
+    if method != "numeric":
+        with timed("surface.separate"):
+            finished, separated = within_budget(symbolic_timeout if method == "auto" else None,
+                                                _separate, integrand, limits)
+        if finished:
+            separated_factor, integrand, limits, _ = separated
+            factor *= separated_factor
+    if not limits:
+        return str(clean_trig_result(factor * integrand))
+
+    result = solve_multiple_integral(factor * integrand, [(str(var), a, b) for var, a, b in limits], method,
+                                     symbolic_timeout, "auto")
+    if isinstance(result, dict):
+        result.update({"surface": surface["type"] if surface else None, "symmetry": notes})
+    return result
+
+def _coordinate_substitutions(field_vars, r):
+    """
+    Field variable -> component of r. The payload parser passes only the
+    coordinates a field uses (["x", "z"], say), so x, y and z go by name.
+    """
+    if all(name in ("x", "y", "z") for name in field_vars):
+        return {symbols(name): r["xyz".index(name)] for name in field_vars}
+    return dict(zip(symbols(field_vars), r))
+
+def _surface_geometry(surface, params, bounds):
+    """r as a Matrix, ru x rv with each component simplified once, and what the surface is"""
+    u, v = symbols(params)
+    bounds = [(sympify(lo), sympify(hi)) for lo, hi in bounds]
+    r = Matrix([sympify(expr) for expr in surface])
+    tangents = jacobian(r, (u, v))
+    normal = tangents[:, 0].cross(tangents[:, 1])
+    with timed("surface.normal"):
+        finished, simplified = within_budget(SIMPLIFY_BUDGET, lambda n: n.applyfunc(lambda c: sympy_factor(trigsimp(c))),
+                                             normal)
+    if finished:
+        normal = simplified
+    finished, kind = within_budget(SIMPLIFY_BUDGET, recognize, list(r), (u, v))
+    closed = periodic_parameters(list(r), (u, v), bounds)
+    return (u, v), bounds, r, normal, kind if finished else None, closed
+
+def solve_surface_integral(field, params, surface, bounds, field_vars=("x", "y", "z"), method: str = "auto",
+                           symbolic_timeout: float = SURFACE_SYMBOLIC_BUDGET):
+    """
+    Flux of a vector field (F . (ru x rv)) or integral of a scalar field
+    (f |ru x rv|) over the surface r(u, v). The normal is simplified once, the
+    surface is recognized (sphere, torus, ...) and closed directions found, and
+    symmetry shrinks the domain before integrating; method and
+    symbolic_timeout work as in solve_multiple_integral.
+    """
+    try:
+        params, bounds, r, normal, kind, closed = _surface_geometry(surface, params, bounds)
 
         is_vector = isinstance(field, list) and len(field) == 3
-        is_scalar = isinstance(field, str) or (isinstance(field, list) and len(field) == 1)
+        is_scalar = isinstance(field, (str, Basic)) or (isinstance(field, list) and len(field) == 1)
 
-        substitutions = dict(zip(field_syms, r))
+        substitutions = _coordinate_substitutions(field_vars, r)
 
         if is_vector:
             F = Matrix([sympify(f) for f in field])
             F_sub = F.subs(substitutions)
-            integrand = F_sub.dot(normal_vector)
+            integrand = F_sub.dot(normal)
         elif is_scalar:
-            f = sympify(field if isinstance(field, str) else field[0])
+            f = sympify(field[0] if isinstance(field, list) else field)
             f_sub = f.subs(substitutions)
-            integrand = f_sub * normal_magnitude
+            integrand = f_sub * _surface_element(normal, params, bounds)
         else:
             return "Error: Could not determine field type (expected scalar or 3D vector)."
 
-        result = integrate(integrand, (u, bounds[0][0], bounds[0][1]), (v, bounds[1][0], bounds[1][1])).doit()
-        
-        # Clean up the result
-        result = clean_trig_result(result)
-        return str(result)
+        return _parametric_surface_integral(integrand, params, bounds, method, symbolic_timeout, kind, closed)
 
     except Exception as e:
+        logger.debug("solve_surface_integral failed", exc_info=True)
         return f"Error: {str(e)}"
     
 # Directional derivative    
@@ -351,7 +874,7 @@ def solve_directional_derivative(expr: str, variables: list, direction: list, po
         
         expression = sympify(expr)
         sym_vars = [symbols(v) for v in variables]
-        grad = Matrix([diff(expression, var) for var in sym_vars])
+        grad = Matrix(gradient(expression, sym_vars))
         dir_vector = Matrix(direction)
         magnitude = sqrt(sum(c**2 for c in dir_vector))
         if magnitude == 0:
@@ -373,207 +896,422 @@ def solve_directional_derivative(expr: str, variables: list, direction: list, po
     
     except Exception as e:
         return f"Error: {str(e)}"
-def solve_greens_theorem(vector_field: list, region_bounds: list, variables: list):
+def solve_directional_derivative_field(expr: str, variables: list, direction: list, points: tuple, encoding: str = "json") -> dict:
+    """Directional derivative along a fixed direction, evaluated at many points in one pass"""
     try:
-        x, y = symbols(variables)
+        if len(direction) != len(variables):
+            return {"error": "Error: Direction vector must match the number of variables."}
 
-        M = sympify(vector_field[0])
-        N = sympify(vector_field[1])
-        curl_2d = diff(N, x) - diff(M, y)
-        (x_lower, x_upper), (y_lower, y_upper) = region_bounds
-        result = integrate(integrate(curl_2d, (x, x_lower, x_upper)), (y, y_lower, y_upper))
+        expression = sympify(expr)
+        sym_vars = [symbols(v) for v in variables]
+        dir_vector = Matrix(direction)
+        magnitude = sqrt(sum(c**2 for c in dir_vector))
+        if magnitude == 0:
+            return {"error": "Error: Direction vector cannot be zero."}
 
-        # Clean up the result
-        result = clean_trig_result(result)
-        return str(result)
-    
+        unit_vector = dir_vector / magnitude
+        slope = Matrix(gradient(expression, sym_vars)).dot(unit_vector)
+        coords, shape = build_points(points, len(sym_vars))
+        values = evaluate_components([slope], sym_vars, coords)
+        return field_result("values", values, coords.shape[1], shape, encoding, scalar=True)
     except Exception as e:
+        return {"error": f"Error: {str(e)}"}
+
+def sum_results(results):
+    """
+    Add up solver results for pieces of one quantity: a cleaned-up string when
+    every piece is symbolic, a numeric dict (errors summed) when any is numeric,
+    the first error otherwise
+    """
+    for result in results:
+        if isinstance(result, str) and result.startswith("Error"):
+            return result
+        if isinstance(result, dict) and "error" in result:
+            return result["error"]
+    if all(isinstance(result, str) for result in results):
+        return str(clean_trig_result(sum((sympify(result) for result in results), S.Zero)))
+    value, error = 0.0, 0.0
+    for result in results:
+        if isinstance(result, dict):
+            value += float(result["value"])
+            error += float(result["error_estimate"])
+        else:
+            value += float(sympify(result).evalf())
+    return {"value": f"{value:.15g}", "error_estimate": f"{error:.2e}", "method": "numeric", "parts": len(results)}
+
+def _greens_curl(vector_field, variables):
+    x, y = symbols(variables)
+    M = sympify(vector_field[0])
+    N = sympify(vector_field[1])
+    return derivative(N, x) - derivative(M, y), x, y
+
+def _greens_limits(region_bounds, x, y):
+    """
+    Limits, innermost first, for [(x_lower, x_upper), (y_lower, y_upper)]: y
+    bounds in x make a type I region (y first), x bounds in y a type II region
+    (x first); constant bounds leave the order to solve_multiple_integral.
+    """
+    (x_lower, x_upper), (y_lower, y_upper) = [(sympify(a), sympify(b)) for a, b in region_bounds]
+    x_depends = y in x_lower.free_symbols | x_upper.free_symbols
+    y_depends = x in y_lower.free_symbols | y_upper.free_symbols
+    if x_depends and y_depends:
+        raise ValueError("x bounds depend on y and y bounds on x; one pair must be constant")
+    if y_depends:
+        return [(y, y_lower, y_upper), (x, x_lower, x_upper)]
+    return [(x, x_lower, x_upper), (y, y_lower, y_upper)]
+
+def greens_polygon_pieces(vector_field, vertices, variables):
+    """
+    A polygon cut into strips for Green's theorem, as [(x bounds), (y bounds)]
+    pairs. The strips run along whichever variable leaves the cheaper inner
+    integral of the curl (ties go to fewer pieces).
+    """
+    curl, x, y = _greens_curl(vector_field, variables)
+    options = [polygon_pieces(vertices, (x, y), inner) for inner in (y, x)]
+    costs = [(_stage_cost(curl, inner), len(pieces)) for inner, pieces in zip((y, x), options)]
+    best = options[costs.index(min(costs))]
+    return [[(lo, hi) for _, lo, hi in sorted(limits, key=lambda bound: bound[0] != x)] for limits in best]
+
+def solve_greens_theorem(vector_field: list, region_bounds, variables: list, method: str = "auto",
+                         symbolic_timeout: float = None):
+    """
+    Double integral of dN/dx - dM/dy over a region. region_bounds is either
+    [(x_lower, x_upper), (y_lower, y_upper)], where one pair may depend on the
+    other variable (type I or II), or a region dict: a polygon ({"type":
+    "polygon", "vertices": ...}, cut into strips) or anything regions.describe
+    handles in 2-D (rectangle, disk, polar), which goes through
+    solve_region_integral. method and symbolic_timeout as in solve_multiple_integral.
+    """
+    try:
+        curl_2d, x, y = _greens_curl(vector_field, variables)
+
+        if isinstance(region_bounds, dict) and region_bounds["type"] == "polygon":
+            pieces = greens_polygon_pieces(vector_field, region_bounds["vertices"], variables)
+            results = []
+            for done, piece in enumerate(pieces, 1):
+                results.append(solve_greens_theorem(vector_field, piece, variables, method, symbolic_timeout))
+                report_progress(stage="polygon", completed=done, total=len(pieces))
+            return sum_results(results)
+        if isinstance(region_bounds, dict):
+            result = solve_region_integral(curl_2d, region_bounds, variables, "auto", method, symbolic_timeout)
+            return result["result"] if "result" in result else result["error"]
+
+        limits = _greens_limits(region_bounds, x, y)
+        return solve_multiple_integral(curl_2d, [(str(var), a, b) for var, a, b in limits], method,
+                                       symbolic_timeout, "auto")
+
+    except Exception as e:
+        logger.debug("solve_greens_theorem failed", exc_info=True)
         return f"Error: {str(e)}"
     
-def solve_stokes_theorem(vector_field: list, params: list, surface: list, bounds: list, field_vars=("x", "y", "z")) -> str:
+def solve_stokes_theorem(vector_field: list, params: list, surface: list, bounds: list, field_vars=("x", "y", "z"),
+                         method: str = "auto", symbolic_timeout: float = SURFACE_SYMBOLIC_BUDGET):
+    """Flux of curl F through the surface, through the same engine as solve_surface_integral"""
     try:
-        u, v = symbols(params)
-        r = Matrix([sympify(expr) for expr in surface])
-        ru = r.diff(u)
-        rv = r.diff(v)
-        normal = ru.cross(rv)  # 3x1 vector
+        params, bounds, r, normal, kind, closed = _surface_geometry(surface, params, bounds)
 
         F = Matrix([sympify(f) for f in vector_field])
-        curl = Matrix([
-            diff(F[2], symbols("y")) - diff(F[1], symbols("z")),
-            diff(F[0], symbols("z")) - diff(F[2], symbols("x")),
-            diff(F[1], symbols("x")) - diff(F[0], symbols("y")),
-        ])
+        curl_sub = curl(F, symbols("x y z")).subs(_coordinate_substitutions(field_vars, r))
 
-        x, y, z = symbols(field_vars)
-        substitutions = {x: r[0], y: r[1], z: r[2]}
-        curl_sub = curl.subs(substitutions)
+        return _parametric_surface_integral(curl_sub.dot(normal), params, bounds, method, symbolic_timeout, kind,
+                                            closed)
+    except Exception as e:
+        logger.debug("solve_stokes_theorem failed", exc_info=True)
+        return f"Error: {str(e)}"
 
-        result = integrate(curl_sub.dot(normal), (u, bounds[0][0], bounds[0][1]), (v, bounds[1][0], bounds[1][1]))        
-        
-        # Clean up the result
-        result = clean_trig_result(result)
-        return str(simplify(result))
+
+def _boundary_pieces(bounds, inner, outer, point, param):
+    """
+    The boundary of {inner from a(outer) to b(outer), outer from c to d},
+    counterclockwise in the (inner, outer) plane, as (curve, lower, upper) pieces
+    in param; point(s, t) maps a parameter pair into space. Edges that collapse
+    to a point (the center of a polar disk) are left out; seams that are walked
+    both ways cancel in the sum.
+    """
+    (a, b), (c, d) = [(sympify(lo), sympify(hi)) for lo, hi in bounds]
+    edges = [
+        (point(param, c), a.subs(outer, c), b.subs(outer, c)),
+        (point(b.subs(outer, param), param), c, d),
+        (point(param, d), b.subs(outer, d), a.subs(outer, d)),
+        (point(a.subs(outer, param), param), d, c),
+    ]
+    return [(curve, lo, hi) for curve, lo, hi in edges
+            if lo != hi and any(param in sympify(component).free_symbols for component in curve)]
+
+def _boundary_circulation(field, pieces, param):
+    """Sum of solve_line_integral over the boundary pieces, cleaned up once"""
+    total = S.Zero
+    for done, (curve, lo, hi) in enumerate(pieces, 1):
+        piece = solve_line_integral(field, str(param), list(curve), [lo, hi])
+        if piece.startswith("Error"):
+            return piece
+        total += sympify(piece)
+        report_progress(stage="boundary", completed=done, total=len(pieces))
+    return str(clean_trig_result(total))
+
+def _boundary_parameter(*expressions):
+    """A name for the boundary parameter that the problem doesn't already use"""
+    used = {str(sym) for e in expressions for sym in sympify(e).free_symbols}
+    return symbols(next(name for name in ("t", "tau", "t_") if name not in used))
+
+def solve_greens_boundary(vector_field: list, region_bounds, variables: list, method: str = "auto",
+                          symbolic_timeout: float = None):
+    """
+    The other side of Green's theorem: the circulation of (M, N) around the
+    region's boundary, counterclockwise, through solve_line_integral. Same
+    arguments as solve_greens_theorem (the line integrals are symbolic).
+    """
+    try:
+        x, y = symbols(variables)
+        X, Y = symbols("x y")
+        field = [sympify(f).subs({x: X, y: Y}, simultaneous=True) for f in vector_field[:2]]
+        if isinstance(region_bounds, dict) and region_bounds["type"] == "polygon":
+            corners = counterclockwise(region_bounds["vertices"])
+            t = _boundary_parameter(*field)
+            pieces = [((p[0] + (q[0] - p[0]) * t, p[1] + (q[1] - p[1]) * t), 0, 1)
+                      for p, q in zip(corners, corners[1:] + corners[:1])]
+            return _boundary_circulation(field, pieces, t)
+        if isinstance(region_bounds, dict):
+            # The region's natural description, e.g. (r, theta) for a disk; r >= 0 keeps the orientation
+            description = describe(region_bounds, (x, y))[0]
+            (inner, *_), (outer, *_) = description.limits
+            bounds = [(lo, hi) for _, lo, hi in description.limits]
+            t = _boundary_parameter(*field, *[b for bound in bounds for b in bound])
+            point = lambda s, w: [description.substitution.get(var, var).subs({inner: s, outer: w}, simultaneous=True)
+                                  for var in (x, y)]
+            return _boundary_circulation(field, _boundary_pieces(bounds, inner, outer, point, t), t)
+
+        limits = _greens_limits(region_bounds, x, y)
+        bounds = [(lo, hi) for _, lo, hi in limits]
+        t = _boundary_parameter(*field, *[b for bound in bounds for b in bound])
+        if limits[0][0] == x:
+            pieces = _boundary_pieces(bounds, x, y, lambda s, w: (s, w), t)
+        else:
+            # y first: counterclockwise in the (y, x) plane is clockwise in the (x, y) plane
+            pieces = [(curve, hi, lo) for curve, lo, hi in _boundary_pieces(bounds, y, x, lambda s, w: (w, s), t)]
+        return _boundary_circulation(field, pieces, t)
+    except Exception as e:
+        logger.debug("solve_greens_boundary failed", exc_info=True)
+        return f"Error: {str(e)}"
+
+def solve_stokes_boundary(vector_field: list, params: list, surface: list, bounds: list, field_vars=("x", "y", "z"),
+                          method: str = "auto", symbolic_timeout: float = SURFACE_SYMBOLIC_BUDGET):
+    """
+    The other side of Stokes' theorem: the circulation of F around the image of
+    the parameter rectangle's boundary, oriented with ru x rv. Same arguments as
+    solve_stokes_theorem (method and symbolic_timeout are accepted so both sides
+    share one argument tuple; the line integrals are symbolic).
+    """
+    try:
+        u, v = symbols(params)
+        r = [sympify(expr) for expr in surface]
+        X, Y, Z = symbols("x y z")
+        field = [sympify(f).subs(_coordinate_substitutions(field_vars, [X, Y, Z]), simultaneous=True)
+                 for f in vector_field]
+        t = _boundary_parameter(*r, *[b for bound in bounds for b in bound])
+        point = lambda s, w: [component.subs({u: s, v: w}, simultaneous=True) for component in r]
+        pieces = _boundary_pieces(bounds, u, v, point, t)
+        return _boundary_circulation(field, pieces, t)
     except Exception as e:
+        logger.debug("solve_stokes_boundary failed", exc_info=True)
         return f"Error: {str(e)}"
 
 
-def solve_lagrange_multipliers(f_expr: str, g_expr: str, variables: list, h_expr: str = None) -> dict:
+# Lagrange multipliers run in stages: a quick look at the system picks the exact
+# path (a lex Groebner basis for polynomial systems, solve() otherwise), it gets
+# a time box, and numeric multi-start Newton covers whatever it could not do.
+LAGRANGE_SYMBOLIC_BUDGET = float(os.environ.get("CALC3_LAGRANGE_SYMBOLIC_BUDGET", "5"))
+# solve() rarely finishes on transcendental systems (sin(x) + cos(y)), so it gets far less before Newton takes over
+LAGRANGE_NONPOLYNOMIAL_BUDGET = float(os.environ.get("CALC3_LAGRANGE_NONPOLYNOMIAL_BUDGET", "0.5"))
+LAGRANGE_STARTS = int(os.environ.get("CALC3_LAGRANGE_STARTS", "48"))
+# Polynomial systems with more potential solutions than this (Bezout bound) skip the exact path
+LAGRANGE_MAX_BEZOUT = int(os.environ.get("CALC3_LAGRANGE_MAX_BEZOUT", "256"))
+# Set CALC3_LAGRANGE_GROEBNER=0 to send polynomial systems through solve() as well
+LAGRANGE_GROEBNER = os.environ.get("CALC3_LAGRANGE_GROEBNER", "1") != "0"
+
+def _constraint_expr(constraint):
+    """Turn "g = k" (an Eq) into g - k; anything else is taken as g = 0"""
+    constraint = sympify(constraint)
+    if hasattr(constraint, 'lhs') and hasattr(constraint, 'rhs'):
+        return constraint.lhs - constraint.rhs
+    return constraint
+
+def _analyze_lagrange(equations, unknowns):
+    """Structural pre-analysis: is the system polynomial, and how many solutions can it have?"""
+    analysis = {"polynomial": True, "degrees": [], "bezout": None}
+    for eq in equations:
+        try:
+            analysis["degrees"].append(Poly(eq, *unknowns).total_degree())
+        except PolynomialError:
+            analysis["polynomial"] = False
+            analysis["degrees"] = []
+            break
+    if analysis["polynomial"]:
+        bezout = 1
+        for degree in analysis["degrees"]:
+            bezout *= max(degree, 1)
+        analysis["bezout"] = bezout
+    analysis["budget"] = LAGRANGE_SYMBOLIC_BUDGET if analysis["polynomial"] else LAGRANGE_NONPOLYNOMIAL_BUDGET
+    if not analysis["polynomial"]:
+        analysis["exact_path"] = "symbolic" if LAGRANGE_NONPOLYNOMIAL_BUDGET > 0 else None
+    elif analysis["bezout"] > LAGRANGE_MAX_BEZOUT:
+        analysis["exact_path"] = None
+    else:
+        analysis["exact_path"] = "groebner" if LAGRANGE_GROEBNER else "symbolic"
+    return analysis
+
+def _solve_all(equations, unknowns):
+    return solve(equations, unknowns, dict=True)
+
+def _exact_critical_points(path, equations, unknowns, budget):
+    """
+    Run the exact path for at most budget seconds. Returns the solution dicts,
+    or None when it fails, runs out of time or finds infinitely many solutions.
+    """
+    finder = groebner_real_solutions if path == "groebner" else _solve_all
+    try:
+        finished, solutions = within_budget(budget, finder, equations, unknowns)
+    except Exception:
+        return None
+    return solutions if finished else None
+
+def _numeric_critical_points(equations, unknowns):
+    system = lambdify(unknowns, equations, modules="numpy")
+    jacobian = lambdify(unknowns, Matrix(equations).jacobian(unknowns), modules="numpy")
+    roots = newton_multistart(system, jacobian, len(unknowns), starts=LAGRANGE_STARTS)
+    return [dict(zip(unknowns, root)) for root in roots]
+
+def _second_order_kernels(f, constraints, multipliers, sym_vars, unknowns):
+    """NumPy functions of the unknowns for the Lagrangian Hessian and the constraint Jacobian"""
+    # Hessian of L = f - sum(lam_i * g_i), from the cached Hessians of f and each g_i
+    lagrangian_hessian = hessian(f, sym_vars)
+    for lam, g in zip(multipliers, constraints):
+        lagrangian_hessian -= lam * hessian(g, sym_vars)
+    return (lambdify(unknowns, lagrangian_hessian, modules="numpy"),
+            lambdify(unknowns, jacobian(constraints, sym_vars), modules="numpy"))
+
+def _classify_critical_point(kernels, unknowns, values):
+    """Second-order test on the constraint tangent space"""
+    hessian, jacobian = kernels
+    try:
+        point = [float(values[u]) for u in unknowns]
+        eigenvalues = tangent_hessian_eigenvalues(hessian(*point), jacobian(*point))
+    except (KeyError, TypeError, ValueError):
+        return "unknown"
+    if eigenvalues.size == 0:
+        return "isolated point"
+    tol = 1e-8 * max(1.0, float(abs(eigenvalues).max()))
+    if (eigenvalues > tol).all():
+        return "local minimum"
+    if (eigenvalues < -tol).all():
+        return "local maximum"
+    if (eigenvalues > tol).any() and (eigenvalues < -tol).any():
+        return "saddle point"
+    return "inconclusive"
+
+def _format_critical_point(s, f, constraints, kernels, sym_vars, multipliers, method):
+    """Solution dict for the response, or None if it is complex, incomplete or infeasible"""
+    names = [str(v) for v in sym_vars]
+    names += ['lambda'] if len(multipliers) == 1 else [f"lambda_{i + 1}" for i in range(len(multipliers))]
+    clean_sol = {}
+    exact = {}
+    for var_sym, result_key in zip(list(sym_vars) + list(multipliers), names):
+        if var_sym not in s:
+            if var_sym in multipliers:
+                continue  # lambda is optional, variables are required
+            return None
+        val = sympify(s[var_sym])
+        try:
+            numeric_val = float(val.evalf())
+        except (TypeError, ValueError):
+            if val.is_real is False:
+                return None
+            clean_sol[result_key] = str(clean_trig_result(val))
+            exact[var_sym] = val
+            continue
+        if abs(numeric_val) == float('inf') or numeric_val != numeric_val:
+            return None
+        clean_sol[result_key] = round(numeric_val, 6) + 0.0  # no -0.0
+        exact[var_sym] = val
+
+    var_values = {v: exact[v] for v in sym_vars}
+    f_val = f.subs(var_values)
+    try:
+        clean_sol["f_value"] = round(float(f_val.evalf()), 6) + 0.0
+    except (TypeError, ValueError):
+        clean_sol["f_value"] = str(clean_trig_result(f_val))
+
+    # Check constraint satisfaction on the unrounded values
+    for g in constraints:
+        g_val = g.subs(var_values)
+        if not g_val.is_number or abs(complex(g_val.evalf())) > 1e-8:
+            return None
+
+    clean_sol["classification"] = _classify_critical_point(kernels, list(sym_vars) + list(multipliers), exact)
+    clean_sol["method"] = method
+    return clean_sol
+
+def solve_lagrange_multipliers(f_expr: str, g_expr, variables: list, h_expr: str = None):
+    """
+    Critical points of f subject to g = 0, and h = 0 when given. g_expr may also
+    be a list of constraints. Each solution reports its classification (second-
+    order test) and the method that found it: "groebner" (polynomial systems),
+    "symbolic" (solve()) or "numeric" (multi-start Newton).
+    """
     try:
-        # Create symbolic variables
         sym_vars = [symbols(v) for v in variables]
-        
-        # Parse expressions
         f = sympify(f_expr)
-        g_constraint = sympify(g_expr)
-        
-        # Handle constraint format - convert "g = k" to "g - k = 0"
-        if hasattr(g_constraint, 'lhs') and hasattr(g_constraint, 'rhs'):
-            # It's an equation like x + y + z = 1
-            g = g_constraint.lhs - g_constraint.rhs
+
+        constraints = list(g_expr) if isinstance(g_expr, (list, tuple)) else [g_expr]
+        if h_expr is not None:
+            constraints.append(h_expr)
+        constraints = [_constraint_expr(c) for c in constraints]
+
+        # One multiplier per constraint ('lam' since lambda is a Python keyword)
+        if len(constraints) == 1:
+            multipliers = [symbols('lam')]
         else:
-            # Assume it's already in the form g(x,y,z) where we want g = 0
-            g = g_constraint
-        
-        # Create Lagrange multiplier symbol
-        lam = symbols('lam')  # Using 'lam' instead of 'lambda' to avoid Python keyword
-        
-        # Compute gradients
-        grad_f = [diff(f, var) for var in sym_vars]
-        grad_g = [diff(g, var) for var in sym_vars]
-        
-        # Set up system of equations
-        equations = []
-        
-        # Gradient condition: ∇f = λ∇g
-        for i in range(len(sym_vars)):
-            equations.append(Eq(grad_f[i], lam * grad_g[i]))
-        
-        # Constraint: g = 0
-        equations.append(Eq(g, 0))
-        
-        # Variables to solve for
-        unknowns = sym_vars + [lam]
-        
-        # Try to solve the system
+            multipliers = list(symbols(f'lam1:{len(constraints) + 1}'))
+
+        # Stationarity of L = f - sum(lam_i * g_i) plus the constraints themselves,
+        # built from grad f and grad g_i so earlier gradient requests are reused
+        grad_L = Matrix(gradient(f, sym_vars))
+        for lam, g in zip(multipliers, constraints):
+            grad_L -= lam * Matrix(gradient(g, sym_vars))
+        equations = list(grad_L) + constraints
+        unknowns = sym_vars + multipliers
+
+        analysis = _analyze_lagrange(equations, unknowns)
+        logger.debug("lagrange pre-analysis", extra={"analysis": analysis})
+
+        kernels = _second_order_kernels(f, constraints, multipliers, sym_vars, unknowns)
         solutions = []
-        
-        # Method 1: Standard solve
-        try:
-            sol = solve(equations, unknowns, dict=True)
-            if sol:
-                solutions.extend(sol)
-        except Exception as e:
-            pass
-        
-        # Method 2: Try without dict=True if standard fails
-        if not solutions:
-            try:
-                sol = solve(equations, unknowns)
-                if sol and isinstance(sol, list):
-                    # Convert to dict format
-                    for s in sol:
-                        if len(s) == len(unknowns):
-                            solution_dict = {unknowns[i]: s[i] for i in range(len(unknowns))}
-                            solutions.append(solution_dict)
-            except Exception as e:
-                pass
-        
-        # Method 3: Try solving step by step for simple cases
-        if not solutions and len(variables) == 2:
-            try:
-                # For 2D: solve the first two gradient equations for x,y in terms of lambda
-                # then substitute into constraint
-                x, y = sym_vars
-                eq1, eq2, constraint = equations
-                
-                # Try to solve first two equations for x, y in terms of lambda
-                partial_sol = solve([eq1, eq2], [x, y])
-                if partial_sol:
-                    # Substitute into constraint
-                    constraint_sub = constraint.subs(partial_sol)
-                    lambda_vals = solve(constraint_sub, lam)
-                    
-                    for lam_val in lambda_vals:
-                        full_sol = partial_sol.copy()
-                        full_sol[lam] = lam_val
-                        # Substitute lambda back to get numeric values
-                        final_sol = {k: v.subs(lam, lam_val) for k, v in full_sol.items()}
-                        final_sol[lam] = lam_val
-                        solutions.append(final_sol)
-            except Exception as e:
-                pass
-        
+        found = None
+        path = analysis["exact_path"]
+        if path is not None:
+            report_progress(stage=f"solve.{path}")
+            with timed(f"solve.{path}"):
+                found = _exact_critical_points(path, equations, unknowns, analysis["budget"])
+            for s in found or []:
+                clean_sol = _format_critical_point(s, f, constraints, kernels, sym_vars, multipliers, path)
+                if clean_sol is not None:
+                    solutions.append(clean_sol)
+
+        # The Groebner path enumerates every real solution, so an empty answer is final
+        if not solutions and not (path == "groebner" and found is not None):
+            report_progress(stage="solve.numeric")
+            with timed("solve.numeric"):
+                found = _numeric_critical_points(equations, unknowns)
+            for s in found:
+                clean_sol = _format_critical_point(s, f, constraints, kernels, sym_vars, multipliers, "numeric")
+                if clean_sol is not None:
+                    solutions.append(clean_sol)
+
         if not solutions:
-            return {"error": "Could not solve the optimization problem. The constraint may be incompatible with the function, or the problem may have no critical points."}
-        
-        # Process and filter solutions
-        real_solutions = []
-        for i, s in enumerate(solutions):
-            try:
-                # Create a clean solution dictionary
-                clean_sol = {}
-                is_valid = True
-                
-                # Extract variable values (include lambda)
-                for var_name in variables + ['lam']:
-                    if var_name == 'lam':
-                        var_sym = lam
-                        result_key = 'lambda'  # Display as 'lambda' in results
-                    else:
-                        var_sym = symbols(var_name)
-                        result_key = var_name
-                    
-                    if var_sym in s:
-                        val = s[var_sym]
-                        try:
-                            # Try to evaluate to a float
-                            numeric_val = float(val.evalf())
-                            # Check if it's real (not NaN or infinity)
-                            if not (abs(numeric_val) == float('inf') or numeric_val != numeric_val):
-                                clean_sol[result_key] = round(numeric_val, 6)
-                            else:
-                                is_valid = False
-                                break
-                        except:
-                            # If can't evaluate to float, keep symbolic but clean it first
-                            if val.is_real is not False:  # Not explicitly complex
-                                val = clean_trig_result(val)
-                                clean_sol[result_key] = str(val)
-                            else:
-                                is_valid = False
-                                break
-                    elif var_name != 'lam':  # lambda is optional, variables are required
-                        is_valid = False
-                        break
-                
-                if is_valid and clean_sol:
-                    # Calculate function value at this point
-                    var_substitutions = {symbols(var): clean_sol[var] for var in variables}
-                    f_val = f.subs(var_substitutions)
-                    
-                    try:
-                        clean_sol["f_value"] = round(float(f_val.evalf()), 6)
-                    except:
-                        f_val = clean_trig_result(f_val)
-                        clean_sol["f_value"] = str(f_val)
-                    
-                    # Check constraint satisfaction
-                    g_val = g.subs(var_substitutions)
-                    constraint_error = abs(float(g_val.evalf())) if g_val.is_number else float('inf')
-                    
-                    if constraint_error < 1e-10:  # Constraint is satisfied
-                        real_solutions.append(clean_sol)
-                
-            except Exception as eval_error:
-                continue
-        
-        if not real_solutions:
             return {"error": "No valid real solutions found. The optimization problem may have no feasible critical points."}
-        
-        return real_solutions
-        
+
+        return solutions
+
     except Exception as e:
-        import traceback
-        traceback.print_exc()
+        logger.debug("solve_lagrange_multipliers failed", exc_info=True)
         return {"error": f"Error solving Lagrange multipliers: {str(e)}"}
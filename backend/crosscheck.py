@@ -0,0 +1,92 @@
+import os
+import random
+
+from sympy import sympify
+
+from cache import is_error_result
+from calc3 import sum_results
+from engine import InlineEngine
+
+
+CROSS_CHECK_MODES = ("race", "confirm")
+# Relative tolerance when "confirm" compares the formulations' answers
+CROSS_CHECK_RTOL = float(os.environ.get("CALC3_CROSS_CHECK_RTOL", "1e-6"))
+# Random values tried for free parameters (e.g. a radius a) when comparing symbolic answers
+CROSS_CHECK_SAMPLES = 3
+
+
+def _usable(value):
+    """A finished answer: not an error and not an unevaluated integral"""
+    return not is_error_result(value) and "Integral(" not in str(value)
+
+
+def _evaluate(value, point):
+    if isinstance(value, dict):
+        return complex(value["value"])
+    return complex(sympify(value).subs(point).evalf())
+
+
+def agree(first, second, rtol=CROSS_CHECK_RTOL):
+    """
+    Whether two answers to the same problem match: numerically, at a few random
+    values of any free parameters. None when either can't be evaluated.
+    """
+    try:
+        free = set()
+        for value in (first, second):
+            if not isinstance(value, dict):
+                free |= sympify(value).free_symbols
+        rng = random.Random(0)
+        for _ in range(CROSS_CHECK_SAMPLES if free else 1):
+            point = {sym: rng.uniform(0.5, 2.0) for sym in free}
+            a, b = _evaluate(first, point), _evaluate(second, point)
+            if abs(a - b) > rtol * max(abs(a), abs(b), 1.0):
+                return False
+        return True
+    except (TypeError, ValueError, KeyError):
+        return None
+
+
+def solve_cross_check(mode, candidates, engine=None, operation="cross_check"):
+    """
+    Compute one quantity through several formulations, e.g. Stokes' theorem as a
+    surface integral of the curl and as a boundary line integral.
+    candidates: ((label, solver, args), ...), in order of preference.
+    "race" runs them at once on separate workers and returns the first finished
+    answer, cancelling the rest; "confirm" waits for all of them and reports
+    whether they agree. Without an engine the candidates run in this process.
+    """
+    if engine is None:
+        engine = InlineEngine()
+    finished = engine.race(operation, [(solver, args) for _, solver, args in candidates],
+                           accept=_usable, wait_all=mode == "confirm")
+    labels = [label for label, _, _ in candidates]
+    # Prefer a usable answer; among those, the preferred formulation in confirm mode
+    ordered = sorted(finished, key=lambda item: (not _usable(item[1]), item[0] if mode == "confirm" else 0))
+    index, value = ordered[0]
+    if is_error_result(value):
+        return {"error": value, "cross_check": mode}
+    response = {"result": value, "formulation": labels[index], "cross_check": mode}
+    if mode == "confirm":
+        response["results"] = {labels[i]: v for i, v in sorted(finished)}
+        usable = [v for _, v in sorted(finished) if _usable(v)]
+        response["agree"] = agree(*usable[:2]) if len(usable) >= 2 else None
+    return response
+
+
+def solve_in_parts(parts, engine=None, operation="parts"):
+    """
+    Sum of several (solver, args) pieces of one quantity, e.g. a polygon cut
+    into strips, run at once on separate workers (one after another without an
+    engine). The pieces' results are combined by calc3.sum_results.
+    """
+    if engine is None:
+        engine = InlineEngine()
+    finished = engine.race(operation, list(parts), wait_all=True)
+    if len(finished) < len(parts):
+        return f"Error: {len(parts) - len(finished)} of {len(parts)} pieces did not finish"
+    return sum_results([value for _, value in sorted(finished)])
+
+
+# Solvers that coordinate several engine jobs themselves instead of running in one worker
+COORDINATORS = (solve_cross_check, solve_in_parts)
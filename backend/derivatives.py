@@ -0,0 +1,97 @@
+import os
+from collections import Counter
+from functools import lru_cache
+from itertools import combinations_with_replacement
+
+from sympy import Add, Matrix, diff, factorial, zeros
+from sympy.core.sorting import default_sort_key
+
+from metrics import count
+
+
+# Derivatives kept per process; entries are small next to the cost of diff() on big expressions
+DERIVATIVE_CACHE_SIZE = int(os.environ.get("CALC3_DERIVATIVE_CACHE_SIZE", "4096"))
+
+
+@lru_cache(maxsize=DERIVATIVE_CACHE_SIZE)
+def _derivative(expression, variables):
+    if len(variables) == 1:
+        return diff(expression, variables[0])
+    # Higher orders build on the (cached) derivative one order down
+    return diff(_derivative(expression, variables[:-1]), variables[-1])
+
+
+def derivative(expression, *variables):
+    """
+    d/d variables[-1] ... d/d variables[0] of a SymPy expression, memoized per
+    process on (expression, variables). Every solver differentiates through
+    here, so e.g. the gradient a Lagrange solve needs is reused from an earlier
+    gradient request handled by the same worker.
+    """
+    if not variables:
+        return expression
+    misses = _derivative.cache_info().misses
+    value = _derivative(expression, tuple(variables))
+    count("derivative_cache_misses" if _derivative.cache_info().misses > misses else "derivative_cache_hits")
+    return value
+
+
+def canonical_order(variables):
+    """
+    Variables of a mixed partial in one fixed order. Mixed partials commute, so
+    f_yx is looked up as f_xy and every chain extends the cached one below it.
+    """
+    return sorted(variables, key=default_sort_key)
+
+
+def mixed_partial(expression, variables):
+    return derivative(expression, *canonical_order(variables))
+
+
+def gradient(expression, variables):
+    return [derivative(expression, v) for v in variables]
+
+
+def jacobian(components, variables):
+    """Matrix of d component_i / d variable_j"""
+    return Matrix([gradient(c, variables) for c in components])
+
+
+def hessian(expression, variables):
+    """Second derivatives; each mixed entry is computed once and mirrored"""
+    n = len(variables)
+    matrix = zeros(n, n)
+    for i in range(n):
+        for j in range(i, n):
+            matrix[i, j] = matrix[j, i] = mixed_partial(expression, (variables[i], variables[j]))
+    return matrix
+
+
+def divergence(components, variables):
+    return sum(derivative(c, v) for c, v in zip(components, variables))
+
+
+def curl(components, variables):
+    """curl of a 3D field, from the same cached first derivatives as jacobian()"""
+    (dF1, dF2, dF3) = jacobian(components, variables).tolist()
+    return Matrix([dF3[1] - dF2[2], dF1[2] - dF3[0], dF2[0] - dF1[1]])
+
+
+def taylor_polynomial(expression, variables, point, degree):
+    """
+    Taylor polynomial of the given degree about point, in powers of
+    (variable - point). Each order k coefficient extends a cached order k-1
+    derivative, and is computed once per multi-index rather than per ordering.
+    """
+    at = dict(zip(variables, point))
+    shifts = {v: v - p for v, p in at.items()}
+    terms = [expression.subs(at)]
+    for order in range(1, degree + 1):
+        for combination in combinations_with_replacement(canonical_order(variables), order):
+            coefficient = derivative(expression, *combination).subs(at)
+            if coefficient == 0:
+                continue
+            for v, power in Counter(combination).items():
+                coefficient *= shifts[v]**power / factorial(power)
+            terms.append(coefficient)
+    return Add(*terms)
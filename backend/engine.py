@@ -0,0 +1,406 @@
+import atexit
+import contextvars
+import importlib
+import multiprocessing
+import os
+import queue
+import threading
+import time
+
+from budget import time_budget, BudgetExceeded
+from logs import configure_logging
+from metrics import current_timer, progress_reporter, registry, report_progress, run_timed, take_counts
+from timeouts import get_timeout, partial_result, SolveTimeout
+
+
+# Modules imported once by the forkserver so forked workers start with them loaded.
+# Workers only receive parsed SymPy objects, so the LaTeX/ANTLR parser stays out.
+PRELOAD_MODULES = ["calc3"]
+
+
+# Seconds between checks of a cancellable job's cancel event
+CANCEL_POLL_SECONDS = 0.05
+# Delay before replacing a worker that died while warming up, doubling with each
+# failure in a row up to the maximum
+SPAWN_BACKOFF_SECONDS = 0.5
+SPAWN_BACKOFF_MAX_SECONDS = 30.0
+
+
+class EngineBusy(Exception):
+    """Raised when no worker becomes free within the queue timeout"""
+
+
+class Cancelled(Exception):
+    """Raised by run() when its cancel event is set; the job's worker is replaced"""
+
+
+def _default_start_method():
+    """forkserver where the platform has it (workers fork from a preloaded server), else spawn"""
+    return "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+
+
+def _warm_up():
+    """Import the solver modules once so jobs never pay for them (a no-op after preload)"""
+    from sympy import symbols, sympify
+    import calc3  # noqa: F401
+
+    symbols('x y z u v t r theta')
+    sympify("x**2 + sin(y)")
+
+
+def _worker_main(conn):
+    """
+    Worker process loop: receive (module, name, args), send back the result
+    along with the event counts (metrics.count) the job produced.
+    report_progress() calls made by the solver go back as ("progress", fields)
+    messages ahead of the result.
+    """
+    configure_logging()
+    _warm_up()
+    conn.send(("ready", os.getpid()))
+    while True:
+        try:
+            job = conn.recv()
+        except EOFError:
+            break
+        if job is None:
+            break
+        module_name, func_name, args = job
+        try:
+            func = getattr(importlib.import_module(module_name), func_name)
+            with progress_reporter(lambda fields: conn.send(("progress", fields))):
+                value, timings = run_timed(func, *args)
+            conn.send(("ok", value, timings, take_counts()))
+        except Exception as e:
+            conn.send(("error", f"Error: {str(e)}", {}, take_counts()))
+    conn.close()
+
+
+class _Worker:
+    def __init__(self, ctx):
+        self.conn, child_conn = ctx.Pipe()
+        self.process = ctx.Process(target=_worker_main, args=(child_conn,), daemon=True)
+        self.started = time.monotonic()
+        self.process.start()
+        child_conn.close()
+        self.jobs = 0
+
+    def stop(self):
+        try:
+            self.conn.send(None)
+        except Exception:
+            pass
+        self.process.join(1)
+        self.kill()
+
+    def kill(self):
+        if self.process.is_alive():
+            self.process.terminate()
+            self.process.join(1)
+            if self.process.is_alive():
+                self.process.kill()
+        self.process.join()
+        self.conn.close()
+
+
+class SolverEngine:
+    """
+    Pool of pre-warmed solver processes. Jobs are calc3 solve_* calls; a job that
+    exceeds its time budget kills its worker, and workers are recycled after
+    max_jobs jobs to cap memory growth.
+    """
+
+    def __init__(self, workers=None, max_jobs=200, queue_timeout=30, start_method=None):
+        self.size = workers if workers is not None else (os.cpu_count() or 1)
+        self.max_jobs = max_jobs
+        self.queue_timeout = queue_timeout
+        self.start_method = start_method or _default_start_method()
+        self._ctx = multiprocessing.get_context(self.start_method)
+        if self.start_method == "forkserver":
+            self._ctx.set_forkserver_preload(PRELOAD_MODULES)
+        self._idle = queue.Queue()
+        self._lock = threading.Lock()
+        self._closed = False
+        self.waiting = 0
+        self.busy = 0
+        self.starting = 0
+        self.jobs_completed = 0
+        self.timeouts = 0
+        self.cancelled = 0
+        self.crashes = 0
+        self.failed_starts = 0
+        self.recycled = 0
+        self.busy_seconds = 0.0
+        self.workers_started = 0
+        self.start_seconds = 0.0
+        self.last_start_seconds = None
+        self.started_at = time.monotonic()
+        for _ in range(self.size):
+            self._spawn()
+
+    def _spawn(self):
+        """Start a worker and hand it to the idle queue once it has warmed up"""
+        with self._lock:
+            if self._closed:
+                return
+            self.starting += 1
+        worker = _Worker(self._ctx)
+
+        def wait_ready():
+            try:
+                worker.conn.recv()
+            except Exception:
+                worker.kill()
+                with self._lock:
+                    self.starting -= 1
+                    self.crashes += 1
+                    self.failed_starts += 1
+                    delay = min(SPAWN_BACKOFF_SECONDS * 2 ** (self.failed_starts - 1), SPAWN_BACKOFF_MAX_SECONDS)
+                # Keep the pool at its size, without spinning if workers can't start at all
+                retry = threading.Timer(delay, self._spawn)
+                retry.daemon = True
+                retry.start()
+                return
+            elapsed = time.monotonic() - worker.started
+            with self._lock:
+                self.failed_starts = 0
+                self.starting -= 1
+                self.workers_started += 1
+                self.start_seconds += elapsed
+                self.last_start_seconds = elapsed
+            self._idle.put(worker)
+
+        threading.Thread(target=wait_ready, daemon=True).start()
+
+    def _acquire(self):
+        with self._lock:
+            self.waiting += 1
+        try:
+            worker = self._idle.get(timeout=self.queue_timeout)
+        except queue.Empty:
+            raise EngineBusy("All solver workers are busy, try again shortly")
+        finally:
+            with self._lock:
+                self.waiting -= 1
+        with self._lock:
+            self.busy += 1
+        return worker
+
+    def _release(self, worker, elapsed, healthy=True):
+        with self._lock:
+            self.busy -= 1
+            self.busy_seconds += elapsed
+        if not healthy:
+            worker.kill()
+            self._spawn()
+        elif worker.jobs >= self.max_jobs:
+            with self._lock:
+                self.recycled += 1
+            threading.Thread(target=worker.stop, daemon=True).start()
+            self._spawn()
+        else:
+            self._idle.put(worker)
+
+    def run(self, operation, solver, args, timeout=None, cancel=None):
+        """
+        Run solver(*args) on a warm worker under the operation's time budget.
+        Setting the optional cancel event (a threading.Event) stops the job: its
+        worker is killed and replaced, and Cancelled is raised.
+        """
+        if timeout is None:
+            timeout = get_timeout(operation)
+        worker = self._acquire()
+        if cancel is not None and cancel.is_set():
+            self._release(worker, 0.0)
+            raise Cancelled(operation)
+        started = time.monotonic()
+        deadline = started + timeout if timeout and timeout > 0 else None
+        released = False
+        try:
+            worker.conn.send((solver.__module__, solver.__name__, args))
+            while True:
+                remaining = None if deadline is None else max(deadline - time.monotonic(), 0)
+                wait = remaining if cancel is None else min(CANCEL_POLL_SECONDS, remaining if remaining is not None
+                                                            else CANCEL_POLL_SECONDS)
+                if not worker.conn.poll(wait):
+                    if cancel is not None and cancel.is_set():
+                        with self._lock:
+                            self.cancelled += 1
+                        self._release(worker, time.monotonic() - started, healthy=False)
+                        released = True
+                        raise Cancelled(operation)
+                    if deadline is None or time.monotonic() < deadline:
+                        continue
+                    with self._lock:
+                        self.timeouts += 1
+                    self._release(worker, time.monotonic() - started, healthy=False)
+                    released = True
+                    raise SolveTimeout(operation, timeout, partial_result(operation, args))
+                message = worker.conn.recv()
+                if message[0] != "progress":
+                    break
+                # Relay to the submitting thread's reporter (an async job, if any)
+                report_progress(**message[1])
+            _, value, timings, counts = message
+        except (EOFError, OSError):
+            with self._lock:
+                self.crashes += 1
+            self._release(worker, time.monotonic() - started, healthy=False)
+            return "Error: Solver process exited unexpectedly"
+        except BaseException:
+            # e.g. arguments that can't be pickled, or a result that can't be
+            # unpickled: the pipe is in an unknown state, so replace the worker
+            if not released:
+                self._release(worker, time.monotonic() - started, healthy=False)
+            raise
+        worker.jobs += 1
+        with self._lock:
+            self.jobs_completed += 1
+        self._release(worker, time.monotonic() - started)
+        registry.add_counts(counts)
+        # Stage timings measured in the worker count towards the submitting request
+        timer = current_timer()
+        if timer is not None:
+            timer.merge(timings)
+        return value
+
+    def race(self, operation, candidates, accept=lambda value: True, wait_all=False, timeout=None):
+        """
+        Run several (solver, args) formulations of one problem at once, each on
+        its own worker. Returns [(index, value)] for the first value accept()
+        takes, after cancelling the rest; with wait_all, or when none is accepted,
+        every finished (index, value) in completion order. If every candidate
+        raised (timed out, say), the first exception is re-raised.
+        """
+        finished = queue.Queue()
+        cancel = threading.Event()
+
+        def attempt(index, solver, args):
+            try:
+                finished.put((index, self.run(operation, solver, args, timeout, cancel), None))
+            except Exception as e:
+                finished.put((index, None, e))
+
+        for index, (solver, args) in enumerate(candidates):
+            # Each thread gets a copy of the request's context, so stage timings and progress still arrive
+            thread = threading.Thread(target=contextvars.copy_context().run, args=(attempt, index, solver, args),
+                                      name=f"calc3-race-{index}", daemon=True)
+            thread.start()
+
+        results, errors = [], []
+        for _ in candidates:
+            index, value, error = finished.get()
+            if error is not None:
+                errors.append(error)
+                continue
+            if not wait_all and accept(value):
+                cancel.set()
+                return [(index, value)]
+            results.append((index, value))
+        if not results:
+            raise errors[0]
+        return results
+
+    def stats(self):
+        with self._lock:
+            uptime = time.monotonic() - self.started_at
+            return {
+                "workers": self.size,
+                "busy": self.busy,
+                "idle": self._idle.qsize(),
+                "starting": self.starting,
+                "failed_starts": self.failed_starts,
+                "queue_depth": self.waiting,
+                "utilization": round(self.busy / self.size, 4) if self.size else 0.0,
+                "busy_fraction": round(self.busy_seconds / (uptime * self.size), 4) if self.size and uptime else 0.0,
+                "jobs_completed": self.jobs_completed,
+                "timeouts": self.timeouts,
+                "cancelled": self.cancelled,
+                "crashes": self.crashes,
+                "recycled": self.recycled,
+                "max_jobs_per_worker": self.max_jobs,
+                "start_method": self.start_method,
+                "workers_started": self.workers_started,
+                "mean_start_ms": round(self.start_seconds / self.workers_started * 1000, 1) if self.workers_started else None,
+                "last_start_ms": round(self.last_start_seconds * 1000, 1) if self.last_start_seconds is not None else None,
+            }
+
+    def shutdown(self):
+        with self._lock:
+            self._closed = True
+        while True:
+            try:
+                self._idle.get_nowait().stop()
+            except queue.Empty:
+                break
+
+
+class InlineEngine:
+    """
+    Runs solvers on the request thread; used when CALC3_ENGINE_WORKERS=0. The
+    per-operation timeout is a time_budget around the solver instead of killing
+    a worker, so it can only interrupt the solver between bytecodes.
+    """
+
+    def run(self, operation, solver, args, timeout=None, cancel=None):
+        if timeout is None:
+            timeout = get_timeout(operation)
+        try:
+            with time_budget(timeout) as budget:
+                value, timings = run_timed(solver, *args)
+        except BudgetExceeded as e:
+            if e.budget is not budget:
+                raise
+            raise SolveTimeout(operation, timeout, partial_result(operation, args))
+        registry.add_counts(take_counts())
+        timer = current_timer()
+        if timer is not None:
+            timer.merge(timings)
+        return value
+
+    def race(self, operation, candidates, accept=lambda value: True, wait_all=False, timeout=None):
+        """SolverEngine.race without workers: the candidates run one after another"""
+        results = []
+        errors = []
+        for index, (solver, args) in enumerate(candidates):
+            try:
+                value = self.run(operation, solver, args, timeout)
+            except Exception as e:
+                errors.append(e)
+                continue
+            if not wait_all and accept(value):
+                return [(index, value)]
+            results.append((index, value))
+        if errors and not results:
+            raise errors[0]
+        return results
+
+    def stats(self):
+        return {"workers": 0, "inline": True}
+
+    def shutdown(self):
+        pass
+
+
+_engine = None
+_engine_lock = threading.Lock()
+
+
+def get_engine():
+    """Return the process-wide solver engine, starting it on first use"""
+    global _engine
+    with _engine_lock:
+        if _engine is None:
+            workers = os.environ.get("CALC3_ENGINE_WORKERS")
+            workers = int(workers) if workers else None
+            if workers == 0:
+                _engine = InlineEngine()
+            else:
+                _engine = SolverEngine(
+                    workers=workers,
+                    max_jobs=int(os.environ.get("CALC3_ENGINE_MAX_JOBS", "200")),
+                    queue_timeout=float(os.environ.get("CALC3_ENGINE_QUEUE_TIMEOUT", "30")),
+                    start_method=os.environ.get("CALC3_ENGINE_START_METHOD") or None,
+                )
+            atexit.register(_engine.shutdown)
+        return _engine
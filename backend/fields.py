@@ -0,0 +1,99 @@
+import base64
+import os
+
+import numpy as np
+from sympy import lambdify
+
+
+# Largest number of points a single field evaluation may ask for
+FIELD_MAX_POINTS = int(os.environ.get("CALC3_FIELD_MAX_POINTS", "1000000"))
+# Compiled divergence/curl kernels kept per process
+KERNEL_CACHE_SIZE = int(os.environ.get("CALC3_KERNEL_CACHE_SIZE", "256"))
+ENCODINGS = ("json", "base64")
+
+
+def build_points(spec, dims):
+    """
+    Turn a point spec into a (dims, n) float array plus the grid shape (or None).
+    spec is ("points", ((x, y, ...), ...)) or ("grid", ((start, stop, count), ...))
+    with one axis per variable; grids are laid out with numpy's "ij" indexing.
+    """
+    kind, data = spec
+    if kind == "grid":
+        if len(data) != dims:
+            raise ValueError(f"Grid needs one axis per variable ({dims})")
+        shape = tuple(int(count) for _, _, count in data)
+        if any(count < 1 for count in shape):
+            raise ValueError("Grid axes need at least one point")
+        if int(np.prod(shape)) > FIELD_MAX_POINTS:
+            raise ValueError(f"Grid has more than {FIELD_MAX_POINTS} points")
+        axes = [np.linspace(float(a), float(b), int(count)) for a, b, count in data]
+        mesh = np.meshgrid(*axes, indexing="ij")
+        return np.stack([m.ravel() for m in mesh]), list(shape)
+
+    points = np.asarray(data, dtype=float)
+    if points.ndim != 2 or points.shape[1] != dims:
+        raise ValueError(f"Each point must have {dims} coordinates")
+    if len(points) > FIELD_MAX_POINTS:
+        raise ValueError(f"More than {FIELD_MAX_POINTS} points requested")
+    return points.T, None
+
+
+def compile_components(exprs, sym_vars):
+    """
+    Lambdify expressions into a NumPy kernel mapping a (dims, n) coordinate array
+    to a (len(exprs), n) array of values.
+    """
+    extra = set().union(*(e.free_symbols for e in exprs)) - set(sym_vars)
+    if extra:
+        names = ", ".join(sorted(str(s) for s in extra))
+        raise ValueError(f"Expression depends on symbols that are not variables: {names}")
+    func = lambdify(list(sym_vars), list(exprs), modules="numpy")
+
+    def kernel(coords):
+        n = coords.shape[1]
+        with np.errstate(all="ignore"):
+            values = func(*coords)
+        # Constant components come back as scalars
+        return np.stack([np.broadcast_to(np.asarray(v, dtype=float), (n,)) for v in values])
+
+    return kernel
+
+
+def evaluate_components(exprs, sym_vars, coords):
+    """Evaluate each expression at every column of coords in one NumPy pass"""
+    return compile_components(exprs, sym_vars)(coords)
+
+
+def encode_values(values, encoding="json"):
+    """
+    Package a float array for the response. "json" gives nested lists (NaN and
+    infinities become null); "base64" gives little-endian float64 bytes in C order.
+    """
+    if encoding == "base64":
+        data = np.ascontiguousarray(values, dtype="<f8")
+        return {
+            "encoding": "base64",
+            "dtype": "float64",
+            "shape": list(data.shape),
+            "data": base64.b64encode(data.tobytes()).decode("ascii"),
+        }
+    finite = np.isfinite(values)
+    if finite.all():
+        return values.tolist()
+    # Object array so the undefined entries can hold None
+    return np.where(finite, values, None).tolist()
+
+
+def field_result(name, values, count, shape, encoding, scalar=False):
+    """
+    Common response layout for evaluations over points. With scalar=True a
+    single-component JSON result is returned flat instead of as [[...]].
+    """
+    encoded = encode_values(values, encoding)
+    if scalar and encoding != "base64":
+        encoded = encoded[0]
+    result = {"count": count, name: encoded}
+    if shape is not None:
+        result["grid_shape"] = shape
+    return result
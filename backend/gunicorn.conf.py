@@ -0,0 +1,34 @@
+"""
+Gunicorn settings for the backend: run `gunicorn -c gunicorn.conf.py` from backend/.
+
+The app is imported once in the master (preload_app) and the web workers are
+forked from it, so Flask, SymPy and the ANTLR tables are loaded one time and
+shared copy-on-write instead of being imported again by every worker. Each web
+worker then starts its own solver pool right away rather than on the first
+request; see engine.py for how solver workers are started. The cores are split
+between those pools unless CALC3_ENGINE_WORKERS is set.
+"""
+import os
+
+bind = os.environ.get("CALC3_BIND", "0.0.0.0:5000")
+workers = int(os.environ.get("CALC3_WEB_WORKERS", "2"))
+# Requests mostly wait on the solver pool, so threads are cheap concurrency
+threads = int(os.environ.get("CALC3_WEB_THREADS", "8"))
+# One solver pool per web worker: share the cores out instead of giving each pool all of them
+os.environ.setdefault("CALC3_ENGINE_WORKERS", str(max(1, (os.cpu_count() or 1) // workers)))
+wsgi_app = "app:app"
+preload_app = True
+
+
+def when_ready(server):
+    # Runs in the master after the app is loaded and before any worker forks
+    from parser import warm_up_latex
+    warm_up_latex()
+
+
+def post_fork(server, worker):
+    # The master's log listener thread does not exist in the forked worker
+    from logs import configure_logging
+    configure_logging()
+    from engine import get_engine
+    get_engine()
@@ -0,0 +1,185 @@
+import os
+import queue
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+from logs import get_logger, log_request
+from metrics import progress_reporter
+
+
+# Jobs waiting for a job thread; submissions beyond this are refused with 503
+JOB_QUEUE_SIZE = int(os.environ.get("CALC3_JOB_QUEUE_SIZE", "64"))
+# Jobs run concurrently (each one holds a solver worker while it runs)
+JOB_WORKERS = int(os.environ.get("CALC3_JOB_WORKERS", "4"))
+# Seconds a finished job's result stays available
+JOB_TTL = float(os.environ.get("CALC3_JOB_TTL", "3600"))
+# Jobs remembered at most; the oldest finished ones are dropped first
+JOB_MAX_STORED = int(os.environ.get("CALC3_JOB_MAX_STORED", "10000"))
+
+FINAL_STATUSES = ("done", "failed")
+
+logger = get_logger("jobs")
+
+
+class JobQueueFull(Exception):
+    """Raised when the job queue is at capacity"""
+
+
+class Job:
+    def __init__(self, operation, solver, args):
+        self.id = uuid.uuid4().hex
+        self.operation = operation
+        self.solver = solver
+        self.args = args
+        self.status = "queued"
+        self.progress = None
+        self.body = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        # Bumped on every change so waiters (server-sent events) can tell what's new
+        self.version = 0
+
+    def snapshot(self):
+        """JSON view: status, latest progress and, once finished, the /calculate body"""
+        view = {
+            "id": self.id,
+            "operation": self.operation,
+            "status": self.status,
+            "progress": self.progress,
+            "created_at": round(self.created_at, 3),
+            "started_at": round(self.started_at, 3) if self.started_at else None,
+            "finished_at": round(self.finished_at, 3) if self.finished_at else None,
+        }
+        if self.body is not None:
+            view.update(self.body)
+        return view
+
+
+class JobManager:
+    """
+    Runs prepared operations in the background. Submissions go into a bounded
+    queue drained by a few job threads, each calling runner(operation, solver,
+    args) -> (body, status), the same call /calculate makes. Progress reported
+    by the solver (metrics.report_progress) is stored on the job. Threads start
+    on the first submission, so a gunicorn master that imports the app never
+    owns them.
+    """
+
+    def __init__(self, runner, workers=JOB_WORKERS, max_queued=JOB_QUEUE_SIZE, ttl=JOB_TTL,
+                 max_stored=JOB_MAX_STORED):
+        self.runner = runner
+        self.workers = workers
+        self.ttl = ttl
+        self.max_stored = max_stored
+        self._queue = queue.Queue(maxsize=max_queued)
+        self._jobs = OrderedDict()
+        self._lock = threading.Lock()
+        self._changed = threading.Condition(self._lock)
+        self._threads = []
+        self.submitted = 0
+        self.rejected = 0
+        self.completed = 0
+        self.failed = 0
+        self.running = 0
+
+    def _ensure_started(self):
+        with self._lock:
+            if self._threads:
+                return
+            for i in range(self.workers):
+                thread = threading.Thread(target=self._work, name=f"calc3-job-{i}", daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def submit(self, operation, solver, args):
+        """Queue a prepared operation and return its Job, or raise JobQueueFull"""
+        self._ensure_started()
+        job = Job(operation, solver, args)
+        with self._lock:
+            self._prune()
+            try:
+                self._queue.put_nowait(job)
+            except queue.Full:
+                self.rejected += 1
+                raise JobQueueFull(f"Job queue is full ({self._queue.maxsize} waiting), try again shortly")
+            self._jobs[job.id] = job
+            self.submitted += 1
+        return job
+
+    def get(self, job_id):
+        """Snapshot of a job, or None if it is unknown or expired"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return job.snapshot() if job else None
+
+    def wait(self, job_id, version, timeout):
+        """
+        Block until the job changes past version (or timeout seconds pass) and
+        return (snapshot, version); snapshot is None if the job is gone.
+        """
+        deadline = time.monotonic() + timeout
+        with self._changed:
+            while True:
+                job = self._jobs.get(job_id)
+                if job is None:
+                    return None, version
+                remaining = deadline - time.monotonic()
+                if job.version != version or remaining <= 0:
+                    return job.snapshot(), job.version
+                self._changed.wait(remaining)
+
+    def _update(self, job, **changes):
+        with self._changed:
+            for name, value in changes.items():
+                setattr(job, name, value)
+            job.version += 1
+            self._changed.notify_all()
+
+    def _work(self):
+        while True:
+            job = self._queue.get()
+            with self._lock:
+                self.running += 1
+            self._update(job, status="running", started_at=time.time())
+            started = time.perf_counter()
+            try:
+                with progress_reporter(lambda fields: self._update(job, progress=fields)):
+                    body, status = self.runner(job.operation, job.solver, job.args)
+            except Exception as e:
+                logger.exception("job failed", extra={"operation": job.operation, "job": job.id})
+                body, status = {"error": f"Server error: {str(e)}"}, 500
+            log_request(logger, job.operation, status, started)
+            with self._lock:
+                self.running -= 1
+                if status == 200:
+                    self.completed += 1
+                else:
+                    self.failed += 1
+            # Solver arguments can be large; the finished job only needs its answer
+            self._update(job, status="done" if status == 200 else "failed", body={**body, "http_status": status},
+                         finished_at=time.time(), args=None, solver=None)
+
+    def _prune(self):
+        """Drop expired finished jobs, then the oldest finished ones over max_stored (lock held)"""
+        now = time.time()
+        finished = [job for job in self._jobs.values() if job.status in FINAL_STATUSES]
+        for job in finished:
+            if (self.ttl and now - job.finished_at > self.ttl) or len(self._jobs) > self.max_stored:
+                del self._jobs[job.id]
+
+    def stats(self):
+        with self._lock:
+            return {
+                "queued": self._queue.qsize(),
+                "max_queued": self._queue.maxsize,
+                "running": self.running,
+                "workers": self.workers,
+                "stored": len(self._jobs),
+                "submitted": self.submitted,
+                "rejected": self.rejected,
+                "completed": self.completed,
+                "failed": self.failed,
+            }
@@ -0,0 +1,309 @@
+"""
+Hand-written parser for the subset of LaTeX that MathLive produces for our
+inputs (\\frac, \\sqrt, \\sin & co, ^{}, \\cdot, \\int_a^b ... dx). It builds
+SymPy expressions directly in one pass and follows the precedence rules of
+SymPy's ANTLR grammar, so both parsers agree on the inputs this one accepts:
+implicit products bind tighter than * and /, and a function without
+parentheses takes the whole following product as its argument
+(\\sin x y is sin(x*y)). Anything outside the subset raises UnsupportedLatex
+and the caller falls back to sympy.parsing.latex.parse_latex.
+"""
+import re
+
+from sympy import (
+    Symbol, Integer, Float, Integral, Pow, Mul, sqrt, root, exp, log, pi, oo, E, I,
+    sin, cos, tan, csc, sec, cot, asin, acos, atan, acsc, asec, acot,
+    sinh, cosh, tanh, asinh, acosh, atanh,
+)
+
+
+class UnsupportedLatex(ValueError):
+    """The input uses LaTeX outside the fast path's subset"""
+
+
+_TOKEN = re.compile(r"""
+    (?P<space>\s+|\\[,;:!\ ]|\\quad|\\qquad)
+  | (?P<command>\\[a-zA-Z]+)
+  | (?P<number>\d+(?:\.\d+)?)
+  | (?P<letter>[a-zA-Z])
+  | (?P<symbol>[-+*/^_(){}\[\]])
+""", re.VERBOSE)
+
+_TRIG = {"sin": sin, "cos": cos, "tan": tan, "csc": csc, "sec": sec, "cot": cot,
+         "sinh": sinh, "cosh": cosh, "tanh": tanh}
+_INVERSE = {"sin": asin, "cos": acos, "tan": atan, "csc": acsc, "sec": asec, "cot": acot,
+            "sinh": asinh, "cosh": acosh, "tanh": atanh}
+_FUNCTIONS = {**_TRIG, "arcsin": asin, "arccos": acos, "arctan": atan, "arccsc": acsc,
+              "arcsec": asec, "arccot": acot, "exp": exp, "ln": log, "log": log}
+
+# Greek letters become plain symbols; names SymPy would read as functions
+# (beta, gamma, zeta, lambda, Lambda) are left to the ANTLR path
+_GREEK = {
+    "alpha", "delta", "epsilon", "varepsilon", "eta", "theta", "vartheta", "iota",
+    "kappa", "mu", "nu", "xi", "rho", "sigma", "tau", "upsilon", "phi", "varphi",
+    "chi", "psi", "omega", "Gamma", "Delta", "Theta", "Xi", "Pi", "Sigma", "Upsilon",
+    "Phi", "Psi", "Omega",
+}
+_CONSTANTS = {"pi": pi, "infty": oo}
+# Single letters that the string pipeline reads as constants, and ones it
+# turns into SymPy objects that are not symbols at all
+_LETTERS = {"E": E, "I": I}
+_UNSUPPORTED_LETTERS = {"N", "O", "Q", "S"}
+
+_MUL_OPS = {"*", "\\cdot", "\\times"}
+_DIV_OPS = {"/", "\\div"}
+_FRAC = {"\\frac", "\\dfrac", "\\tfrac"}
+
+
+def _tokenize(text):
+    """
+    Split into (kind, value) tokens. \\left and \\right are dropped (their
+    delimiter is kept) and "d" directly followed by a variable becomes a
+    differential token, as in the ANTLR lexer.
+    """
+    tokens = []
+    pos = 0
+    while pos < len(text):
+        match = _TOKEN.match(text, pos)
+        if match is None:
+            raise UnsupportedLatex(f"unexpected character {text[pos]!r}")
+        pos = match.end()
+        kind = match.lastgroup
+        value = match.group()
+        if kind == "space" or value in ("\\left", "\\right"):
+            continue
+        if kind == "letter" and value == "d" and pos < len(text):
+            follow = re.match(r"[a-zA-Z]|\\[a-zA-Z]+", text[pos:])
+            if follow is not None:
+                name = follow.group().lstrip("\\")
+                if follow.group().startswith("\\") and name not in _GREEK:
+                    raise UnsupportedLatex(f"differential d\\{name}")
+                tokens.append(("differential", name))
+                pos += follow.end()
+                continue
+        tokens.append((kind, value))
+    return tokens
+
+
+class _Parser:
+    def __init__(self, text):
+        self.tokens = _tokenize(text)
+        self.pos = 0
+        self.integral_depth = 0
+
+    def peek(self, offset=0):
+        index = self.pos + offset
+        return self.tokens[index] if index < len(self.tokens) else (None, None)
+
+    def next(self):
+        token = self.peek()
+        if token[0] is None:
+            raise UnsupportedLatex("unexpected end of input")
+        self.pos += 1
+        return token
+
+    def expect(self, value):
+        kind, got = self.next()
+        if got != value:
+            raise UnsupportedLatex(f"expected {value}, got {got}")
+
+    def parse(self):
+        result = self.expr()
+        if self.peek()[0] is not None:
+            raise UnsupportedLatex(f"unexpected {self.peek()[1]}")
+        return result
+
+    # additive: mp (('+' | '-') mp)*
+    def expr(self):
+        result = self.mp()
+        while self.peek()[1] in ("+", "-"):
+            op = self.next()[1]
+            right = self.mp()
+            result = result + right if op == "+" else result - right
+        return result
+
+    # mp: unary (('*' | '/' | \cdot | ...) unary)*
+    def mp(self, nofunc=False):
+        result = self.unary(nofunc)
+        while self.peek()[1] in _MUL_OPS or self.peek()[1] in _DIV_OPS:
+            op = self.next()[1]
+            right = self.unary(nofunc)
+            result = result * right if op in _MUL_OPS else result / right
+        return result
+
+    # unary: ('+' | '-') unary | postfix+   (an implicit product)
+    def unary(self, nofunc=False):
+        op = self.peek()[1]
+        if op in ("+", "-"):
+            self.next()
+            operand = self.unary(nofunc)
+            return operand if op == "+" else -operand
+        factors = [self.power(allow_func=True)]
+        while self.starts_factor(allow_func=not nofunc):
+            factors.append(self.power(allow_func=not nofunc))
+        return Mul(*factors)
+
+    def starts_factor(self, allow_func):
+        kind, value = self.peek()
+        if kind in ("letter", "number"):
+            return True
+        if kind == "differential":
+            return self.integral_depth == 0
+        if kind == "symbol":
+            return value in ("(", "[", "{")
+        if kind == "command":
+            name = value[1:]
+            if value in _FRAC or name in _GREEK or name in _CONSTANTS or name == "sqrt":
+                return True
+            return allow_func and (name in _FUNCTIONS or name == "int")
+        return False
+
+    # exp: comp ('^' (atom | '{' expr '}'))*
+    def power(self, allow_func):
+        base = self.comp(allow_func)
+        while self.peek()[1] == "^":
+            self.next()
+            base = Pow(base, self.script())
+        if self.peek()[1] == "_":
+            raise UnsupportedLatex("subscripts")
+        return base
+
+    def script(self):
+        """The argument of ^ or _: a braced expression or a single atom"""
+        if self.peek()[1] == "{":
+            return self.group("{", "}")
+        return self.atom()
+
+    def group(self, opening, closing):
+        self.expect(opening)
+        result = self.expr()
+        self.expect(closing)
+        return result
+
+    def comp(self, allow_func):
+        kind, value = self.peek()
+        if value == "(":
+            return self.group("(", ")")
+        if value == "[":
+            return self.group("[", "]")
+        if value == "{":
+            return self.group("{", "}")
+        if kind == "command":
+            name = value[1:]
+            if value in _FRAC:
+                return self.frac()
+            if name == "sqrt":
+                return self.sqrt()
+            if allow_func and name == "int":
+                return self.integral()
+            if allow_func and name in _FUNCTIONS:
+                return self.function()
+        return self.atom()
+
+    def atom(self):
+        kind, value = self.next()
+        if kind == "number":
+            return Float(value) if "." in value else Integer(value)
+        if kind == "letter":
+            if value in _UNSUPPORTED_LETTERS:
+                raise UnsupportedLatex(f"letter {value}")
+            if self.peek()[1] == "(":
+                # f(x) is a function call in the ANTLR grammar
+                raise UnsupportedLatex("function application")
+            return _LETTERS.get(value) or Symbol(value)
+        if kind == "differential":
+            return Symbol("d" + value)
+        if kind == "command":
+            name = value[1:]
+            if name in _CONSTANTS:
+                return _CONSTANTS[name]
+            if name in _GREEK:
+                return Symbol(name)
+        raise UnsupportedLatex(f"unexpected {value}")
+
+    def frac(self):
+        self.next()
+        parts = []
+        for _ in range(2):
+            kind, value = self.peek()
+            if kind == "number" and "." not in value[:2]:
+                # \frac12: each argument is a single digit
+                if len(value) == 1:
+                    self.next()
+                else:
+                    self.tokens[self.pos] = ("number", value[1:])
+                parts.append(Integer(value[0]))
+                continue
+            if value != "{":
+                raise UnsupportedLatex("\\frac without braces")
+            if self.peek(1) in (("letter", "d"), ) or self.peek(1)[0] == "differential":
+                # \frac{d}{dx} and \frac{dy}{dx} are derivatives
+                raise UnsupportedLatex("derivative notation")
+            parts.append(self.group("{", "}"))
+        return parts[0] / parts[1]
+
+    def sqrt(self):
+        self.next()
+        index = None
+        if self.peek()[1] == "[":
+            index = self.group("[", "]")
+        if self.peek()[1] != "{":
+            raise UnsupportedLatex("\\sqrt without braces")
+        radicand = self.group("{", "}")
+        return sqrt(radicand) if index is None else root(radicand, index)
+
+    def function(self):
+        name = self.next()[1][1:]
+        base = None
+        exponent = None
+        while self.peek()[1] in ("^", "_"):
+            op = self.next()[1]
+            if op == "_":
+                if name != "log" or base is not None:
+                    raise UnsupportedLatex("subscript on function")
+                base = self.script()
+            else:
+                exponent = self.script()
+        if self.peek()[1] == "(":
+            arg = self.group("(", ")")
+        else:
+            arg = self.mp(nofunc=True)
+
+        func = _FUNCTIONS[name]
+        if exponent == -1 and name in _INVERSE:
+            return _INVERSE[name](arg)
+        result = log(arg, base) if base is not None else func(arg)
+        return Pow(result, exponent) if exponent is not None else result
+
+    def integral(self):
+        self.next()
+        lower = upper = None
+        while self.peek()[1] in ("^", "_"):
+            op = self.next()[1]
+            if op == "_":
+                lower = self.script()
+            else:
+                upper = self.script()
+        if (lower is None) != (upper is None):
+            raise UnsupportedLatex("integral with one bound")
+
+        self.integral_depth += 1
+        try:
+            if self.peek()[0] == "differential":
+                integrand = Integer(1)
+            else:
+                integrand = self.expr()
+        finally:
+            self.integral_depth -= 1
+        kind, name = self.next()
+        if kind != "differential":
+            raise UnsupportedLatex("integral without a differential")
+        var = Symbol(name)
+        if lower is None:
+            return Integral(integrand, var)
+        return Integral(integrand, (var, lower, upper))
+
+
+def parse_latex_fast(text):
+    """Parse the common LaTeX subset to a SymPy expression; raises UnsupportedLatex otherwise"""
+    return _Parser(text).parse()
@@ -0,0 +1,105 @@
+import atexit
+import json
+import logging
+import os
+import queue
+import random
+import sys
+import time
+from logging.handlers import QueueHandler, QueueListener
+
+
+# CALC3_LOG_LEVEL        minimum level (DEBUG, INFO, WARNING, ...), default INFO
+# CALC3_LOG_SAMPLE_RATE  fraction of DEBUG/INFO records kept, default 1.0;
+#                        warnings and errors are never sampled out
+# CALC3_SLOW_REQUEST_MS  when > 0, only requests at least this slow are logged
+LOG_LEVEL = os.environ.get("CALC3_LOG_LEVEL", "INFO").upper()
+SAMPLE_RATE = float(os.environ.get("CALC3_LOG_SAMPLE_RATE", "1.0"))
+SLOW_REQUEST_MS = float(os.environ.get("CALC3_SLOW_REQUEST_MS", "0"))
+
+_RESERVED = set(vars(logging.makeLogRecord({}))) | {"message", "asctime"}
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line; extra= fields are included as top-level keys"""
+
+    def format(self, record):
+        entry = {
+            "ts": round(record.created, 3),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _RESERVED:
+                entry[key] = value
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+class SamplingFilter(logging.Filter):
+    """Keeps a random fraction of records below WARNING"""
+
+    def __init__(self, rate):
+        super().__init__()
+        self.rate = rate
+
+    def filter(self, record):
+        return record.levelno >= logging.WARNING or self.rate >= 1 or random.random() < self.rate
+
+
+_listener = None
+_handler = None
+_pid = None
+
+
+def configure_logging():
+    """
+    Route the "calc3" loggers through a queue so request threads never block on
+    stdout; a background listener thread formats and writes the JSON lines.
+    Safe to call more than once (e.g. in each solver worker process). A process
+    forked after configuring (gunicorn preload) gets its own listener, since the
+    parent's thread does not survive the fork.
+    """
+    global _listener, _handler, _pid
+    if _listener is not None and _pid == os.getpid():
+        return
+    logger = logging.getLogger("calc3")
+    if _handler is not None:
+        logger.removeHandler(_handler)
+    log_queue = queue.SimpleQueue()
+    stream = logging.StreamHandler(sys.stdout)
+    stream.setFormatter(JsonFormatter())
+    _listener = QueueListener(log_queue, stream, respect_handler_level=False)
+    _listener.start()
+    atexit.register(_listener.stop)
+
+    _handler = QueueHandler(log_queue)
+    _handler.addFilter(SamplingFilter(SAMPLE_RATE))
+    _pid = os.getpid()
+    logger.setLevel(LOG_LEVEL)
+    logger.addHandler(_handler)
+    logger.propagate = False
+
+
+def get_logger(name):
+    return logging.getLogger(f"calc3.{name}")
+
+
+def log_request(logger, operation, status, started, data=None):
+    """
+    Log one finished request. Failures are always logged; successes only when
+    they beat CALC3_SLOW_REQUEST_MS (if set). The payload is logged at DEBUG.
+    """
+    duration_ms = round((time.perf_counter() - started) * 1000, 3)
+    fields = {"operation": operation, "status": status, "duration_ms": duration_ms}
+    if status >= 500:
+        logger.error("request failed", extra=fields)
+    elif SLOW_REQUEST_MS > 0:
+        if duration_ms >= SLOW_REQUEST_MS:
+            logger.warning("slow request", extra=fields)
+    else:
+        logger.info("request", extra=fields)
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("request payload", extra={**fields, "payload": data})
@@ -0,0 +1,201 @@
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+
+# Stages aggregated into histograms; finer stages (e.g. cleanup.simplify) only
+# show up in a request's opt-in "timings" field
+HISTOGRAM_STAGES = ("parse", "solve", "cleanup", "serialize", "total")
+
+# Histogram bucket upper bounds in seconds
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+
+class StageTimer:
+    """Accumulates wall-clock seconds per named stage for one request"""
+
+    def __init__(self):
+        self.stages = {}
+
+    def add(self, stage, seconds):
+        self.stages[stage] = self.stages.get(stage, 0.0) + seconds
+
+    def merge(self, timings):
+        for stage, seconds in timings.items():
+            self.add(stage, seconds)
+
+    @contextmanager
+    def stage(self, name):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - started)
+
+    def as_ms(self):
+        return {stage: round(seconds * 1000, 3) for stage, seconds in self.stages.items()}
+
+
+_current_timer = ContextVar("calc3_stage_timer", default=None)
+
+
+def current_timer():
+    return _current_timer.get()
+
+
+@contextmanager
+def request_timer():
+    """Make a fresh StageTimer current for the enclosed block"""
+    timer = StageTimer()
+    token = _current_timer.set(timer)
+    try:
+        yield timer
+    finally:
+        _current_timer.reset(token)
+
+
+@contextmanager
+def timed(stage):
+    """Time the enclosed block into the current request's timer, if there is one"""
+    timer = _current_timer.get()
+    if timer is None:
+        yield
+        return
+    with timer.stage(stage):
+        yield
+
+
+_current_progress = ContextVar("calc3_progress", default=None)
+
+
+@contextmanager
+def progress_reporter(callback):
+    """Send report_progress() calls made in the enclosed block to callback(fields)"""
+    token = _current_progress.set(callback)
+    try:
+        yield
+    finally:
+        _current_progress.reset(token)
+
+
+def report_progress(**fields):
+    """
+    Tell whoever is waiting on this solve how far it got (e.g. which integration
+    variable is done). A no-op unless a progress_reporter is active.
+    """
+    callback = _current_progress.get()
+    if callback is None:
+        return
+    try:
+        callback(fields)
+    except Exception:
+        # Progress is best effort and must never fail the solve
+        pass
+
+
+def run_timed(func, *args):
+    """
+    Call func(*args) under its own timer and return (value, timings in seconds).
+    Solve time is the call's wall time minus the cleanup calc3 reported.
+    """
+    with request_timer() as timer:
+        started = time.perf_counter()
+        value = func(*args)
+        elapsed = time.perf_counter() - started
+    timings = dict(timer.stages)
+    timings["solve"] = max(elapsed - timings.get("cleanup", 0.0), 0.0)
+    return value, timings
+
+
+_counts = {}
+_counts_lock = threading.Lock()
+
+
+def count(name, amount=1):
+    """
+    Bump a per-process event counter (e.g. derivative cache hits). Solver
+    workers hand theirs back with each result, see take_counts().
+    """
+    with _counts_lock:
+        _counts[name] = _counts.get(name, 0) + amount
+
+
+def take_counts():
+    """The counts gathered since the last call, resetting them"""
+    global _counts
+    with _counts_lock:
+        taken, _counts = _counts, {}
+    return taken
+
+
+class Histogram:
+    def __init__(self):
+        self.counts = [0] * len(BUCKETS)
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, seconds):
+        for i, bound in enumerate(BUCKETS):
+            if seconds <= bound:
+                self.counts[i] += 1
+        self.total += seconds
+        self.count += 1
+
+
+class MetricsRegistry:
+    """Per-process request counters and stage latency histograms"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.histograms = {}
+        self.requests = {}
+        self.counts = {}
+
+    def add_counts(self, counts):
+        """Fold in event counts taken in this or a worker process"""
+        with self._lock:
+            for name, amount in counts.items():
+                self.counts[name] = self.counts.get(name, 0) + amount
+
+    def get_count(self, name):
+        with self._lock:
+            return self.counts.get(name, 0)
+
+    def observe_request(self, operation, status, timer):
+        with self._lock:
+            key = (operation, str(status))
+            self.requests[key] = self.requests.get(key, 0) + 1
+            for stage in HISTOGRAM_STAGES:
+                if stage in timer.stages:
+                    histogram = self.histograms.setdefault((operation, stage), Histogram())
+                    histogram.observe(timer.stages[stage])
+
+    def render(self, extra=()):
+        """Prometheus text exposition; extra is an iterable of (name, type, help, value)"""
+        lines = [
+            "# HELP calc3_requests_total Requests handled, by operation and HTTP status.",
+            "# TYPE calc3_requests_total counter",
+        ]
+        with self._lock:
+            for (operation, status), count in sorted(self.requests.items()):
+                lines.append(f'calc3_requests_total{{operation="{operation}",status="{status}"}} {count}')
+
+            lines += [
+                "# HELP calc3_stage_seconds Time spent per request stage, by operation.",
+                "# TYPE calc3_stage_seconds histogram",
+            ]
+            for (operation, stage), histogram in sorted(self.histograms.items()):
+                labels = f'operation="{operation}",stage="{stage}"'
+                for bound, count in zip(BUCKETS, histogram.counts):
+                    lines.append(f'calc3_stage_seconds_bucket{{{labels},le="{bound}"}} {count}')
+                lines.append(f'calc3_stage_seconds_bucket{{{labels},le="+Inf"}} {histogram.count}')
+                lines.append(f"calc3_stage_seconds_sum{{{labels}}} {histogram.total:.6f}")
+                lines.append(f"calc3_stage_seconds_count{{{labels}}} {histogram.count}")
+
+        for name, metric_type, help_text, value in extra:
+            lines += [f"# HELP {name} {help_text}", f"# TYPE {name} {metric_type}", f"{name} {value}"]
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
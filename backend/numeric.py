@@ -0,0 +1,184 @@
+import mpmath
+import numpy as np
+from sympy import lambdify, sympify
+
+
+def _as_array(value, size):
+    """lambdify returns scalars for constant expressions; broadcast them"""
+    arr = np.asarray(value, dtype=float)
+    if arr.shape != (size,):
+        arr = np.broadcast_to(arr, (size,)).astype(float)
+    return arr
+
+
+def _gauss_legendre_pass(integrand, bounds, n):
+    """
+    One tensor-product Gauss-Legendre pass with n nodes per dimension.
+    `bounds` run innermost first, as in solve_multiple_integral; each bound is a
+    pair of callables of the variables outside it, so limits like y from 0 to x work.
+    """
+    xi, wi = np.polynomial.legendre.leggauss(n)
+
+    # Points of the variables integrated so far (outermost first) and their weights
+    points = []
+    weights = np.ones(1)
+    for lower, upper in reversed(bounds):
+        a = _as_array(lower(*points), weights.size)
+        b = _as_array(upper(*points), weights.size)
+        half = (b - a) / 2
+        mid = (b + a) / 2
+        # Every existing point fans out into n nodes along the new axis
+        new_axis = (mid[:, None] + half[:, None] * xi[None, :]).ravel()
+        weights = (weights[:, None] * half[:, None] * wi[None, :]).ravel()
+        points = [np.repeat(p, n) for p in points] + [new_axis]
+
+    values = _as_array(integrand(*points), weights.size)
+    return float(np.dot(weights, values))
+
+
+def numeric_multiple_integral(expr, limits, rel_tol=1e-10, abs_tol=1e-12, max_points=4_000_000):
+    """
+    Evaluate an iterated integral numerically.
+    `expr` is a SymPy expression and `limits` a list of (symbol, lower, upper) with
+    the innermost integral first; bounds may depend on the outer variables.
+    The node count per dimension doubles until two passes agree within tolerance.
+    Returns (value, error_estimate, nodes_per_dimension).
+    """
+    expr = sympify(expr)
+    limits = [(var, sympify(a), sympify(b)) for var, a, b in limits]
+    variables = [var for var, _, _ in limits]
+    outer_vars = list(reversed(variables))
+    free = expr.free_symbols - set(variables)
+    for _, a, b in limits:
+        free |= (a.free_symbols | b.free_symbols) - set(variables)
+    if free:
+        names = ", ".join(sorted(str(s) for s in free))
+        raise ValueError(f"Numeric integration needs numeric limits and integrand; free symbols: {names}")
+
+    # Integrand takes the variables outermost first, matching the point order
+    integrand = lambdify(outer_vars, expr, "numpy")
+    bounds = []
+    for i, (_, a, b) in enumerate(limits):
+        depends_on = outer_vars[:len(limits) - 1 - i]
+        bounds.append((lambdify(depends_on, a, "numpy"), lambdify(depends_on, b, "numpy")))
+
+    dims = len(limits)
+    n = 8
+    with np.errstate(all="ignore"):
+        value = _gauss_legendre_pass(integrand, bounds, n)
+        error = float("inf")
+        while (2 * n) ** dims <= max_points:
+            n *= 2
+            refined = _gauss_legendre_pass(integrand, bounds, n)
+            error = abs(refined - value)
+            value = refined
+            if not np.isfinite(value) or error <= max(abs_tol, rel_tol * abs(value)):
+                break
+    if not np.isfinite(value):
+        raise ValueError("Integrand is not finite on the region")
+    return value, error, n
+
+
+def _damped_newton(system, jacobian, x, tol, max_iter):
+    """Newton iteration with backtracking on the residual norm; None if it stalls"""
+    residual = np.linalg.norm(np.asarray(system(*x), dtype=float).ravel())
+    for _ in range(max_iter):
+        if not np.isfinite(residual):
+            return None
+        if residual < tol:
+            return x
+        J = np.asarray(jacobian(*x), dtype=float).reshape(len(x), len(x))
+        F = np.asarray(system(*x), dtype=float).ravel()
+        # Least squares keeps the step defined where J is singular
+        step = np.linalg.lstsq(J, -F, rcond=None)[0]
+        t = 1.0
+        while t > 1e-4:
+            candidate = x + t * step
+            candidate_residual = np.linalg.norm(np.asarray(system(*candidate), dtype=float).ravel())
+            if np.isfinite(candidate_residual) and candidate_residual < residual:
+                break
+            t /= 2
+        else:
+            return None
+        x, residual = candidate, candidate_residual
+    return x if residual < tol else None
+
+
+def newton_multistart(system, jacobian, dim, starts=48, seed=0, tol=1e-10, max_iter=60):
+    """
+    Find distinct roots of a square system F(x) = 0 by running damped Newton from
+    `starts` pseudo-random points (fixed seed, so results are reproducible).
+    system(*x) returns the residuals and jacobian(*x) the dim x dim Jacobian.
+    """
+    rng = np.random.default_rng(seed)
+    scales = (1.0, 3.0, 10.0)
+    roots = []
+    with np.errstate(all="ignore"):
+        for i in range(starts):
+            x = rng.standard_normal(dim) * scales[i % len(scales)]
+            root = _damped_newton(system, jacobian, x, tol, max_iter)
+            if root is None:
+                continue
+            if not any(np.allclose(root, r, rtol=1e-6, atol=1e-8) for r in roots):
+                roots.append(root)
+    return roots
+
+
+def tangent_hessian_eigenvalues(hessian, constraint_jacobian):
+    """
+    Eigenvalues of the Hessian restricted to the null space of the constraint
+    Jacobian (the second-order test for constrained critical points).
+    """
+    H = np.asarray(hessian, dtype=float)
+    A = np.atleast_2d(np.asarray(constraint_jacobian, dtype=float))
+    _, s, vt = np.linalg.svd(A)
+    rank = int(np.sum(s > 1e-9 * max(1.0, s.max(initial=0.0))))
+    Z = vt[rank:].T
+    if Z.shape[1] == 0:
+        return np.array([])
+    return np.linalg.eigvalsh(Z.T @ H @ Z)
+
+
+# Gauss-Legendre nodes tried by quad_1d before handing over to tanh-sinh
+QUAD_MAX_NODES = 512
+
+
+def quad_1d(expr, var, a, b, places):
+    """
+    Integrate a 1-D expression to about `places` decimal places. Up to 12 places
+    the Gauss-Legendre doubling of numeric_multiple_integral is tried first; past
+    that, or when it has not converged by QUAD_MAX_NODES (kinks, endpoint
+    singularities), mpmath's tanh-sinh quadrature runs at matching precision.
+    Returns (value, error_estimate, details) where value is a float or mpf.
+    """
+    tol = 10.0 ** -(places + 2)
+    gauss = None
+    if places <= 12:
+        value, error, nodes = numeric_multiple_integral(expr, [(var, a, b)], rel_tol=tol, abs_tol=tol,
+                                                        max_points=QUAD_MAX_NODES)
+        gauss = (value, error, {"quadrature": "gauss-legendre", "nodes": nodes})
+        if error <= max(tol, tol * abs(value)):
+            return gauss
+
+    func = lambdify([var], sympify(expr), "mpmath")
+    with mpmath.workdps(places + 10):
+        value, error = mpmath.quad(func, [mpmath.mpf(sympify(a).evalf(places + 10)),
+                                          mpmath.mpf(sympify(b).evalf(places + 10))], error=True)
+        if mpmath.im(value) != 0:
+            raise ValueError("Integrand is not real on the interval")
+    if gauss and gauss[1] < error:
+        # Neither converged (typically a kink inside the interval); report the closer one
+        return gauss
+    return mpmath.re(value), float(error), {"quadrature": "tanh-sinh", "working_digits": places + 10}
+
+
+def format_decimal(value, places):
+    """value rounded to `places` decimals as a string; beyond double precision via mpmath"""
+    if places <= 15:
+        return str(round(float(value), places))
+    with mpmath.workdps(places + 10):
+        value = mpmath.mpf(value)
+        if value == 0:
+            return "0.0"
+        whole_digits = max(int(mpmath.floor(mpmath.log10(abs(value)))) + 1, 1)
+        return mpmath.nstr(value, places + whole_digits, min_fixed=-mpmath.inf, max_fixed=mpmath.inf)
@@ -0,0 +1,622 @@
+import os
+
+from calc3 import (
+    solve_partial_derivative,
+    solve_multiple_integral,
+    solve_region_integral,
+    solve_arc_length,
+    solve_piecewise_arc_length,
+    solve_gradient,
+    solve_gradient_field,
+    solve_divergence,
+    solve_curl,
+    solve_line_integral,
+    solve_surface_integral,
+    solve_directional_derivative,
+    solve_directional_derivative_field,
+    solve_greens_theorem,
+    solve_greens_boundary,
+    greens_polygon_pieces,
+    solve_stokes_theorem,
+    solve_stokes_boundary,
+    solve_lagrange_multipliers,
+    ARC_LENGTH_PRECISION,
+    ARC_LENGTH_SYMBOLIC_BUDGET,
+    SURFACE_SYMBOLIC_BUDGET
+)
+
+from crosscheck import CROSS_CHECK_MODES, solve_cross_check, solve_in_parts
+from fields import ENCODINGS
+from regions import COORDINATES, REGION_DIMENSIONS
+from parser import (
+    parse_sympy,
+    parse_integral_latex,
+    parse_vector,
+    parse_limits,
+    parse_integral_limits,
+    extract_variables_from_string,
+    preprocess_constraint
+)
+
+
+# Seconds of symbolic integration before "auto" mode switches to numeric cubature
+SYMBOLIC_BUDGET = float(os.environ.get("CALC3_SYMBOLIC_BUDGET", "10"))
+INTEGRAL_METHODS = ("auto", "symbolic", "numeric")
+INTEGRATION_ORDERS = ("given", "auto")
+# Upper bounds on the arc length "precision" (decimal places) and "segments" options
+MAX_ARC_LENGTH_PRECISION = 50
+MAX_ARC_LENGTH_SEGMENTS = 100
+# Upper bounds on partial_derivative "order" and "taylor" degree
+MAX_DERIVATIVE_ORDER = 20
+MAX_TAYLOR_DEGREE = 10
+
+
+class OperationError(Exception):
+    """Invalid request payload; reported to the client with the given status"""
+
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+# Each prepare function parses a /calculate payload and returns (solver, args)
+# so the caller decides how to run solver(*args): cached, pooled, batched, ...
+# Expressions are handed over as parsed SymPy objects wherever the solver
+# doesn't need the text, so they are never re-parsed from strings.
+
+def _whole_number(data, key, default, largest, smallest=0):
+    """An integer option, also accepted as a string of digits ("order": "2")"""
+    value = data.get(key, default)
+    if isinstance(value, str) and value.strip().isdigit():
+        value = int(value)
+    if isinstance(value, bool) or not isinstance(value, int) or not smallest <= value <= largest:
+        raise OperationError(f"{key} must be a whole number from {smallest} to {largest}")
+    return value
+
+def _variable_names(value, function_expr):
+    """A list or comma-separated string of variables, or the function's own (sorted) for true"""
+    if value is True:
+        if function_expr is None:
+            raise OperationError("A function is required")
+        return sorted(str(s) for s in function_expr.free_symbols)
+    if isinstance(value, (list, tuple)):
+        names = [str(v).strip() for v in value]
+    else:
+        names = parse_vector(value) if isinstance(value, str) else []
+    if not names:
+        raise OperationError("At least one variable is required")
+    unknown = [name for name in names if not name.isidentifier()]
+    if unknown:
+        raise OperationError(f"Not a variable name: {', '.join(unknown)}")
+    return names
+
+def _parse_taylor(taylor, function_expr):
+    """{"point": ..., "degree": n, "variables": optional} -> (variables, point, degree)"""
+    if not isinstance(taylor, dict):
+        raise OperationError('taylor must be an object with a "point" and a "degree"')
+    variables = _variable_names(taylor.get("variables", True), function_expr)
+    point = taylor.get("point", "")
+    point = [parse_sympy(str(p)) for p in point] if isinstance(point, (list, tuple)) else parse_vector(point, as_sympy=True)
+    if len(point) != len(variables):
+        raise OperationError(f"Taylor point must have {len(variables)} coordinates ({', '.join(variables)})")
+    return variables, point, _whole_number(taylor, "degree", 2, MAX_TAYLOR_DEGREE, smallest=1)
+
+def prepare_partial_derivative(data):
+    function_str = data.get("function", "")
+    variables_str = data.get("variables", "")
+
+    # Parse using SymPy
+    function_expr = parse_sympy(function_str)
+    variables = _variable_names(variables_str, function_expr)
+    order = _whole_number(data, "order", 1, MAX_DERIVATIVE_ORDER, smallest=1)
+    hessian = data.get("hessian")
+    hessian_vars = _variable_names(hessian, function_expr) if hessian else None
+    taylor = _parse_taylor(data["taylor"], function_expr) if data.get("taylor") else None
+    if hessian_vars is None and taylor is None:
+        return solve_partial_derivative, (function_expr, variables, order)
+    return solve_partial_derivative, (function_expr, variables, order, hessian_vars, taylor)
+
+def _integral_options(data, default_timeout=SYMBOLIC_BUDGET):
+    """The "method" and "symbolic_timeout" options shared by the integral operations"""
+    method = data.get("method", "auto")
+    if method not in INTEGRAL_METHODS:
+        raise OperationError(f"Unknown integration method: {method}")
+    try:
+        symbolic_timeout = float(data.get("symbolic_timeout", default_timeout))
+    except (TypeError, ValueError):
+        raise OperationError("symbolic_timeout must be a number of seconds")
+    return method, symbolic_timeout
+
+def _prepare_multiple_integral(data, default_vars, default_limits):
+    expression_str = data.get("function", "")
+    variables_str = data.get("variables", default_vars)
+    limits_str = data.get("limits", default_limits)
+    order = data.get("integration_order", "given")
+
+    if not expression_str.strip():
+        raise OperationError("Expression cannot be empty")
+    method, symbolic_timeout = _integral_options(data)
+    if order not in INTEGRATION_ORDERS:
+        raise OperationError(f"Unknown integration order: {order}")
+
+    # Check if it's a LaTeX integral template
+    if '\\int' in expression_str:
+        integrand, latex_limits = parse_integral_latex(expression_str)
+        if latex_limits:
+            limits = latex_limits
+        else:
+            variables = parse_vector(variables_str)
+            limits = parse_integral_limits(limits_str, variables)
+    else:
+        # Regular expression
+        integrand = parse_sympy(expression_str)
+        variables = parse_vector(variables_str)
+        limits = parse_integral_limits(limits_str, variables)
+
+    return solve_multiple_integral, (integrand, limits, method, symbolic_timeout, order)
+
+def prepare_double_integral(data):
+    return _prepare_multiple_integral(data, "x,y", "0,1,0,1")
+
+def prepare_double_integral_polar(data):
+    return _prepare_multiple_integral(data, "r,theta", "0,1,0,2*pi")
+
+def prepare_triple_integral(data):
+    return _prepare_multiple_integral(data, "x,y,z", "0,1,0,1,0,1")
+
+def prepare_triple_integral_cylindrical(data):
+    # Polar and cylindrical share the r, theta, z defaults
+    return _prepare_multiple_integral(data, "r,theta,z", "0,1,0,2*pi,0,1")
+
+def _region_value(value, name):
+    """A region parameter from JSON: a number or an expression such as "pi/2" or "a" """
+    parsed = parse_sympy(str(value)) if value is not None else None
+    if parsed is None:
+        raise OperationError(f"Region {name} is missing")
+    return parsed
+
+def _region_values(value, name, count):
+    """A list of region parameters, given as a JSON list or a comma-separated string"""
+    if isinstance(value, str):
+        value = [v for v in value.split(',') if v.strip()]
+    if not isinstance(value, (list, tuple)) or len(value) != count:
+        raise OperationError(f"Region {name} needs {count} values")
+    return tuple(_region_value(v, name) for v in value)
+
+def _parse_region(spec):
+    """
+    Read a region description, e.g. {"type": "disk", "radius": 2, "center": [0, 1]}.
+    rectangle/box: "bounds" ([[x0, x1], [y0, y1], ...] or "x0,x1,y0,y1,...");
+    disk/cylinder/ball: "radius", optional "center", "inner" (radius of a hole)
+    and "angles" ([start, stop], default a full turn); a cylinder also needs "z".
+    polar: "r" ([r0, r1], curves in theta, or a single outer curve), optional
+    "center" and "angles".
+    """
+    if not isinstance(spec, dict):
+        raise OperationError("region must be an object with a \"type\"")
+    kind = spec.get("type")
+    if kind not in REGION_DIMENSIONS:
+        raise OperationError(f"Unknown region type: {kind}")
+    dims = REGION_DIMENSIONS[kind]
+    region = {"type": kind}
+    if kind in ("rectangle", "box"):
+        bounds = spec.get("bounds")
+        if isinstance(bounds, (list, tuple)) and all(isinstance(b, (list, tuple)) for b in bounds):
+            bounds = [v for b in bounds for v in b]
+        values = _region_values(bounds, "bounds", 2 * dims)
+        region["bounds"] = tuple(zip(values[::2], values[1::2]))
+        return region
+
+    if kind == "polar":
+        curves = spec.get("r")
+        if not isinstance(curves, (list, tuple)):
+            curves = [0, curves]
+        region["r"] = _region_values(curves, "r", 2)
+    else:
+        region["radius"] = _region_value(spec.get("radius"), "radius")
+    if spec.get("center") is not None:
+        region["center"] = _region_values(spec["center"], "center", dims)
+    if spec.get("inner") is not None:
+        region["inner"] = _region_value(spec["inner"], "inner")
+    if spec.get("angles") is not None:
+        region["angles"] = _region_values(spec["angles"], "angles", 2)
+    if kind == "cylinder":
+        region["z"] = _region_values(spec.get("z"), "z", 2)
+    return region
+
+def prepare_region_integral(data):
+    expression_str = data.get("function", "")
+    coordinates = data.get("coordinates", "auto")
+
+    if not expression_str.strip():
+        raise OperationError("Expression cannot be empty")
+    region = _parse_region(data.get("region"))
+    if coordinates != "auto" and coordinates not in COORDINATES:
+        raise OperationError(f"Unknown coordinates: {coordinates}")
+    dims = REGION_DIMENSIONS[region["type"]]
+    variables = parse_vector(data.get("variables", "x,y,z"[:2 * dims - 1]))
+    if len(variables) != dims:
+        raise OperationError(f"A {region['type']} needs {dims} variables")
+    method, symbolic_timeout = _integral_options(data)
+
+    function_expr = parse_sympy(expression_str)
+    return solve_region_integral, (function_expr, region, variables, coordinates, method, symbolic_timeout)
+
+def _arc_length_precision(data):
+    precision = data.get("precision", ARC_LENGTH_PRECISION)
+    if isinstance(precision, bool) or not isinstance(precision, int) or not 0 <= precision <= MAX_ARC_LENGTH_PRECISION:
+        raise OperationError(f"precision must be a whole number of decimal places from 0 to {MAX_ARC_LENGTH_PRECISION}")
+    return precision
+
+def prepare_arc_length(data):
+    parametric_str = data.get("parametric", "")
+    parameter_str = data.get("parameter", "t")
+    limits_str = data.get("limits", "0,1")
+    segments = data.get("segments")
+
+    parameter = parameter_str.strip() if parameter_str.strip() else 't'
+    method, symbolic_timeout = _integral_options(data, ARC_LENGTH_SYMBOLIC_BUDGET)
+    precision = _arc_length_precision(data)
+
+    if segments is not None:
+        # A piecewise curve: [{"parametric": "t,0", "limits": "0,1"}, ...] in one parameter
+        if not isinstance(segments, list) or not segments or not all(isinstance(s, dict) for s in segments):
+            raise OperationError("segments must be a non-empty list of {\"parametric\", \"limits\"} objects")
+        if len(segments) > MAX_ARC_LENGTH_SEGMENTS:
+            raise OperationError(f"At most {MAX_ARC_LENGTH_SEGMENTS} segments are allowed")
+        parsed = []
+        for segment in segments:
+            limits = segment.get("limits", "0,1")
+            if isinstance(limits, (list, tuple)):
+                limits = ",".join(str(v) for v in limits)
+            limits = parse_limits(limits)
+            parsed.append((tuple(parse_vector(segment.get("parametric", ""), as_sympy=True)), limits[0], limits[1]))
+        return solve_piecewise_arc_length, (tuple(parsed), parameter, method, symbolic_timeout, precision)
+
+    # Parse parametric functions
+    parametric_functions = parse_vector(parametric_str, as_sympy=True)
+    limits = parse_limits(limits_str)
+
+    return solve_arc_length, (parametric_functions, parameter, limits[0], limits[1], method, symbolic_timeout,
+                              precision)
+
+def prepare_gradient(data):
+    function_str = data.get("function", "")
+    variables_str = data.get("variables", "x,y,z")
+    point_str = data.get("point", "")
+
+    function_expr = parse_sympy(function_str)
+    variables = parse_vector(variables_str)
+    point = parse_vector(point_str, as_sympy=True) if point_str else None
+
+    return solve_gradient, (function_expr, variables, point)
+
+def _number(value):
+    """A coordinate from JSON: a number, or a string such as "pi/2" """
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return float(value)
+    parsed = parse_sympy(str(value))
+    try:
+        return float(parsed)
+    except (TypeError, ValueError):
+        raise OperationError(f"Not a number: {value}")
+
+def _parse_point_spec(data, variables):
+    """
+    Read the points a *_field operation is evaluated at. Either
+      "points": [[x, y, z], ...]  (or the string "x,y,z; x,y,z; ...")
+      "grid": {"x": [start, stop, count], ...}  (or one [start, stop, count] per variable)
+    Returns the ("points" | "grid", ...) spec understood by fields.build_points.
+    """
+    grid = data.get("grid")
+    if grid:
+        if isinstance(grid, dict):
+            missing = [v for v in variables if v not in grid]
+            if missing:
+                raise OperationError(f"Grid is missing axes for: {', '.join(missing)}")
+            grid = [grid[v] for v in variables]
+        axes = []
+        for axis in grid:
+            if not isinstance(axis, (list, tuple)) or len(axis) != 3:
+                raise OperationError("Grid axes must be [start, stop, count]")
+            start, stop, count = axis
+            if not isinstance(count, int) or isinstance(count, bool):
+                raise OperationError("Grid point counts must be integers")
+            axes.append((_number(start), _number(stop), count))
+        return "grid", tuple(axes)
+
+    points = data.get("points")
+    if isinstance(points, str):
+        points = [p.split(',') for p in points.split(';') if p.strip()]
+    if not points:
+        raise OperationError("Provide either \"points\" or \"grid\"")
+    return "points", tuple(tuple(_number(c) for c in point) for point in points)
+
+def _wants_points(data):
+    """Divergence and curl are also evaluated over points when the payload asks for it"""
+    return bool(data.get("grid") or data.get("points"))
+
+def _field_encoding(data):
+    encoding = data.get("encoding", "json")
+    if encoding not in ENCODINGS:
+        raise OperationError(f"Unknown encoding: {encoding}")
+    return encoding
+
+def prepare_gradient_field(data):
+    function_str = data.get("function", "")
+    variables_str = data.get("variables", "x,y,z")
+
+    function_expr = parse_sympy(function_str)
+    variables = parse_vector(variables_str)
+    points = _parse_point_spec(data, variables)
+
+    return solve_gradient_field, (function_expr, variables, points, _field_encoding(data))
+
+def prepare_divergence(data):
+    vector_field_str = data.get("vector_field", "")
+
+    vector_field = parse_vector(vector_field_str, as_sympy=True)
+    variables = ['x', 'y', 'z'][:len(vector_field)]
+
+    if _wants_points(data):
+        return solve_divergence, (vector_field, variables, _parse_point_spec(data, variables), _field_encoding(data))
+    return solve_divergence, (vector_field, variables)
+
+def prepare_curl(data):
+    vector_field_str = data.get("vector_field", "")
+
+    vector_field = parse_vector(vector_field_str, as_sympy=True)
+    variables = ['x', 'y', 'z']  # Curl is always 3D
+
+    if _wants_points(data):
+        return solve_curl, (vector_field, variables, _parse_point_spec(data, variables), _field_encoding(data))
+    return solve_curl, (vector_field, variables)
+
+def _prepare_line_integral(data, scalar):
+    field_str = data.get("function" if scalar else "vector_field", "")
+    curve_str = data.get("curve", "")
+    limits_str = data.get("limits", "0,1")
+
+    # Parse field (scalar string or vector list)
+    if scalar:
+        field = parse_sympy(field_str)
+    else:
+        field = parse_vector(field_str, as_sympy=True)
+
+    curve = parse_vector(curve_str, as_sympy=True)
+    limits = parse_limits(limits_str)
+
+    return solve_line_integral, (field, 't', curve, limits)
+
+def prepare_scalar_line_integral(data):
+    return _prepare_line_integral(data, scalar=True)
+
+def prepare_vector_line_integral(data):
+    return _prepare_line_integral(data, scalar=False)
+
+def _surface_setup(data):
+    """Shared parsing for surface integral and Stokes' theorem payloads"""
+    vector_field_str = data.get("vector_field", "")
+    surface_str = data.get("surface", "")
+    u_bounds_str = data.get("u_bounds", "0,1")  # New field for u bounds
+    v_bounds_str = data.get("v_bounds", "0,1")  # New field for v bounds
+
+    vector_field = parse_vector(vector_field_str)
+    surface = parse_vector(surface_str)  # Parse as vector/tuple
+
+    # Extract variables using regex method
+    all_vars = set()
+
+    # Get variables from vector field components
+    for field_component in vector_field:
+        field_vars = extract_variables_from_string(field_component)
+        all_vars.update(field_vars)
+
+    # Get variables from surface components
+    for surface_component in surface:
+        surface_vars = extract_variables_from_string(surface_component)
+        all_vars.update(surface_vars)
+
+    # Filter parameters (excluding x, y, z which are coordinate variables)
+    excluded = {'x', 'y', 'z'}
+    params = [var for var in all_vars if var not in excluded]
+    params.sort()  # Sort for consistency
+
+    # If no parameters found, use default u, v
+    if not params:
+        params = ['u', 'v']
+    elif len(params) == 1:
+        params.append('v')  # Add second parameter if only one found
+
+    # Extract coordinate variables (x, y, z) for the function call
+    variables = [var for var in all_vars if var in {'x', 'y', 'z'}]
+    if not variables:
+        variables = ['x', 'y', 'z']  # Default variables
+    variables.sort()  # Sort for consistency
+
+    # Parse the bounds for u and v
+    u_bounds = parse_limits(u_bounds_str)
+    v_bounds = parse_limits(v_bounds_str)
+    bounds = [(u_bounds[0], u_bounds[1]), (v_bounds[0], v_bounds[1])]
+
+    # Hand the solver the parsed expressions (memoized, so this doesn't re-parse)
+    vector_field = parse_vector(vector_field_str, as_sympy=True)
+    surface = parse_vector(surface_str, as_sympy=True)
+
+    method, symbolic_timeout = _integral_options(data, SURFACE_SYMBOLIC_BUDGET)
+
+    return vector_field, params, surface, bounds, variables, method, symbolic_timeout
+
+def prepare_surface_integral(data):
+    return solve_surface_integral, _surface_setup(data)
+
+def prepare_directional_derivative(data):
+    function_str = data.get("function", "")
+    direction_str = data.get("direction", "")
+    point_str = data.get("point", "")
+
+    function_expr = parse_sympy(function_str)
+    direction = parse_vector(direction_str, as_sympy=True)
+    point = parse_vector(point_str, as_sympy=True) if point_str else None
+
+    variables = ['x', 'y', 'z'][:len(direction)]
+
+    return solve_directional_derivative, (function_expr, variables, direction, point)
+
+def prepare_directional_derivative_field(data):
+    function_str = data.get("function", "")
+    direction_str = data.get("direction", "")
+
+    function_expr = parse_sympy(function_str)
+    direction = parse_vector(direction_str, as_sympy=True)
+    variables = ['x', 'y', 'z'][:len(direction)]
+    points = _parse_point_spec(data, variables)
+
+    return solve_directional_derivative_field, (function_expr, variables, direction, points, _field_encoding(data))
+
+def _with_cross_check(data, primary, alternative, args):
+    """
+    (solver, args) for the primary formulation, or, when the payload asks for a
+    "cross_check" ("race" or "confirm"), solve_cross_check over both of them
+    (they take the same arguments)
+    """
+    mode = data.get("cross_check")
+    if not mode:
+        return primary[1], args
+    if mode not in CROSS_CHECK_MODES:
+        raise OperationError(f"Unknown cross_check mode: {mode}")
+    return solve_cross_check, (mode, ((primary[0], primary[1], args), (alternative[0], alternative[1], args)))
+
+def _parse_polygon(spec):
+    """Vertices as [[x, y], ...] or "x,y; x,y; ..." """
+    vertices = spec.get("vertices")
+    if isinstance(vertices, str):
+        vertices = [v.split(',') for v in vertices.split(';') if v.strip()]
+    if not isinstance(vertices, (list, tuple)) or len(vertices) < 3:
+        raise OperationError("A polygon needs at least 3 vertices")
+    return {"type": "polygon", "vertices": tuple(_region_values(v, "vertex", 2) for v in vertices)}
+
+def _parse_plane_region(spec):
+    """A Green's theorem region: a polygon or a 2-D region_integral region (rectangle, disk, polar)"""
+    if isinstance(spec, dict) and spec.get("type") == "polygon":
+        return _parse_polygon(spec)
+    region = _parse_region(spec)
+    if REGION_DIMENSIONS[region["type"]] != 2:
+        raise OperationError(f"A {region['type']} is not a plane region")
+    return region
+
+def prepare_greens_theorem(data):
+    vector_field_str = data.get("vector_field", "")
+    x_bounds_str = data.get("x_bounds", "0,1")  # New field for x bounds
+    y_bounds_str = data.get("y_bounds", "0,1")  # New field for y bounds
+    region_spec = data.get("region")
+
+    vector_field = parse_vector(vector_field_str)
+
+    # Extract variables using regex method
+    all_vars = set()
+    for field_component in vector_field:
+        field_vars = extract_variables_from_string(field_component)
+        all_vars.update(field_vars)
+
+    # Filter coordinate variables for Green's theorem (2D)
+    excluded = {'u', 'v', 't', 'r', 'theta', 'phi', 'rho'}
+    variables = [var for var in all_vars if var not in excluded]
+    variables.sort()  # Sort for consistency
+
+    # Default to x, y if no variables found or keep it 2D
+    if not variables or len(variables) < 2:
+        variables = ['x', 'y']
+    else:
+        # Keep only first 2 variables for Green's theorem (2D)
+        variables = variables[:2]
+
+    method, symbolic_timeout = _integral_options(data)
+    vector_field = parse_vector(vector_field_str, as_sympy=True)
+
+    if region_spec is not None:
+        region = _parse_plane_region(region_spec)
+    else:
+        # Parse the bounds for x and y; either pair may be functions of the other variable
+        x_bounds = parse_limits(x_bounds_str)
+        y_bounds = parse_limits(y_bounds_str)
+        region = [(x_bounds[0], x_bounds[1]), (y_bounds[0], y_bounds[1])]
+    args = (vector_field, region, variables, method, symbolic_timeout)
+
+    if region_spec is not None and region["type"] == "polygon" and not data.get("cross_check"):
+        try:
+            pieces = greens_polygon_pieces(vector_field, region["vertices"], variables)
+        except ValueError as e:
+            raise OperationError(str(e))
+        if len(pieces) > 1:
+            # Each strip is its own solver job, so the pool integrates them side by side
+            return solve_in_parts, (tuple((solve_greens_theorem, (vector_field, piece, variables, method,
+                                                                  symbolic_timeout)) for piece in pieces),)
+    return _with_cross_check(data, ("area", solve_greens_theorem), ("boundary", solve_greens_boundary), args)
+
+def prepare_stokes_theorem(data):
+    return _with_cross_check(data, ("surface", solve_stokes_theorem), ("boundary", solve_stokes_boundary),
+                             _surface_setup(data))
+
+def prepare_lagrange_multipliers(data):
+    function_str = data.get("function", "")
+    # One constraint in "constraint", or several as a "constraints" list / "g1=0; g2=0"
+    constraint_strs = data.get("constraints") or data.get("constraint", "").split(';')
+    if isinstance(constraint_strs, str):
+        constraint_strs = constraint_strs.split(';')
+    constraint_strs = [preprocess_constraint(c.strip()) for c in constraint_strs if c.strip()]
+    if not constraint_strs:
+        raise OperationError("At least one constraint is required.")
+
+    # Extract variables from the function and every constraint
+    all_vars = extract_variables_from_string(function_str)
+    for constraint_str in constraint_strs:
+        all_vars = all_vars.union(extract_variables_from_string(constraint_str))
+
+    # Convert to sorted list
+    variables = sorted(list(all_vars))
+
+    if not variables:
+        raise OperationError("Could not extract variables from the function and constraint.")
+
+    # Parse expressions once; the solver takes the SymPy objects as they are
+    function_expr = parse_sympy(function_str)
+    constraints = tuple(parse_sympy(c) for c in constraint_strs)
+    if len(constraints) == 1:
+        return solve_lagrange_multipliers, (function_expr, constraints[0], variables)
+    return solve_lagrange_multipliers, (function_expr, constraints, variables)
+
+OPERATIONS = {
+    "partial_derivative": prepare_partial_derivative,
+    "double_integral": prepare_double_integral,
+    "double_integral_polar": prepare_double_integral_polar,
+    "triple_integral": prepare_triple_integral,
+    "triple_integral_polar": prepare_triple_integral_cylindrical,
+    "triple_integral_cylindrical": prepare_triple_integral_cylindrical,
+    "region_integral": prepare_region_integral,
+    "arc_length": prepare_arc_length,
+    "gradient": prepare_gradient,
+    "gradient_field": prepare_gradient_field,
+    "divergence": prepare_divergence,
+    "curl": prepare_curl,
+    "scalar_line_integral": prepare_scalar_line_integral,
+    "vector_line_integral": prepare_vector_line_integral,
+    "surface_integral": prepare_surface_integral,
+    "directional_derivative": prepare_directional_derivative,
+    "directional_derivative_field": prepare_directional_derivative_field,
+    "greens_theorem": prepare_greens_theorem,
+    "stokes_theorem": prepare_stokes_theorem,
+    "lagrange_multipliers": prepare_lagrange_multipliers,
+}
+
+
+def prepare_operation(data):
+    """Look up and run the prepare function for a payload: returns (operation, solver, args)"""
+    if not isinstance(data, dict):
+        raise OperationError("Request body must be a JSON object")
+    operation = data.get("operation", "")
+    prepare = OPERATIONS.get(operation)
+    if prepare is None:
+        raise OperationError(f"Unknown operation: {operation}")
+    solver, args = prepare(data)
+    return operation, solver, args
@@ -1,6 +1,20 @@
+import os
+import re
+from functools import lru_cache
+
 from sympy import sympify, symbols, latex
 from sympy.parsing.latex import parse_latex
-import re
+
+from latex_fast import parse_latex_fast
+from metrics import timed
+
+# Distinct raw inputs remembered by the memoized parse layer
+PARSE_CACHE_SIZE = int(os.environ.get("CALC3_PARSE_CACHE_SIZE", "4096"))
+# Set CALC3_LATEX_FAST_PATH=0 to send all LaTeX through the ANTLR parser
+LATEX_FAST_PATH = os.environ.get("CALC3_LATEX_FAST_PATH", "1") != "0"
+
+# Which parser handled each distinct LaTeX input (cache hits are not counted)
+_latex_counts = {"fast_path": 0, "antlr": 0}
 
 def preprocess_constraint(constraint_str):
     """
@@ -67,10 +81,49 @@ def clean_power_formatting(expr_str):
     
     return expr_str
 
-def parse_expression(expr):
+def _parse_latex_fast(expr):
     """
-    Parse any mathematical expression (LaTeX or regular) using SymPy.
-    Returns a cleaned string representation of the SymPy expression.
+    Try the hand-written parser on preprocessed LaTeX; None means the input is
+    outside its subset and the ANTLR parser should take it.
+    """
+    if not LATEX_FAST_PATH:
+        return None
+    try:
+        with timed("parse.fast"):
+            parsed = parse_latex_fast(expr)
+    except Exception:
+        return None
+    _latex_counts["fast_path"] += 1
+    return parsed
+
+def warm_up_latex():
+    """
+    Build the ANTLR lexer/parser tables now instead of on the first input the fast
+    path hands over (about half a second). Called in the gunicorn master so the
+    forked workers share them.
+    """
+    try:
+        parse_latex("x^2")
+    except Exception:
+        pass
+
+def _normalize_latex(parsed):
+    """
+    parse_latex builds unevaluated trees such as (2*x)*3 or log(x, E); evaluate them
+    exactly as the string pipeline always has. This runs once per distinct input.
+    """
+    try:
+        return sympify(clean_power_formatting(parsed))
+    except Exception:
+        return parsed
+
+@lru_cache(maxsize=PARSE_CACHE_SIZE)
+def parse_sympy(expr):
+    """
+    Parse any mathematical expression (LaTeX or regular) to a SymPy object.
+    Results are memoized on the raw input string, so repeated inputs (vector
+    components, limit bounds, resubmitted problems) are only parsed once.
+    Returns None for empty input.
     """
     if not expr or not expr.strip():
         return None
@@ -83,14 +136,23 @@ def parse_expression(expr):
     elif expr.startswith('$') and expr.endswith('$'):
         expr = expr[1:-1].strip()
     
+    # Common LaTeX (including brace-only input such as e^{x}) skips ANTLR;
+    # the fast parser builds evaluated expressions, so no normalizing pass
+    if '\\' in expr or '{' in expr:
+        parsed = _parse_latex_fast(preprocess_latex(expr))
+        if parsed is not None:
+            return parsed
+
     try:
         # Try LaTeX parsing first if it looks like LaTeX
         if '\\' in expr:
             try:
                 # Preprocess LaTeX to fix common formatting issues
                 expr = preprocess_latex(expr)
-                parsed_expr = parse_latex(expr)
-                return clean_power_formatting(parsed_expr)
+                _latex_counts["antlr"] += 1
+                with timed("parse.latex"):
+                    parsed = parse_latex(expr)
+                return _normalize_latex(parsed)
             except:
                 # If parse_latex fails, do manual conversion
                 expr = expr.replace('\\sin', 'sin')
@@ -104,23 +166,49 @@ def parse_expression(expr):
                 expr = expr.replace('\\pi', 'pi')
                 expr = expr.replace('\\cdot', '*')
                 expr = expr.replace('^', '**')
-                parsed_expr = sympify(expr)
-                return clean_power_formatting(parsed_expr)
+                return sympify(expr)
         else:
             # Handle common patterns and use sympify
             expr = expr.replace('^', '**')  # Convert powers
-            parsed_expr = sympify(expr)
-            return clean_power_formatting(parsed_expr)
+            return sympify(expr)
     except:
         try:
             # Fallback: try sympify with power conversion
             expr = expr.replace('^', '**')
-            parsed_expr = sympify(expr)
-            return clean_power_formatting(parsed_expr)
+            return sympify(expr)
         except:
-            # Last resort: return as symbol with cleanup
-            result = symbols(expr)
-            return clean_power_formatting(result)
+            # Last resort: return as symbol
+            return symbols(expr)
+
+def parse_expression(expr):
+    """
+    Parse any mathematical expression (LaTeX or regular) using SymPy.
+    Returns a cleaned string representation of the SymPy expression.
+    """
+    parsed = parse_sympy(expr)
+    if parsed is None:
+        return None
+    return clean_power_formatting(parsed)
+
+def parse_cache_stats():
+    """Hit/miss counters of the memoized parse layer"""
+    stats = {}
+    for name, func in (("expressions", parse_sympy), ("integrals", _parse_integral_latex)):
+        info = func.cache_info()
+        lookups = info.hits + info.misses
+        stats[name] = {
+            "size": info.currsize,
+            "max_size": info.maxsize,
+            "hits": info.hits,
+            "misses": info.misses,
+            "hit_rate": round(info.hits / lookups, 4) if lookups else 0.0,
+        }
+    latex_total = _latex_counts["fast_path"] + _latex_counts["antlr"]
+    stats["latex"] = {
+        **_latex_counts,
+        "fast_path_rate": round(_latex_counts["fast_path"] / latex_total, 4) if latex_total else 0.0,
+    }
+    return stats
 
 def preprocess_latex(latex_expr):
     """
@@ -150,7 +238,12 @@ def parse_integral_latex(latex_expr):
     """
     if not latex_expr or not latex_expr.strip():
         return "", []
-    
+    integrand, limits = _parse_integral_latex(latex_expr)
+    return integrand, list(limits)
+
+@lru_cache(maxsize=PARSE_CACHE_SIZE)
+def _parse_integral_latex(latex_expr):
+    """Memoized body of parse_integral_latex; limits come back as a tuple"""
     latex_expr = latex_expr.strip()
     
     # Remove LaTeX delimiters
@@ -163,12 +256,16 @@ def parse_integral_latex(latex_expr):
     latex_expr = preprocess_latex(latex_expr)
     
     try:
-        # Parse the LaTeX integral using SymPy's parse_latex
-        try:
-            parsed = parse_latex(latex_expr)
-        except:
-            # If parse_latex fails, return the original expression
-            return latex_expr, []
+        # Parse the LaTeX integral, falling back to SymPy's parse_latex
+        parsed = _parse_latex_fast(latex_expr)
+        if parsed is None:
+            try:
+                _latex_counts["antlr"] += 1
+                with timed("parse.latex"):
+                    parsed = parse_latex(latex_expr)
+            except:
+                # If parse_latex fails, return the original expression
+                return latex_expr, ()
         
         # If it's an Integral object, extract components
         if hasattr(parsed, 'function') and hasattr(parsed, 'limits'):
@@ -184,16 +281,19 @@ def parse_integral_latex(latex_expr):
                     var = limit_tuple[0]
                     limits.append((str(var), "0", "1"))
             
-            return integrand, limits
+            return integrand, tuple(limits)
         else:
             # Not an integral, just return the expression
-            return str(parsed), []
+            return str(parsed), ()
     except:
         # Fallback: return the original expression
-        return latex_expr, []
+        return latex_expr, ()
 
-def parse_vector(vector_str):
-    """Parse vector input (comma-separated values)"""
+def parse_vector(vector_str, as_sympy=False):
+    """
+    Parse vector input (comma-separated values).
+    Components are cleaned strings, or SymPy expressions with as_sympy=True.
+    """
     if not vector_str:
         return []
     
@@ -207,9 +307,11 @@ def parse_vector(vector_str):
     for comp in vector_str.split(','):
         comp = comp.strip()
         if comp:
-            parsed = parse_expression(comp)
-            # The parse_expression already applies clean_power_formatting
-            components.append(parsed if parsed else comp)
+            parsed = parse_sympy(comp)
+            if parsed is None:
+                components.append(comp)
+            else:
+                components.append(parsed if as_sympy else clean_power_formatting(parsed))
     
     return components
 
@@ -225,9 +327,9 @@ def parse_limits(limits_str):
         parts = limits_str.split(',')
         if len(parts) == 2:
             try:
-                lower = parse_expression(parts[0].strip())
-                upper = parse_expression(parts[1].strip())
-                return [sympify(lower) if lower else 0, sympify(upper) if upper else 1]
+                lower = parse_sympy(parts[0].strip())
+                upper = parse_sympy(parts[1].strip())
+                return [lower if lower is not None else 0, upper if upper is not None else 1]
             except:
                 return [0, 1]
     
@@ -236,9 +338,9 @@ def parse_limits(limits_str):
         parts = limits_str.lower().split('to')
         if len(parts) == 2:
             try:
-                lower = parse_expression(parts[0].strip())
-                upper = parse_expression(parts[1].strip())
-                return [sympify(lower) if lower else 0, sympify(upper) if upper else 1]
+                lower = parse_sympy(parts[0].strip())
+                upper = parse_sympy(parts[1].strip())
+                return [lower if lower is not None else 0, upper if upper is not None else 1]
             except:
                 return [0, 1]
     
@@ -246,9 +348,9 @@ def parse_limits(limits_str):
     parts = limits_str.split()
     if len(parts) == 2:
         try:
-            lower = parse_expression(parts[0])
-            upper = parse_expression(parts[1])
-            return [sympify(lower) if lower else 0, sympify(upper) if upper else 1]
+            lower = parse_sympy(parts[0])
+            upper = parse_sympy(parts[1])
+            return [lower if lower is not None else 0, upper if upper is not None else 1]
         except:
             return [0, 1]
     
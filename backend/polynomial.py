@@ -0,0 +1,127 @@
+from sympy import Float, Poly, Rational, groebner, expand
+
+
+# Working precision (digits) for roots that are not rational
+PRECISION = 50
+# Relative size below which a remainder coefficient is rounding noise in _square_free
+SQF_TOLERANCE = 1e-25
+
+
+def _real_roots(poly):
+    """
+    Real roots of a univariate polynomial. Rational coefficients go through exact
+    real-root isolation, so complex branches are dropped before anything is
+    evaluated; irrational roots come back as PRECISION-digit Floats. Each root
+    is listed once, whatever its multiplicity.
+    """
+    if poly.degree() < 1:
+        return []
+    if poly.domain.is_QQ or poly.domain.is_ZZ:
+        roots = []
+        for root in poly.sqf_part().real_roots():
+            roots.append(root if isinstance(root, Rational) else Float(root.evalf(PRECISION), PRECISION))
+        return roots
+    if poly.degree() == 1:
+        c1, c0 = poly.all_coeffs()
+        return [Float((-c0 / c1).evalf(PRECISION), PRECISION)]
+    # Coefficients already contain earlier irrational roots: numeric roots at high precision
+    roots = []
+    for root in _square_free(poly).nroots(n=PRECISION, maxsteps=200):
+        re_part, im_part = root.as_real_imag()
+        if abs(im_part) <= 1e-12 * max(1, abs(re_part)):
+            roots.append(Float(re_part, PRECISION))
+    return roots
+
+
+def _square_free(poly):
+    """
+    poly / gcd(poly, poly') for Float coefficients, where sqf_part() does
+    nothing: Euclid's algorithm with remainder coefficients at rounding-noise
+    level counted as zero. Repeated roots would otherwise come back several
+    times, and stall nroots.
+    """
+    a, b = poly, poly.diff()
+    while not b.is_zero:
+        remainder = a.rem(b)
+        scale = max(abs(c) for c in a.all_coeffs())
+        coeffs = [0 if abs(c) <= SQF_TOLERANCE * scale else c for c in remainder.all_coeffs()]
+        a, b = b, Poly(coeffs, *poly.gens)
+    if a.degree() < 1:
+        return poly
+    return poly.quo(a)
+
+
+def _reduce(poly, branch, var):
+    """
+    Substitute the values found so far into poly (a Poly in all unknowns) and
+    return a Poly in var, or None if nothing is left. With Float values each
+    coefficient is compared to the size of the terms that produced it, so pure
+    rounding noise counts as zero.
+    """
+    reduced = Poly(expand(poly.as_expr().subs(branch)), var)
+    if reduced.is_zero:
+        return None
+    if all(value.is_Rational for value in branch.values()):
+        return reduced
+
+    magnitude = {}
+    for monom, coeff in poly.terms():
+        size = abs(coeff)
+        for symbol, power in zip(poly.gens, monom):
+            if symbol in branch:
+                size *= abs(branch[symbol]) ** power
+        power = monom[poly.gens.index(var)]
+        magnitude[power] = magnitude.get(power, 0) + size
+    coeffs = []
+    for power, coeff in zip(range(reduced.degree(), -1, -1), reduced.all_coeffs()):
+        coeffs.append(0 if abs(coeff) <= 1e-20 * magnitude.get(power, 0) else coeff)
+    reduced = Poly(coeffs, var)
+    return None if reduced.is_zero else reduced
+
+
+def _vanishes_at(poly, root):
+    """Relative residual test, so large Groebner coefficients don't hide a root"""
+    value = poly.eval(root)
+    if value == 0:
+        return True
+    scale = sum(abs(c) for c in poly.all_coeffs()) * max(1, abs(root)) ** poly.degree()
+    return abs(value.evalf(PRECISION)) <= 1e-20 * scale
+
+
+def groebner_real_solutions(equations, unknowns):
+    """
+    Real solutions of a polynomial system via a lex Groebner basis: the basis is
+    triangular, so roots are found one variable at a time starting from the last
+    unknown and substituted back. Returns a list of {symbol: value} dicts, or None
+    when the system has infinitely many solutions.
+    """
+    basis = groebner(equations, *unknowns, order='lex')
+    if basis.exprs == [1]:
+        return []  # inconsistent: no solutions at all
+    if not basis.is_zero_dimensional:
+        return None
+
+    branches = [{}]
+    for i in range(len(unknowns) - 1, -1, -1):
+        var = unknowns[i]
+        known = set(unknowns[i + 1:])
+        polys = [Poly(p, *unknowns) for p in basis.exprs
+                 if var in p.free_symbols and p.free_symbols <= known | {var}]
+        next_branches = []
+        for branch in branches:
+            reduced = [_reduce(p, branch, var) for p in polys]
+            reduced = [p for p in reduced if p is not None]
+            if not reduced:
+                return None
+            # The lowest-degree polynomial proposes roots, the rest must vanish there too
+            reduced.sort(key=lambda p: p.degree())
+            for root in _real_roots(reduced[0]):
+                if all(_vanishes_at(p, root) for p in reduced[1:]):
+                    next_branches.append({**branch, var: root})
+        branches = next_branches
+    # Different branches can still meet at the same point
+    unique = []
+    for branch in branches:
+        if branch not in unique:
+            unique.append(branch)
+    return unique
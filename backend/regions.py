@@ -0,0 +1,185 @@
+from collections import namedtuple
+
+from sympy import Symbol, sqrt, sin, cos, pi, S
+
+
+REGION_TYPES = ("rectangle", "box", "disk", "polar", "cylinder", "ball")
+COORDINATES = ("cartesian", "polar", "cylindrical", "spherical")
+# Number of Cartesian variables each region lives in
+REGION_DIMENSIONS = {"rectangle": 2, "disk": 2, "polar": 2, "box": 3, "cylinder": 3, "ball": 3}
+
+R, THETA, RHO, PHI = Symbol('r'), Symbol('theta'), Symbol('rho'), Symbol('phi')
+
+# coordinates: name from COORDINATES; substitution: Cartesian symbol -> expression
+# in the new variables; limits: (symbol, lower, upper) innermost first
+Description = namedtuple("Description", "coordinates substitution jacobian limits")
+
+
+def _full_turn(region):
+    start, stop = region.get("angles", (S.Zero, 2 * pi))
+    return (stop - start) == 2 * pi
+
+
+def describe(region, variables):
+    """
+    Every way of writing the region as an iterated integral that this module
+    knows, natural coordinates first. variables are the Cartesian symbols.
+    A disk, cylinder or ball also has a Cartesian description (with square-root
+    limits) when it is complete: no hole and a full turn.
+    """
+    kind = region["type"]
+    if kind in ("rectangle", "box"):
+        limits = [(var, a, b) for var, (a, b) in zip(variables, region["bounds"])]
+        return [Description("cartesian", {}, S.One, limits)]
+
+    center = region.get("center") or (S.Zero,) * len(variables)
+    radius = region.get("radius")
+    inner = region.get("inner", S.Zero)
+    start, stop = region.get("angles", (S.Zero, 2 * pi))
+    solid = inner == 0 and _full_turn(region)
+    x, y = variables[:2]
+    cx, cy = center[:2]
+    polar = {x: cx + R * cos(THETA), y: cy + R * sin(THETA)}
+
+    if kind == "polar":
+        # Between two curves r = r0(theta) and r = r1(theta)
+        inner, outer = region["r"]
+        return [Description("polar", polar, R, [(R, inner, outer), (THETA, start, stop)])]
+
+    if kind == "disk":
+        descriptions = [Description("polar", polar, R, [(R, inner, radius), (THETA, start, stop)])]
+        if solid:
+            half = sqrt(radius**2 - (x - cx)**2)
+            descriptions.append(Description("cartesian", {}, S.One,
+                                            [(y, cy - half, cy + half), (x, cx - radius, cx + radius)]))
+        return descriptions
+
+    z = variables[2]
+    cz = center[2]
+    if kind == "cylinder":
+        z0, z1 = region["z"]
+        descriptions = [Description("cylindrical", polar, R, [(R, inner, radius), (THETA, start, stop), (z, z0, z1)])]
+        if solid:
+            half = sqrt(radius**2 - (x - cx)**2)
+            descriptions.append(Description("cartesian", {}, S.One,
+                                            [(y, cy - half, cy + half), (x, cx - radius, cx + radius), (z, z0, z1)]))
+        return descriptions
+
+    # ball (a spherical shell when inner > 0)
+    spherical = {x: cx + RHO * sin(PHI) * cos(THETA), y: cy + RHO * sin(PHI) * sin(THETA), z: cz + RHO * cos(PHI)}
+    descriptions = [Description("spherical", spherical, RHO**2 * sin(PHI),
+                                [(RHO, inner, radius), (PHI, S.Zero, pi), (THETA, start, stop)])]
+    if solid:
+        height = sqrt(radius**2 - R**2)
+        descriptions.append(Description("cylindrical", polar, R,
+                                        [(z, cz - height, cz + height), (R, S.Zero, radius), (THETA, S.Zero, 2 * pi)]))
+        half_z = sqrt(radius**2 - (x - cx)**2 - (y - cy)**2)
+        half_y = sqrt(radius**2 - (x - cx)**2)
+        descriptions.append(Description("cartesian", {}, S.One,
+                                        [(z, cz - half_z, cz + half_z), (y, cy - half_y, cy + half_y),
+                                         (x, cx - radius, cx + radius)]))
+    return descriptions
+
+
+def reflections(region, variables):
+    """
+    (variable, image) pairs for the mirror symmetries of the region: reflecting
+    variable to image maps the region onto itself. An integrand that changes sign
+    under one of them integrates to zero.
+    """
+    kind = region["type"]
+    if kind in ("rectangle", "box"):
+        return [(var, a + b - var) for var, (a, b) in zip(variables, region["bounds"])]
+    if kind == "polar":
+        # Curves in theta have no mirror symmetry in general
+        return []
+    center = region.get("center") or (S.Zero,) * len(variables)
+    pairs = []
+    if _full_turn(region):
+        pairs += [(var, 2 * c - var) for var, c in zip(variables[:2], center[:2])]
+    if kind == "ball":
+        pairs.append((variables[2], 2 * center[2] - variables[2]))
+    elif kind == "cylinder":
+        z0, z1 = region["z"]
+        pairs.append((variables[2], z0 + z1 - variables[2]))
+    return pairs
+
+
+def _cross(o, a, b):
+    return (a[0] - o[0]) * (b[1] - o[1]) - (a[1] - o[1]) * (b[0] - o[0])
+
+
+def counterclockwise(vertices):
+    """Polygon vertices as exact (x, y) numbers, reordered counterclockwise if needed"""
+    points = [(S(x), S(y)) for x, y in vertices]
+    if not all(c.is_number and c.is_real for point in points for c in point):
+        raise ValueError("Polygon vertices must be real numbers")
+    twice_area = sum(_cross((S.Zero, S.Zero), p, q) for p, q in zip(points, points[1:] + points[:1]))
+    if twice_area == 0:
+        raise ValueError("Polygon has no area")
+    return points if twice_area > 0 else points[::-1]
+
+
+def _inside(point, a, b, c):
+    """point in the closed counterclockwise triangle abc"""
+    return _cross(a, b, point) >= 0 and _cross(b, c, point) >= 0 and _cross(c, a, point) >= 0
+
+
+def triangulate(vertices):
+    """Ear clipping of a simple polygon (either orientation) into counterclockwise triangles"""
+    remaining = counterclockwise(vertices)
+    triangles = []
+    while len(remaining) > 3:
+        for i, current in enumerate(remaining):
+            before, after = remaining[i - 1], remaining[(i + 1) % len(remaining)]
+            turn = _cross(before, current, after)
+            if turn == 0:
+                # Collinear vertex: drop it, the edge stays the same
+                del remaining[i]
+                break
+            if turn < 0 or any(_inside(p, before, current, after)
+                               for p in remaining if p not in (before, current, after)):
+                continue
+            triangles.append((before, current, after))
+            del remaining[i]
+            break
+        else:
+            raise ValueError("Polygon edges cross; the vertices must trace a simple polygon")
+    if _cross(*remaining) != 0:
+        triangles.append(tuple(remaining))
+    return triangles
+
+
+def _strips(triangle, inner, outer, outer_index):
+    """
+    A triangle as at most two iterated-integral pieces with outer running along
+    axis outer_index: (inner, lower edge, upper edge), (outer, start, stop)
+    """
+    o, i = outer_index, 1 - outer_index
+    a, b, c = sorted(triangle, key=lambda p: p[o])
+
+    def edge(p, q):
+        return p[i] + (q[i] - p[i]) * (outer - p[o]) / (q[o] - p[o])
+
+    pieces = []
+    for p, q in ((a, b), (b, c)):
+        if p[o] == q[o]:
+            continue
+        short, long = edge(p, q), edge(a, c)
+        middle = (p[o] + q[o]) / 2
+        lower, upper = (short, long) if short.subs(outer, middle) <= long.subs(outer, middle) else (long, short)
+        pieces.append([(inner, lower, upper), (outer, p[o], q[o])])
+    return pieces
+
+
+def polygon_pieces(vertices, variables, inner):
+    """
+    Cut a simple polygon into pieces an iterated integral can cover directly:
+    triangles by ear clipping, each split at its middle vertex into strips along
+    the other variable. inner is the variable integrated first. Returns a list of
+    limits, innermost first.
+    """
+    x, y = variables
+    outer = y if inner == x else x
+    outer_index = 0 if outer == x else 1
+    return [piece for triangle in triangulate(vertices) for piece in _strips(triangle, inner, outer, outer_index)]
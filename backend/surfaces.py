@@ -0,0 +1,81 @@
+from sympy import Poly, PolynomialError, S, expand, factor, sqrt, trigsimp
+
+
+SURFACE_TYPES = ("plane", "graph", "sphere", "cylinder", "cone", "torus")
+AXES = "xyz"
+
+
+def _is_constant(expression, params):
+    return not expression.free_symbols & set(params)
+
+
+def _split(components, params):
+    """Each component as (constant part, part that moves with the parameters)"""
+    return [component.as_independent(*params, as_Add=True) for component in components]
+
+
+def _is_linear(component, params):
+    try:
+        return Poly(component, *params).total_degree() <= 1
+    except PolynomialError:
+        return False
+
+
+def recognize(surface, params):
+    """
+    Name a standard parametrization of a surface r(u, v) (a list of three SymPy
+    expressions): plane, graph, sphere, cylinder, cone or torus, as a dict with
+    "type" plus the center, axis and radii where they apply; None otherwise.
+    Only the shape of r is looked at, not the parameter bounds.
+    """
+    u, v = params
+    if all(_is_linear(component, params) for component in surface):
+        return {"type": "plane"}
+    if {u, v} <= set(surface):
+        return {"type": "graph", "height": AXES[[i for i, c in enumerate(surface) if c not in (u, v)][0]]}
+
+    parts = _split(surface, params)
+    center = [constant for constant, _ in parts]
+    moving = [varying for _, varying in parts]
+    if 0 in moving:
+        # e.g. a disk in polar form: one coordinate never moves
+        return {"type": "plane"}
+    squared = trigsimp(expand(sum(m**2 for m in moving)))
+    if _is_constant(squared, params):
+        return {"type": "sphere", "center": center, "radius": sqrt(squared)}
+
+    for k in (2, 0, 1):
+        i, j = [n for n in range(3) if n != k]
+        across = trigsimp(expand(moving[i]**2 + moving[j]**2))
+        if _is_constant(across, params):
+            return {"type": "cylinder", "axis": AXES[k], "radius": sqrt(across)}
+        if expand(trigsimp(expand(across - moving[k]**2))) == 0:
+            return {"type": "cone", "axis": AXES[k], "apex": center}
+        # Torus: the distance from the axis is R + rho*cos(...), a perfect square under the root
+        base, exponent = factor(across).as_base_exp()
+        if exponent == 2:
+            major = base.as_independent(*params, as_Add=True)[0]
+            minor = trigsimp(expand((base - major)**2 + moving[k]**2))
+            if major != 0 and _is_constant(minor, params):
+                return {"type": "torus", "axis": AXES[k], "center": center, "major_radius": major,
+                        "minor_radius": sqrt(minor)}
+    return None
+
+
+def periodic_parameters(surface, params, bounds):
+    """
+    Parameters whose interval is a full period of the surface: r(p + (upper -
+    lower)) == r(p), so the surface closes up in that direction (the angles of a
+    sphere, cylinder or torus). Intervals that depend on the other parameter are
+    never counted.
+    """
+    closed = []
+    for p, (lower, upper) in zip(params, bounds):
+        span = S(upper) - S(lower)
+        if span == 0 or not _is_constant(span, params):
+            continue
+        if not any(p in component.free_symbols for component in surface):
+            continue
+        if all(expand(component.subs(p, p + span) - component) == 0 for component in surface):
+            closed.append(p)
+    return closed
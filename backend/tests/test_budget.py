@@ -0,0 +1,86 @@
+import threading
+import time
+
+from budget import BudgetExceeded, time_budget, within_budget
+
+
+def spin(seconds):
+    started = time.monotonic()
+    while time.monotonic() - started < seconds:
+        pass
+    return seconds
+
+
+def on_thread(func):
+    """Run func on a fresh non-main thread (where budgets can't use SIGALRM) and return its value"""
+    result = {}
+    thread = threading.Thread(target=lambda: result.setdefault("value", func()))
+    thread.start()
+    thread.join()
+    return result["value"]
+
+
+def timed(func):
+    started = time.monotonic()
+    value = func()
+    return value, time.monotonic() - started
+
+
+def test_budget_interrupts_main_thread():
+    value, elapsed = timed(lambda: within_budget(0.2, spin, 5))
+    assert value == (False, None)
+    assert elapsed < 1
+
+
+def test_budget_interrupts_other_threads():
+    value, elapsed = on_thread(lambda: timed(lambda: within_budget(0.2, spin, 5)))
+    assert value == (False, None)
+    assert elapsed < 1
+
+
+def test_finished_block_keeps_its_value():
+    assert on_thread(lambda: within_budget(1, spin, 0.05)) == (True, 0.05)
+
+
+def test_inner_budget_expiry_is_caught_by_the_inner_block():
+    assert on_thread(lambda: within_budget(2, lambda: within_budget(0.1, spin, 5))) == (True, (False, None))
+
+
+def test_outer_budget_expiry_propagates_through_the_inner_block():
+    value, elapsed = on_thread(lambda: timed(lambda: within_budget(0.2, lambda: within_budget(2, spin, 5))))
+    assert value == (False, None)
+    assert elapsed < 1
+
+
+def test_outer_expiry_survives_an_inner_expiry_that_replaced_it():
+    # Both timers fire while the thread sits in C code (sleep), so only one async
+    # exception can be pending; the outer budget must still end the outer block.
+    def body():
+        inner = within_budget(0.1, time.sleep, 0.3)
+        spin(2)
+        return inner
+
+    value, elapsed = on_thread(lambda: timed(lambda: within_budget(0.05, body)))
+    assert value == (False, None)
+    assert elapsed < 1.5
+
+
+def test_no_exception_left_pending_after_the_block():
+    def body():
+        within_budget(0.05, time.sleep, 0.2)
+        spin(0.3)
+        return "done"
+
+    assert on_thread(lambda: within_budget(5, body)) == (True, "done")
+
+
+def test_time_budget_reports_expiry():
+    def run():
+        try:
+            with time_budget(0.1) as budget:
+                spin(5)
+        except BudgetExceeded as e:
+            return e.budget is budget and budget.expired
+        return False
+
+    assert on_thread(run)
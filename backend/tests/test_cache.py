@@ -0,0 +1,71 @@
+import time
+
+from sympy import sympify
+
+from cache import ResultCache, cached_solve, canonical_form, is_error_result, make_key
+
+
+def test_equivalent_inputs_share_a_key():
+    assert make_key("gradient", ("x**2 + y", ["x", "y"])) == make_key("gradient", ("y + x**2", ["x", "y"]))
+    assert make_key("gradient", (sympify("x**2 + y"), ["x", "y"])) == make_key("gradient", ("y + x**2", ["x", "y"]))
+
+
+def test_different_problems_get_different_keys():
+    assert make_key("gradient", ("x**2", ["x"])) != make_key("gradient", ("x**3", ["x"]))
+    assert make_key("gradient", ("x**2", ["x"])) != make_key("divergence", ("x**2", ["x"]))
+    # Variable order changes the answer of e.g. a mixed partial
+    assert make_key("partial_derivative", ("x*y", ["x", "y"])) != make_key("partial_derivative", ("x*y", ["y", "x"]))
+
+
+def test_dict_arguments_ignore_key_order():
+    assert canonical_form({"a": "x + 1", "b": 2}) == canonical_form({"b": 2, "a": "1 + x"})
+
+
+def test_unparseable_strings_are_kept_as_is():
+    assert canonical_form("lambda") == "lambda"
+
+
+def test_cached_solve_returns_the_solver_result_and_reuses_it():
+    calls = []
+
+    def solver(expr):
+        calls.append(expr)
+        return str(sympify(expr).diff("x"))
+
+    first = cached_solve("test_cached_solve", solver, "x**3 + x")
+    second = cached_solve("test_cached_solve", solver, "x + x**3")
+    assert first == second == "3*x**2 + 1"
+    assert len(calls) == 1
+
+
+def test_errors_are_not_cached():
+    calls = []
+
+    def solver():
+        calls.append(1)
+        return "Error: try again"
+
+    cached_solve("test_errors_are_not_cached", solver)
+    cached_solve("test_errors_are_not_cached", solver)
+    assert len(calls) == 2
+    assert is_error_result({"error": "x"}) and is_error_result(["Error: x"]) and not is_error_result("0")
+
+
+def test_lru_eviction_and_counters():
+    cache = ResultCache(max_size=2, ttl=0)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == (True, 1)
+    cache.set("c", 3)  # evicts b, the least recently used
+    assert cache.get("b") == (False, None)
+    assert cache.get("c") == (True, 3)
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["evictions"], stats["size"]) == (2, 1, 1, 2)
+
+
+def test_entries_expire_after_ttl():
+    cache = ResultCache(max_size=10, ttl=0.05)
+    cache.set("a", 1)
+    assert cache.get("a") == (True, 1)
+    time.sleep(0.1)
+    assert cache.get("a") == (False, None)
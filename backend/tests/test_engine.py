@@ -0,0 +1,95 @@
+import threading
+import time
+
+import pytest
+
+import calc3
+from engine import Cancelled, InlineEngine, SolverEngine
+from timeouts import SolveTimeout
+
+
+@pytest.fixture(scope="module")
+def engine():
+    pool = SolverEngine(workers=1, queue_timeout=60)
+    yield pool
+    pool.shutdown()
+
+
+def wait_idle(pool, workers=1, seconds=30):
+    deadline = time.monotonic() + seconds
+    while pool.stats()["idle"] < workers and time.monotonic() < deadline:
+        time.sleep(0.05)
+
+
+PROBLEMS = [
+    (calc3.solve_gradient, ("x**2*y + sin(z)", ["x", "y", "z"])),
+    (calc3.solve_divergence, (["x*y", "y*z", "z*x"], ["x", "y", "z"])),
+    (calc3.solve_multiple_integral, ("x*y**2", [("x", 0, 1), ("y", 0, 2)])),
+]
+
+
+@pytest.mark.parametrize("solver, args", PROBLEMS)
+def test_pool_matches_inline_results(engine, solver, args):
+    assert engine.run("test", solver, args) == InlineEngine().run("test", solver, args) == solver(*args)
+
+
+def test_timeout_replaces_the_worker(engine):
+    with pytest.raises(SolveTimeout):
+        engine.run("test", time.sleep, (5,), timeout=0.5)
+    wait_idle(engine)
+    assert engine.stats()["busy"] == 0
+    assert engine.run("test", calc3.solve_gradient, ("x*y", ["x", "y"])) == ["y", "x"]
+
+
+def test_cancel_replaces_the_worker(engine):
+    cancel = threading.Event()
+    threading.Timer(0.2, cancel.set).start()
+    with pytest.raises(Cancelled):
+        engine.run("test", time.sleep, (5,), timeout=10, cancel=cancel)
+    wait_idle(engine)
+    assert engine.stats()["busy"] == 0
+
+
+def test_unpicklable_arguments_release_the_worker(engine):
+    wait_idle(engine)
+    with pytest.raises(Exception):
+        engine.run("test", calc3.solve_gradient, (lambda: 1, ["x"]))
+    assert engine.stats()["busy"] == 0
+    assert engine.run("test", calc3.solve_gradient, ("x**2", ["x"])) == ["2*x"]
+
+
+def test_race_returns_the_first_accepted_answer(engine):
+    pool = SolverEngine(workers=2, queue_timeout=60)
+    try:
+        wait_idle(pool, 2)
+        finished = pool.race("test", [(time.sleep, (5,)), (calc3.solve_gradient, ("x**2", ["x"]))],
+                             accept=lambda value: value is not None)
+        assert finished == [(1, ["2*x"])]
+        # The losing job is cancelled on its own thread
+        deadline = time.monotonic() + 5
+        while pool.stats()["cancelled"] < 1 and time.monotonic() < deadline:
+            time.sleep(0.05)
+        assert pool.stats()["cancelled"] == 1
+    finally:
+        pool.shutdown()
+
+
+def test_worker_that_dies_while_starting_is_replaced(monkeypatch):
+    import engine as engine_module
+    started = []
+
+    class DiesOnce(engine_module._Worker):
+        def __init__(self, ctx):
+            super().__init__(ctx)
+            started.append(self)
+            if len(started) == 1:
+                self.process.kill()
+
+    monkeypatch.setattr(engine_module, "_Worker", DiesOnce)
+    pool = SolverEngine(workers=1, queue_timeout=60)
+    try:
+        assert pool.run("test", calc3.solve_gradient, ("x*y", ["x", "y"])) == ["y", "x"]
+        assert len(started) == 2
+        assert pool.stats()["crashes"] == 1
+    finally:
+        pool.shutdown()
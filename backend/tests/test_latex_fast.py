@@ -0,0 +1,64 @@
+import pytest
+from sympy import simplify
+
+import parser
+from latex_fast import UnsupportedLatex, parse_latex_fast
+
+
+# Inputs inside the fast path's subset; each must parse to what the ANTLR path gives
+SUBSET = [
+    r"\frac{1}{2}x^{2}+\sin\left(x\right)",
+    r"\sqrt{x^2+y^2}",
+    r"e^{-x^2}\cos(y)",
+    r"\sin^{2} x+\cos^{2} x",
+    r"\arctan(y/x)",
+    r"\ln(x y)",
+    r"\frac{x}{y}+\frac12",
+    r"2\pi r\cdot\theta",
+    r"\sqrt[3]{x}\tan(x)^2",
+    r"\sin x y",
+    r"x^{-1}\cdot\frac{1}{x}",
+    r"\int_{0}^{1}\int_{0}^{2} x y \, dx \, dy",
+]
+
+# Inputs the fast path hands over to ANTLR
+OUTSIDE = [
+    r"\frac{d}{dx} x^2",
+    r"x_1 + x_2",
+    r"\beta x",
+    r"f(x)",
+]
+
+
+def parse(latex, fast, monkeypatch):
+    monkeypatch.setattr(parser, "LATEX_FAST_PATH", fast)
+    parser.parse_sympy.cache_clear()
+    return parser.parse_sympy(latex)
+
+
+@pytest.mark.parametrize("latex", SUBSET)
+def test_fast_path_matches_antlr(latex, monkeypatch):
+    before = parser.parse_cache_stats()["latex"]["fast_path"]
+    fast = parse(latex, True, monkeypatch)
+    assert parser.parse_cache_stats()["latex"]["fast_path"] == before + 1
+    slow = parse(latex, False, monkeypatch)
+    assert fast == slow or simplify(fast - slow) == 0
+
+
+@pytest.mark.parametrize("latex", OUTSIDE)
+def test_unsupported_input_is_rejected(latex):
+    with pytest.raises(UnsupportedLatex):
+        parse_latex_fast(latex)
+
+
+@pytest.mark.parametrize("latex", OUTSIDE)
+def test_unsupported_input_falls_back_to_antlr(latex, monkeypatch):
+    before = parser.parse_cache_stats()["latex"]["fast_path"]
+    fast = parse(latex, True, monkeypatch)
+    assert parser.parse_cache_stats()["latex"]["fast_path"] == before
+    assert fast == parse(latex, False, monkeypatch)
+
+
+def test_brace_only_power_is_a_power(monkeypatch):
+    # The string pipeline used to read e^{x} as one symbol named "e**{x}"
+    assert parse(r"e^{x}", True, monkeypatch) == parse(r"e^x", False, monkeypatch)
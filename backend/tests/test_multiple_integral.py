@@ -0,0 +1,51 @@
+import pytest
+from sympy import Integer, Symbol, erf, exp, integrate, pi, simplify, sqrt, sympify
+
+import calc3
+from calc3 import _cheapest_order, solve_multiple_integral
+
+x, y = Symbol("x"), Symbol("y")
+
+PROBLEMS = [
+    ("x*y**2*exp(x)", [["x", "0", "1"], ["y", "0", "2"]]),
+    ("x**2 + y*z", [["x", "0", "1"], ["y", "0", "2"], ["z", "0", "3"]]),
+    ("x*y", [["y", "0", "x"], ["x", "0", "1"]]),
+    ("sin(x)*cos(y)", [["x", "0", "pi"], ["y", "0", "pi/2"]]),
+    ("z", [["z", "0", "sqrt(1 - x**2 - y**2)"], ["y", "0", "sqrt(1 - x**2)"], ["x", "0", "1"]]),
+]
+
+
+def direct(expr, limits):
+    """The whole integral handed to SymPy in one call"""
+    names = {var: Symbol(var) for var, _, _ in limits}
+    bounds = [(names[var], sympify(a, locals=names), sympify(b, locals=names)) for var, a, b in limits]
+    return integrate(sympify(expr, locals=names), *bounds)
+
+
+@pytest.mark.parametrize("order", ["given", "auto"])
+@pytest.mark.parametrize("expr, limits", PROBLEMS)
+def test_matches_direct_integration(expr, limits, order):
+    assert simplify(sympify(solve_multiple_integral(expr, limits, order=order)) - direct(expr, limits)) == 0
+
+
+def test_changing_outer_limits_reuses_inner_stages():
+    calc3._integrate_stage.cache_clear()
+    solve_multiple_integral("x**2*y", [["x", "0", "1"], ["y", "0", "1"]])
+    assert solve_multiple_integral("x**2*y", [["x", "0", "1"], ["y", "0", "3"]]) == "3/2"
+    info = calc3._integrate_stage.cache_info()
+    assert (info.hits, info.misses) == (1, 3)
+
+
+def test_auto_order_integrates_the_polynomial_variable_first():
+    zero, one = Integer(0), Integer(1)
+    bounds = [(x, zero, one), (y, zero, one)]
+    assert _cheapest_order(y * exp(x**2), bounds)[0][0] == y
+    # Dependent limits fix the order
+    dependent = [(y, zero, x), (x, zero, one)]
+    assert _cheapest_order(y * exp(x**2), dependent) == dependent
+
+
+def test_numeric_method_matches_the_closed_form():
+    result = solve_multiple_integral("exp(-x**2 - y**2)", [["x", "0", "1"], ["y", "0", "1"]], method="numeric")
+    assert result["method"] == "numeric"
+    assert float(result["value"]) == pytest.approx(float((sqrt(pi) / 2 * erf(1))**2), abs=1e-12)
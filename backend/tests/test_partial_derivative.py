@@ -0,0 +1,81 @@
+import pytest
+from sympy import diff, exp, factorial, hessian, simplify, sin, symbols, sympify
+
+import engine
+from app import app
+from calc3 import solve_partial_derivative
+
+x, y = symbols("x y")
+F = exp(x) * sin(x * y) + x**3 * y**2
+
+
+@pytest.mark.parametrize("variables, expected", [
+    (["x"], diff(F, x)),
+    (["y", "x"], diff(F, y, x)),
+    (["x", "y", "y"], diff(F, x, y, y)),
+])
+def test_derivative_matches_diff(variables, expected):
+    assert simplify(sympify(solve_partial_derivative(F, variables)) - expected) == 0
+
+
+def test_order_repeats_the_last_variable():
+    assert simplify(sympify(solve_partial_derivative(F, ["y"], order=3)) - diff(F, y, 3)) == 0
+
+
+def test_hessian_matches_sympy():
+    result = solve_partial_derivative(F, ["x"], hessian_vars=["x", "y"])
+    assert result["hessian_variables"] == ["x", "y"]
+    expected = hessian(F, (x, y))
+    for i in range(2):
+        for j in range(2):
+            assert simplify(sympify(result["hessian"][i][j]) - expected[i, j]) == 0
+
+
+def test_taylor_matches_the_definition():
+    point, degree = (0, 1), 3
+    result = solve_partial_derivative(F, ["x"], taylor=(["x", "y"], [sympify(p) for p in point], degree))
+    at = {x: point[0], y: point[1]}
+    expected = 0
+    for i in range(degree + 1):
+        for j in range(degree + 1 - i):
+            coefficient = (diff(F, x, i, y, j) if i or j else F).subs(at)
+            expected += coefficient * (x - point[0])**i * (y - point[1])**j / (factorial(i) * factorial(j))
+    assert result["taylor"]["degree"] == degree
+    assert simplify(sympify(result["taylor"]["polynomial"]) - expected) == 0
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(engine, "_engine", engine.InlineEngine())
+    return app.test_client()
+
+
+def test_api_returns_hessian_and_taylor(client):
+    response = client.post("/calculate", json={
+        "operation": "partial_derivative", "function": "x^2*y", "variables": "x",
+        "hessian": True, "taylor": {"point": "1, 1", "degree": 2},
+    })
+    assert response.status_code == 200
+    result = response.get_json()["result"]
+    assert result["derivative"] == "2*x*y"
+    assert result["hessian"] == [["2*y", "2*x"], ["2*x", "0"]]
+    assert simplify(sympify(result["taylor"]["polynomial"]) - sympify("1 + 2*(x-1) + (y-1) + (x-1)**2 + 2*(x-1)*(y-1)")) == 0
+
+
+@pytest.mark.parametrize("payload", [
+    {"order": 0},
+    {"order": 21},
+    {"order": "two"},
+    {"variables": ""},
+    {"variables": "x, 2y"},
+    {"hessian": "x, 1"},
+    {"taylor": "0, 0"},
+    {"taylor": {"point": "0", "degree": 2}},
+    {"taylor": {"point": "0, 0", "degree": 0}},
+    {"taylor": {"point": "0, 0", "degree": 11}},
+])
+def test_api_rejects_invalid_options(client, payload):
+    response = client.post("/calculate", json={"operation": "partial_derivative", "function": "x^2*y",
+                                               "variables": "x", **payload})
+    assert response.status_code == 400
+    assert "error" in response.get_json()
@@ -0,0 +1,62 @@
+import pytest
+from sympy import Matrix, expand, integrate, pi, simplify, sqrt, symbols, sympify
+
+from calc3 import solve_stokes_boundary, solve_stokes_theorem, solve_surface_integral
+
+u, v = symbols("u v")
+PARAMS = ["u", "v"]
+SPHERE = ["2*sin(u)*cos(v)", "2*sin(u)*sin(v)", "2*cos(u)"]
+TORUS = ["(3+cos(u))*cos(v)", "(3+cos(u))*sin(v)", "sin(u)"]
+
+
+def direct(field, surface, bounds):
+    """f |ru x rv| or F . (ru x rv) integrated as written, without the shortcuts"""
+    r = Matrix([sympify(component) for component in surface])
+    normal = r.diff(u).cross(r.diff(v))
+    on_surface = dict(zip(symbols("x y z"), r))
+    if isinstance(field, list):
+        integrand = Matrix([sympify(f) for f in field]).subs(on_surface).dot(normal)
+    else:
+        integrand = sympify(field).subs(on_surface) * sqrt(expand(normal.dot(normal)))
+    (a, b), (c, d) = [(sympify(lo), sympify(hi)) for lo, hi in bounds]
+    return integrate(integrand, (u, a, b), (v, c, d))
+
+
+CASES = {
+    # ru x rv = u - 1/20 changes sign inside the rectangle
+    "sign_change": ("1", ["u**2/2 - u/20", "v", "0"], [["0", "1"], ["0", "1"]]),
+    # The u limit depends on v, so v must not be shrunk by symmetry
+    "dependent_limits": ("1", ["u", "v", "0"], [["0", "v+1"], ["-1", "1"]]),
+    "dependent_limits_moment": ("y", ["u", "v", "0"], [["0", "v+1"], ["-1", "1"]]),
+    "odd": ("x", ["cos(v)", "sin(v)", "u"], [["0", "1"], ["0", "2*pi"]]),
+    "parabolic": ("z**2", ["u", "v", "u**2-1"], [["-2", "2"], ["0", "1"]]),
+    "plane_flux": (["x", "y", "z"], ["u", "v", "1-u-v"], [["0", "1"], ["0", "1"]]),
+    "torus_flux": (["x", "y", "z"], TORUS, [["0", "2*pi"], ["0", "2*pi"]]),
+}
+
+
+@pytest.mark.parametrize("name", sorted(CASES))
+def test_matches_direct_integration(name):
+    field, surface, bounds = CASES[name]
+    result = solve_surface_integral(field, PARAMS, surface, bounds)
+    assert simplify(sympify(result) - direct(field, surface, bounds)) == 0
+
+
+def test_sphere_area_keeps_the_radius_positive():
+    surface = ["a*sin(u)*cos(v)", "a*sin(u)*sin(v)", "a*cos(u)"]
+    assert sympify(solve_surface_integral("1", PARAMS, surface, [["0", "pi"], ["0", "2*pi"]])) == 4 * pi * symbols("a")**2
+
+
+def test_surface_element_that_changes_sign_is_integrated_as_its_absolute_value():
+    # |ru| = |u**2 - 1| on 0 <= u <= 2
+    assert solve_surface_integral("1", PARAMS, ["u**3/3 - u", "v", "0"], [["0", "2"], ["0", "2"]]) == "4"
+
+
+@pytest.mark.parametrize("field, surface, bounds", [
+    (["-y**3", "x**3", "0"], SPHERE, [["0", "pi/2"], ["0", "2*pi"]]),
+    (["0", "x", "0"], ["u", "v", "0"], [["0", "v+1"], ["-1", "1"]]),
+])
+def test_stokes_surface_matches_boundary(field, surface, bounds):
+    flux = solve_stokes_theorem(field, PARAMS, surface, bounds)
+    circulation = solve_stokes_boundary(field, PARAMS, surface, bounds)
+    assert simplify(sympify(flux) - sympify(circulation)) == 0
@@ -0,0 +1,97 @@
+import os
+
+from sympy import symbols, sympify, diff, sqrt, Integral, Eq
+
+
+# Wall-clock budget in seconds for each operation (0 disables the limit).
+# Override with CALC3_TIMEOUT_<OPERATION>, e.g. CALC3_TIMEOUT_DOUBLE_INTEGRAL=60
+DEFAULT_TIMEOUT = float(os.environ.get("CALC3_TIMEOUT_DEFAULT", "20"))
+
+OPERATION_TIMEOUTS = {
+    "partial_derivative": 10,
+    "gradient": 10,
+    "divergence": 10,
+    "curl": 10,
+    "directional_derivative": 10,
+    "gradient_field": 20,
+    "directional_derivative_field": 20,
+    "arc_length": 20,
+    "scalar_line_integral": 20,
+    "vector_line_integral": 20,
+    "greens_theorem": 20,
+    "double_integral": 30,
+    "double_integral_polar": 30,
+    "triple_integral": 30,
+    "triple_integral_polar": 30,
+    "triple_integral_cylindrical": 30,
+    "region_integral": 30,
+    "surface_integral": 30,
+    "stokes_theorem": 30,
+    "lagrange_multipliers": 30,
+}
+
+
+def get_timeout(operation):
+    """Return the configured time budget for an operation"""
+    env_value = os.environ.get(f"CALC3_TIMEOUT_{operation.upper()}")
+    if env_value is not None:
+        return float(env_value)
+    return float(OPERATION_TIMEOUTS.get(operation, DEFAULT_TIMEOUT))
+
+
+class SolveTimeout(Exception):
+    """Raised when a solver exceeds its wall-clock budget"""
+
+    def __init__(self, operation, timeout, partial=None):
+        super().__init__(f"Computation timed out after {timeout:g} seconds")
+        self.operation = operation
+        self.timeout = timeout
+        self.partial = partial
+
+    def to_response(self):
+        response = {
+            "error": str(self),
+            "timed_out": True,
+            "operation": self.operation,
+            "timeout": self.timeout,
+        }
+        if self.partial is not None:
+            response["partial_result"] = self.partial
+        return response
+
+
+def partial_result(operation, args):
+    """
+    Build the cheap, unevaluated form of a problem to return on timeout,
+    e.g. the Integral object SymPy was trying to evaluate.
+    """
+    try:
+        if operation in ("double_integral", "double_integral_polar", "triple_integral",
+                         "triple_integral_polar", "triple_integral_cylindrical"):
+            expr, limits = args[:2]
+            all_vars = {var: symbols(var) for var, _, _ in limits}
+            integrand = sympify(expr, locals=all_vars)
+            bounds = [(all_vars[var], sympify(a, locals=all_vars), sympify(b, locals=all_vars))
+                      for var, a, b in limits]
+            return str(Integral(integrand, *bounds))
+
+        if operation == "arc_length":
+            # (exprs, param, a, b, ...) for one curve, (segments, param, ...) for a piecewise one
+            param = args[1]
+            segments = args[0] if len(args) == 5 else [(args[0], args[2], args[3])]
+            t = symbols(param)
+            return " + ".join(str(Integral(sqrt(sum(diff(sympify(e), t)**2 for e in exprs)), (t, sympify(a), sympify(b))))
+                              for exprs, a, b in segments)
+
+        if operation == "lagrange_multipliers":
+            f_expr, g_expr, variables = args[:3]
+            f = sympify(f_expr)
+            constraints = [sympify(g) for g in (g_expr if isinstance(g_expr, (list, tuple)) else [g_expr])]
+            multipliers = symbols(f'lam1:{len(constraints) + 1}') if len(constraints) > 1 else [symbols('lam')]
+            equations = [Eq(diff(f, v), sum(lam * diff(g, v) for lam, g in zip(multipliers, constraints)))
+                         for v in symbols(variables)]
+            equations += [Eq(g, 0) for g in constraints]
+            return [str(eq) for eq in equations]
+    except Exception:
+        pass
+    return None